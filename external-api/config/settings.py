@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -13,3 +15,5 @@ class AppConfig(BaseModel):
     port: int
     db: DbConfig
     scraper_addr: str
+    export_cache_dir: Optional[str] = None  # exports of finished scans are kept here when set
+    export_cache_max_bytes: int = 4096 * 2**20
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+import zlib
+from enum import Enum
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from tortoise import connections
+
+from db.requests import PartsQuery, get_scan_ids, stream_parts
+
+EXPORT_COLUMNS = ("maker", "category", "model", "part_number", "part_category", "url")
+CHUNK_SIZE = 64 * 1024
+COPY_QUEUE_SIZE = 16  # chunks of COPY output waiting for the client
+PARQUET_BATCH_ROWS = 10000
+GZIP_WBITS = 31
+EXPORT_FILE = re.compile(r"scan-(\d+)\.")
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+def export_filename(scan_id: int, export_format: ExportFormat) -> str:
+    # parquet compresses its column chunks itself, the text formats are gzipped
+    if export_format == ExportFormat.PARQUET:
+        return f"scan-{scan_id}.parquet"
+    return f"scan-{scan_id}.{export_format.value}.gz"
+
+
+async def csv_chunks(query: PartsQuery) -> AsyncIterator[bytes]:
+    """CSV of the parts of a query as written by Postgres `COPY ... TO STDOUT`, with a header line."""
+    columns = ", ".join(EXPORT_COLUMNS)
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=COPY_QUEUE_SIZE)
+
+    async def copy() -> None:
+        async with connections.get("default").acquire_connection() as connection:
+            await connection.copy_from_query(
+                f"SELECT {columns} FROM ({query.sql}) parts",
+                *query.params,
+                output=chunks.put,
+                format="csv",
+                header=True,
+            )
+
+    # the bounded queue holds COPY back while the client is slower than the database
+    task = asyncio.create_task(copy())
+    try:
+        while not (task.done() and chunks.empty()):
+            chunk = asyncio.ensure_future(chunks.get())
+            await asyncio.wait({chunk, task}, return_when=asyncio.FIRST_COMPLETED)
+            if chunk.done():
+                yield chunk.result()
+            else:
+                chunk.cancel()
+        task.result()
+    finally:
+        # a client that went away stops the COPY, its connection is back in the pool once the chunks are closed
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def ndjson_chunks(query: PartsQuery) -> AsyncIterator[bytes]:
+    """One JSON object per part and line, read through a server-side cursor."""
+    buffer = bytearray()
+    async for row in stream_parts(query):
+        buffer += json.dumps({column: row[column] for column in EXPORT_COLUMNS}).encode() + b"\n"
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def cache_chunks(chunks: AsyncIterator[bytes], path: Path) -> AsyncIterator[bytes]:
+    """Pass chunks on while writing them to `path`, which only appears once the export is complete."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as cache_file:
+            async for chunk in chunks:
+                cache_file.write(chunk)
+                yield chunk
+        os.replace(temp_path, path)
+    finally:
+        # an export cut short, by an error or a client that went away, leaves nothing behind
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+async def write_parquet(query: PartsQuery, path: Optional[Path] = None) -> Path:
+    """Write the parts of a query to a parquet file at `path`, or a temporary file, and return its path.
+
+    Parquet has its footer at the end, so unlike the text formats the file is
+    written completely before it is sent.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    directory = path.parent if path is not None else None
+    if directory is not None:
+        directory.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".parquet")
+    os.close(fd)
+    schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+    try:
+        with pq.ParquetWriter(temp_path, schema, compression="zstd") as writer:
+            rows = []
+            async for row in stream_parts(query):
+                rows.append(row)
+                if len(rows) >= PARQUET_BATCH_ROWS:
+                    await asyncio.to_thread(writer.write_batch, pa.RecordBatch.from_pylist(rows, schema=schema))
+                    rows = []
+            if rows:
+                await asyncio.to_thread(writer.write_batch, pa.RecordBatch.from_pylist(rows, schema=schema))
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    if path is None:
+        return Path(temp_path)
+    os.replace(temp_path, path)
+    return path
+
+
+def evict_exports(cache_dir: Path, scan_ids: set[int], max_bytes: int) -> None:
+    """Remove the exports of scans not in `scan_ids`, then the least recently served ones beyond `max_bytes`."""
+    exports = []
+    for path in cache_dir.glob("scan-*"):
+        match = EXPORT_FILE.match(path.name)
+        if match is None:
+            continue
+        try:
+            if int(match.group(1)) not in scan_ids:
+                path.unlink()
+                continue
+            stat = path.stat()
+        except FileNotFoundError:
+            # removed by a concurrent prune
+            continue
+        exports.append((stat.st_mtime, stat.st_size, path))
+
+    size = sum(file_size for _, file_size, _ in exports)
+    for _, file_size, path in sorted(exports):
+        if size <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        size -= file_size
+
+
+async def prune_export_cache(cache_dir: str, max_bytes: int) -> None:
+    """Keep the export cache within `max_bytes` and drop the exports of scans the scraper's retention deleted."""
+    scan_ids = await get_scan_ids()
+    await asyncio.to_thread(evict_exports, Path(cache_dir), scan_ids, max_bytes)
@@ -6,6 +6,8 @@ class Scans(TortoiseModel):
     id = fields.IntField(pk=True)
     time_start = fields.DatetimeField()
     time_end = fields.DatetimeField(null=True)
+    stage_seconds = fields.JSONField(null=True)
+    storage = fields.CharField(max_length=16, default="snapshot")
     parts: fields.ReverseRelation["Parts"]
 
 
@@ -13,18 +15,21 @@ class Makers(TortoiseModel):
     id = fields.IntField(pk=True)
     maker = fields.CharField(max_length=255, unique=True)
     parts: fields.ReverseRelation["Parts"]
+    part_ranges: fields.ReverseRelation["PartRanges"]
 
 
 class Categories(TortoiseModel):
     id = fields.IntField(pk=True)
     category = fields.CharField(max_length=255, unique=True)
     parts: fields.ReverseRelation["Parts"]
+    part_ranges: fields.ReverseRelation["PartRanges"]
 
 
 class Models(TortoiseModel):
     id = fields.IntField(pk=True)
     model = fields.CharField(max_length=255, unique=True)
     parts: fields.ReverseRelation["Parts"]
+    part_ranges: fields.ReverseRelation["PartRanges"]
 
 
 class Parts(TortoiseModel):
@@ -39,3 +44,21 @@ class Parts(TortoiseModel):
 
     class Meta:
         unique_together = ("maker", "category", "model", "part_number", "part_category", "scan")
+
+
+class PartRanges(TortoiseModel):
+    """A part stored once for all the scans from first_scan_id to last_scan_id, for scans with `ranges` storage."""
+
+    id = fields.BigIntField(pk=True)
+    maker = fields.ForeignKeyField("models.Makers", related_name="part_ranges")
+    category = fields.ForeignKeyField("models.Categories", related_name="part_ranges")
+    model = fields.ForeignKeyField("models.Models", related_name="part_ranges")
+    part_number = fields.CharField(max_length=255)
+    part_category = fields.CharField(max_length=255)
+    url = fields.TextField()
+    first_scan_id = fields.IntField()
+    last_scan_id = fields.IntField()
+
+    class Meta:
+        table = "part_ranges"
+        unique_together = ("maker", "category", "model", "part_number", "part_category", "url", "first_scan_id")
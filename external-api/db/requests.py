@@ -1,8 +1,11 @@
-from typing import List, Optional, Type
+import base64
+import binascii
+from typing import Any, AsyncIterator, List, NamedTuple, Optional, Type
 
-from db.models import Categories, Makers, Models, Parts, Scans
+from db.models import Categories, Makers, Models, Scans
 from fastapi import HTTPException
 from loguru import logger
+from tortoise import connections
 from tortoise.exceptions import OperationalError
 from tortoise.models import Model as TortoiseModel
 
@@ -36,37 +39,140 @@ async def query_model(
         )
 
 
-async def get_latest_scan_id() -> int:
-    latest_scan = await Scans.all().order_by("-time_end").first()
+RANGES_STORAGE = "ranges"
+STREAM_PREFETCH = 1000
+
+# parts of a scan in id order, {table} is parts or part_ranges, {conditions} use positional parameters
+PARTS_QUERY = """
+SELECT p.id, makers.maker, categories.category, models.model, p.part_number, p.part_category, p.url
+FROM {table} p
+JOIN makers ON makers.id = p.maker_id
+JOIN categories ON categories.id = p.category_id
+JOIN models ON models.id = p.model_id
+WHERE {conditions}
+ORDER BY p.id
+"""
+
+
+class PartsQuery(NamedTuple):
+    sql: str
+    params: list
+
+
+async def get_latest_scan() -> Scans:
+    latest_scan = await Scans.filter(time_end__isnull=False).order_by("-time_end").first()
     if not latest_scan:
         raise HTTPException(status_code=404, detail="No scans found in the database.")
-    return latest_scan.id
+    return latest_scan
+
 
+def scan_parts_filters(scan: Scans, relation: str = "") -> dict:
+    """Filters on the parts of a scan, by scan id or by range containment for scans with `ranges` storage."""
+    if scan.storage == RANGES_STORAGE:
+        return {f"{relation}first_scan_id__lte": scan.id, f"{relation}last_scan_id__gte": scan.id}
+    return {f"{relation}scan_id": scan.id}
 
-async def search_parts(
+
+def scan_parts_relation(scan: Scans) -> str:
+    return "part_ranges__" if scan.storage == RANGES_STORAGE else "parts__"
+
+
+def encode_cursor(scan_id: int, last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{scan_id}:{last_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    """Scan id and last part id of a page cursor."""
+    try:
+        scan_id, last_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return int(scan_id), int(last_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def contains_pattern(value: str) -> str:
+    """ILIKE pattern for `value` anywhere in a column, with its own % and _ taken literally."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def parts_query(
     maker: Optional[str] = None,
     category: Optional[str] = None,
     model: Optional[str] = None,
     part_number: Optional[str] = None,
     part_category: Optional[str] = None,
     scan_id: Optional[int] = None,
-):
-    if not scan_id:
-        scan_id = await get_latest_scan_id()
+    cursor: Optional[str] = None,
+) -> tuple[Scans, PartsQuery]:
+    """Parts of a scan in id order, after the part a cursor points at.
+
+    A cursor pins the scan it was issued for, so paging through it isn't thrown
+    off by a newer scan finishing. The keyset condition on id follows the
+    (scan_id, id) primary key of `parts`, every page is an index range scan.
+    """
+    after_id = None
+    if cursor:
+        cursor_scan_id, after_id = decode_cursor(cursor)
+        if scan_id and scan_id != cursor_scan_id:
+            raise HTTPException(status_code=400, detail=f"Cursor belongs to scan {cursor_scan_id}, not {scan_id}.")
+        scan_id = cursor_scan_id
+    scan = await Scans.get_or_none(id=scan_id) if scan_id else await get_latest_scan()
+    if not scan:
+        raise HTTPException(status_code=404, detail=f"Scan {scan_id} not found.")
+
+    params: list = [scan.id]
+    if scan.storage == RANGES_STORAGE:
+        table, conditions = "part_ranges", ["p.first_scan_id <= $1", "p.last_scan_id >= $1"]
+    else:
+        table, conditions = "parts", ["p.scan_id = $1"]
+    if after_id is not None:
+        params.append(after_id)
+        conditions.append(f"p.id > ${len(params)}")
+    searches = {
+        "makers.maker": maker,
+        "categories.category": category,
+        "models.model": model,
+        "p.part_number": part_number,
+        "p.part_category": part_category,
+    }
+    for column, value in searches.items():
+        if value:
+            params.append(contains_pattern(value))
+            conditions.append(f"{column} ILIKE ${len(params)}")
+
+    sql = PARTS_QUERY.format(table=table, conditions=" AND ".join(conditions))
+    return scan, PartsQuery(sql, params)
+
+
+async def search_parts(limit: int, **query_params) -> tuple[list[dict], Optional[str]]:
+    """A page of at most `limit` parts, and the cursor of the next page or None on the last one."""
+    scan, query = await parts_query(**query_params)
+    try:
+        rows = await connections.get("default").execute_query_dict(
+            f"{query.sql}LIMIT ${len(query.params) + 1}", [*query.params, limit + 1]
+        )
+    except OperationalError as err:
+        logger.error("OperationalError querying parts: {}", str(err))
+        raise HTTPException(status_code=500, detail="Parts table does not exist. Please check the database schema.")
+    if not rows and not query_params.get("cursor"):
+        raise HTTPException(status_code=404, detail="No parts found or table is empty.")
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(scan.id, rows[-1]["id"])
+    logger.info("{} parts found.", len(rows))
+    return rows, next_cursor
 
-    filters = {"scan_id": scan_id}
-    if maker:
-        filters["maker__maker__icontains"] = maker
-    if category:
-        filters["category__category__icontains"] = category
-    if model:
-        filters["model__model__icontains"] = model
-    if part_number:
-        filters["part_number__icontains"] = part_number
-    if part_category:
-        filters["part_category__icontains"] = part_category
 
-    return await query_model(Parts, filters=filters, prefetch_related=["maker", "category", "model", "scan"])
+async def stream_parts(query: PartsQuery) -> AsyncIterator[dict[str, Any]]:
+    """Rows of a parts query read through a server-side cursor, `STREAM_PREFETCH` rows at a time."""
+    async with connections.get("default").acquire_connection() as connection:
+        # asyncpg cursors only live inside a transaction
+        async with connection.transaction():
+            async for record in connection.cursor(query.sql, *query.params, prefetch=STREAM_PREFETCH):
+                yield dict(record)
 
 
 async def get_makers() -> List[Makers]:
@@ -76,18 +182,30 @@ async def get_makers() -> List[Makers]:
 async def get_categories(maker_name: Optional[str] = None):
     filters = {}
     if maker_name:
-        filters["parts__maker__maker__icontains"] = maker_name
+        # only the latest scan's parts are searched, its partition or the ranges containing it
+        scan = await get_latest_scan()
+        relation = scan_parts_relation(scan)
+        filters.update(scan_parts_filters(scan, relation))
+        filters[f"{relation}maker__maker__icontains"] = maker_name
     return await query_model(Categories, filters=filters, distinct=True)
 
 
 async def get_models(maker_name: Optional[str] = None, category_name: Optional[str] = None):
     filters = {}
-    if maker_name:
-        filters["parts__maker__maker__icontains"] = maker_name
-    if category_name:
-        filters["parts__category__category__icontains"] = category_name
-    return await query_model(Models, filters=filters)
+    if maker_name or category_name:
+        scan = await get_latest_scan()
+        relation = scan_parts_relation(scan)
+        filters.update(scan_parts_filters(scan, relation))
+        if maker_name:
+            filters[f"{relation}maker__maker__icontains"] = maker_name
+        if category_name:
+            filters[f"{relation}category__category__icontains"] = category_name
+    return await query_model(Models, filters=filters, distinct=True)
 
 
 async def get_scans():
     return await query_model(Scans)
+
+
+async def get_scan_ids() -> set[int]:
+    return set(await Scans.all().values_list("id", flat=True))
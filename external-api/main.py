@@ -4,6 +4,7 @@ from datetime import datetime
 
 import uvicorn
 from config.settings import AppConfig, DbConfig
+from db.export import prune_export_cache
 from db.postgres import close_db, init_db, register_db
 from fastapi import FastAPI
 from loguru import logger
@@ -15,6 +16,9 @@ from routers.healthcheck import router as healthcheck_router
 async def lifespan(app: FastAPI):
     await init_db(db_config=app.state.app_config.db)
     logger.info("Database initialized.")
+    app_config = app.state.app_config
+    if app_config.export_cache_dir:
+        await prune_export_cache(app_config.export_cache_dir, app_config.export_cache_max_bytes)
 
     yield
 
@@ -32,6 +36,8 @@ app_config = AppConfig(
     port=int(os.getenv("APP_PORT", 8081)),
     db=db_config,
     scraper_addr=os.getenv("SCRAPER_ADDRESS", "http://localhost:8080/run"),
+    export_cache_dir=os.getenv("EXPORT_CACHE_DIR"),
+    export_cache_max_bytes=int(os.getenv("EXPORT_CACHE_MAX_MB", "4096")) * 2**20,
 )
 app = FastAPI(
     title="Catalog Sync API",
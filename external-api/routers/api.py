@@ -1,41 +1,68 @@
-from typing import Optional
+import json
+import os
+from pathlib import Path
+from typing import AsyncIterator, Optional
 
 import httpx
+from db import export
 from db import requests as db_requests
-from fastapi import APIRouter, HTTPException, Query, Request
+from db.export import ExportFormat
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from schemas import CategorySchema, MakerSchema, ModelSchema, PartSchema, ScanSchema
+from starlette.background import BackgroundTask
 
 router = APIRouter()
 
+DEFAULT_PARTS_LIMIT = 1000
+MAX_PARTS_LIMIT = 10000
+
+
+async def json_array(rows: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """A JSON array written one part at a time, so memory use doesn't grow with the number of rows."""
+    yield b"["
+    separator = b""
+    async for row in rows:
+        row.pop("id")
+        yield separator + json.dumps(row).encode()
+        separator = b","
+    yield b"]"
+
 
 @router.get("/parts", response_model=list[PartSchema])
 async def search_parts(
+    response: Response,
     manufacturer: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
     model: Optional[str] = Query(None),
     part_number: Optional[str] = Query(None),
     part_category: Optional[str] = Query(None),
     scan_id: Optional[int] = Query(None),
+    limit: int = Query(DEFAULT_PARTS_LIMIT, ge=1, le=MAX_PARTS_LIMIT),
+    cursor: Optional[str] = Query(None),
+    stream: bool = Query(False),
 ):
-    parts = await db_requests.search_parts(
+    """Parts of a scan in pages of `limit`, the `X-Next-Cursor` header is the `cursor` of the next page.
+
+    With `stream=true` every part after `cursor` is streamed instead, ignoring `limit`.
+    """
+    params = dict(
         maker=manufacturer,
         category=category,
         model=model,
         part_number=part_number,
         part_category=part_category,
         scan_id=scan_id,
+        cursor=cursor,
     )
-    return [
-        PartSchema(
-            maker=p.maker.maker,
-            category=p.category.category,
-            model=p.model.model,
-            part_number=p.part_number,
-            part_category=p.part_category,
-            url=p.url,
-        )
-        for p in parts
-    ]
+    if stream:
+        _, query = await db_requests.parts_query(**params)
+        return StreamingResponse(json_array(db_requests.stream_parts(query)), media_type="application/json")
+
+    parts, next_cursor = await db_requests.search_parts(limit=limit, **params)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [PartSchema(**part) for part in parts]
 
 
 @router.get("/manufacturers", response_model=list[MakerSchema])
@@ -65,11 +92,60 @@ async def get_scans():
     return scans
 
 
+@router.get("/scans/{scan_id}/export")
+async def export_scan(
+    request: Request,
+    scan_id: int,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+):
+    """All parts of a scan as a gzipped NDJSON or CSV file, or as a parquet file.
+
+    A finished scan never changes, so its export is kept in `EXPORT_CACHE_DIR`
+    and served from there from then on, without touching the database. The
+    cache is pruned to `EXPORT_CACHE_MAX_MB` after every new export, which also
+    drops the exports of scans deleted since.
+    """
+    scan, query = await db_requests.parts_query(scan_id=scan_id)
+    filename = export.export_filename(scan.id, export_format)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    media_type = "application/vnd.apache.parquet" if export_format == ExportFormat.PARQUET else "application/gzip"
+    app_config = request.app.state.app_config
+    cache_dir = app_config.export_cache_dir
+    cache_path = Path(cache_dir) / filename if cache_dir and scan.time_end else None
+    if cache_path is not None and cache_path.exists():
+        # the modification time orders exports for eviction, least recently served first
+        os.utime(cache_path)
+        return FileResponse(cache_path, media_type=media_type, headers=headers)
+
+    # a new export may take the cache over its size limit
+    prune = (
+        BackgroundTask(export.prune_export_cache, cache_dir, app_config.export_cache_max_bytes)
+        if cache_path is not None
+        else None
+    )
+    if export_format == ExportFormat.PARQUET:
+        path = await export.write_parquet(query, cache_path)
+        cleanup = BackgroundTask(os.unlink, path) if cache_path is None else prune
+        return FileResponse(path, media_type=media_type, headers=headers, background=cleanup)
+
+    rows = export.csv_chunks(query) if export_format == ExportFormat.CSV else export.ndjson_chunks(query)
+    chunks = export.gzip_chunks(rows)
+    if cache_path is not None:
+        chunks = export.cache_chunks(chunks, cache_path)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers, background=prune)
+
+
 @router.get("/scraper/run")
-async def run_scraper(request: Request):
+async def run_scraper(
+    request: Request,
+    manufacturer: list[str] = Query(default=[]),
+    category: list[str] = Query(default=[]),
+    model: list[str] = Query(default=[]),
+):
+    params = {"maker": manufacturer, "category": category, "model": model}
     try:
         async with httpx.AsyncClient() as client:
-            response = await client.get(request.app.state.app_config.scraper_addr)
+            response = await client.get(request.app.state.app_config.scraper_addr, params=params)
             if response.status_code != 200:
                 raise HTTPException(
                     status_code=response.status_code,
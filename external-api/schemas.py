@@ -44,6 +44,8 @@ class ScanSchema(BaseModel):
     id: int
     time_start: datetime
     time_end: Optional[datetime]
+    stage_seconds: Optional[dict[str, dict[str, float]]] = None
+    storage: str = "snapshot"
 
     class Config:
         orm_mode = True
@@ -0,0 +1,90 @@
+import os
+import sys
+
+import pytest
+import pytest_asyncio
+
+# Add parent directory to the sys.path to resolve relative imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from tortoise import connections  # noqa: E402
+
+from config.settings import DbConfig  # noqa: E402
+from db.postgres import close_db, init_db  # noqa: E402
+
+PART_COUNT = 25
+
+
+@pytest_asyncio.fixture
+async def database():
+    """The connection of a real Postgres with the scraper's schema, only available when TEST_DB_HOST is set.
+
+    The API doesn't own the schema: run the scraper's database tests, or the scraper, against it first.
+    """
+    if not os.getenv("TEST_DB_HOST"):
+        pytest.skip("TEST_DB_HOST is not set")
+    await init_db(
+        DbConfig(
+            host=os.getenv("TEST_DB_HOST"),
+            port=int(os.getenv("TEST_DB_PORT", "5432")),
+            database=os.getenv("TEST_DB_NAME", "parts_catalogue_test"),
+            user=os.getenv("TEST_DB_USER", "user"),
+            password=os.getenv("TEST_DB_PASS", "pass"),
+        )
+    )
+    connection = connections.get("default")
+    [schema] = await connection.execute_query_dict("SELECT to_regclass('part_ranges') AS part_ranges")
+    if schema["part_ranges"] is None:
+        await close_db()
+        pytest.skip("the scraper's schema is missing")
+    yield connection
+    await close_db()
+
+
+@pytest_asyncio.fixture
+async def catalogue(database):
+    """A finished scan of each storage with the same `PART_COUNT` parts, by storage."""
+    ids = []
+    for table, name in (("makers", "maker"), ("categories", "category"), ("models", "model")):
+        for value in (f"{name.upper()} 1", f"{name.upper()}_2"):
+            _, rows = await database.execute_query(
+                f"INSERT INTO {table} ({name}) VALUES ($1) ON CONFLICT ({name}) DO UPDATE SET {name} = EXCLUDED.{name} "
+                "RETURNING id",
+                [value],
+            )
+            ids.append(rows[0]["id"])
+    dimensions = [ids[0:2], ids[2:4], ids[4:6]]
+
+    scans = {}
+    for storage in ("snapshot", "ranges"):
+        _, rows = await database.execute_query(
+            "INSERT INTO scans (time_start, time_end, storage) VALUES (now(), now(), $1) RETURNING id", [storage]
+        )
+        scan_id = rows[0]["id"]
+        scans[storage] = scan_id
+        if storage == "snapshot":
+            await database.execute_script(
+                f"CREATE TABLE parts_scan_{scan_id} PARTITION OF parts FOR VALUES IN ({scan_id})"
+            )
+            sql = (
+                "INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id) "
+                "VALUES ($1, $2, $3, $4, $5, $6, $7)"
+            )
+        else:
+            sql = (
+                "INSERT INTO part_ranges "
+                "(maker_id, category_id, model_id, part_number, part_category, url, first_scan_id, last_scan_id) "
+                "VALUES ($1, $2, $3, $4, $5, $6, $7, $7)"
+            )
+        await database.execute_many(
+            sql,
+            [
+                [*(dimension[i % 2] for dimension in dimensions), f"{i:03}", "FOO", f"https://a/{i}", scan_id]
+                for i in range(PART_COUNT)
+            ],
+        )
+
+    yield scans
+
+    await database.execute_script(f"DROP TABLE IF EXISTS parts_scan_{scans['snapshot']}")
+    await database.execute_query("DELETE FROM part_ranges WHERE first_scan_id = $1", [scans["ranges"]])
+    await database.execute_query("DELETE FROM scans WHERE id = ANY($1::int[])", [list(scans.values())])
@@ -0,0 +1,119 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+
+import pytest
+from conftest import PART_COUNT
+
+from db import export
+from db.export import EXPORT_COLUMNS, ExportFormat
+from db.requests import parts_query
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["snapshot", "ranges"])
+async def test_text_exports_hold_every_part(catalogue, storage):
+    _, query = await parts_query(scan_id=catalogue[storage])
+
+    csv_rows = list(csv.DictReader(io.StringIO((await collect(export.csv_chunks(query))).decode())))
+    ndjson_rows = [
+        json.loads(line)
+        for line in gzip.decompress(await collect(export.gzip_chunks(export.ndjson_chunks(query)))).splitlines()
+    ]
+
+    assert len(csv_rows) == PART_COUNT
+    assert list(csv_rows[0]) == list(EXPORT_COLUMNS)
+    assert csv_rows == ndjson_rows
+    assert [row["part_number"] for row in csv_rows] == [f"{i:03}" for i in range(PART_COUNT)]
+
+
+@pytest.mark.asyncio
+async def test_csv_export_stops_copy_when_the_client_goes_away(catalogue, database):
+    scan_id = catalogue["snapshot"]
+    await database.execute_query(
+        "INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id) "
+        "SELECT maker_id, category_id, model_id, part_number || '-' || n, part_category, repeat(url, 200), scan_id "
+        "FROM parts, generate_series(1, 400) n WHERE scan_id = $1",
+        [scan_id],
+    )
+    _, query = await parts_query(scan_id=scan_id)
+    chunks = export.csv_chunks(query)
+
+    await chunks.__anext__()
+    # COPY is held back by the bounded queue instead of reading the whole scan into memory
+    await asyncio.sleep(0.1)
+    assert await copies(database) == 1
+    await chunks.aclose()
+
+    assert await copies(database) == 0
+
+
+async def copies(database) -> int:
+    [row] = await database.execute_query_dict(
+        "SELECT count(*) AS copies FROM pg_stat_activity WHERE query LIKE 'COPY (SELECT maker%' AND state = 'active'"
+    )
+    return row["copies"]
+
+
+@pytest.mark.asyncio
+async def test_cached_export_appears_once_complete(tmp_path):
+    path = tmp_path / export.export_filename(7, ExportFormat.CSV)
+
+    async def chunks():
+        yield b"a"
+        assert not path.exists()
+        yield b"b"
+
+    assert await collect(export.cache_chunks(chunks(), path)) == b"ab"
+    assert path.read_bytes() == b"ab"
+
+
+@pytest.mark.asyncio
+async def test_failed_export_leaves_nothing_in_the_cache(tmp_path):
+    path = tmp_path / export.export_filename(7, ExportFormat.CSV)
+
+    async def chunks():
+        yield b"a"
+        raise ConnectionError("gone")
+
+    with pytest.raises(ConnectionError):
+        await collect(export.cache_chunks(chunks(), path))
+
+    assert os.listdir(tmp_path) == []
+
+
+def cached_export(directory, name: str, size: int, served: int):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (served, served))
+    return path
+
+
+def test_eviction_drops_deleted_scans_then_the_least_recently_served(tmp_path):
+    cached_export(tmp_path, "scan-1.csv.gz", 100, served=1000)
+    cached_export(tmp_path, "scan-2.csv.gz", 100, served=3000)
+    cached_export(tmp_path, "scan-2.parquet", 100, served=1000)
+    cached_export(tmp_path, "scan-3.ndjson.gz", 100, served=2000)
+    cached_export(tmp_path, "notes.txt", 1000, served=0)
+
+    export.evict_exports(tmp_path, scan_ids={2, 3}, max_bytes=200)
+
+    assert sorted(os.listdir(tmp_path)) == ["notes.txt", "scan-2.csv.gz", "scan-3.ndjson.gz"]
+
+
+@pytest.mark.asyncio
+async def test_prune_drops_exports_of_scans_retention_deleted(catalogue, tmp_path):
+    kept = cached_export(tmp_path, export.export_filename(catalogue["snapshot"], ExportFormat.PARQUET), 10, served=0)
+    deleted_scan_id = max(catalogue.values()) + 1000
+    cached_export(tmp_path, export.export_filename(deleted_scan_id, ExportFormat.CSV), 10, served=0)
+
+    await export.prune_export_cache(str(tmp_path), max_bytes=2**20)
+
+    assert os.listdir(tmp_path) == [kept.name]
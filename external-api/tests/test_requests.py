@@ -0,0 +1,64 @@
+import pytest
+from conftest import PART_COUNT
+from fastapi import HTTPException
+
+from db.requests import decode_cursor, encode_cursor, parts_query, search_parts, stream_parts
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(42, 1234567890123)
+
+    assert decode_cursor(cursor) == (42, 1234567890123)
+
+
+@pytest.mark.parametrize("cursor", ["zz", "bm90IGEgY3Vyc29y", encode_cursor(1, 2)[:-2]])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as err:
+        decode_cursor(cursor)
+
+    assert err.value.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["snapshot", "ranges"])
+async def test_pages_follow_the_cursor_to_the_last_part(catalogue, storage):
+    scan_id = catalogue[storage]
+    pages, cursor = [], None
+
+    while True:
+        rows, cursor = await search_parts(limit=10, scan_id=scan_id, cursor=cursor)
+        pages.append(rows)
+        if cursor is None:
+            break
+
+    assert [len(rows) for rows in pages] == [10, 10, 5]
+    part_numbers = [row["part_number"] for rows in pages for row in rows]
+    assert part_numbers == [f"{i:03}" for i in range(PART_COUNT)]
+    _, query = await parts_query(scan_id=scan_id)
+    assert [row async for row in stream_parts(query)] == [row for rows in pages for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_cursor_pins_the_scan_it_was_issued_for(catalogue):
+    rows, cursor = await search_parts(limit=10, scan_id=catalogue["snapshot"])
+
+    with pytest.raises(HTTPException) as err:
+        await search_parts(limit=10, scan_id=catalogue["ranges"], cursor=cursor)
+    assert err.value.status_code == 400
+
+    # the ranges scan is the latest one, the cursor still pages through the snapshot scan
+    next_rows, _ = await search_parts(limit=10, cursor=cursor)
+    assert [row["part_number"] for row in next_rows] == [f"{i:03}" for i in range(10, 20)]
+
+
+@pytest.mark.asyncio
+async def test_search_takes_wildcards_literally(catalogue):
+    rows, _ = await search_parts(limit=100, scan_id=catalogue["snapshot"], maker="r_2")
+
+    assert {row["maker"] for row in rows} == {"MAKER_2"}
+    assert len(rows) == PART_COUNT // 2
+    # as wildcards both would match MAKER 1
+    for maker in ("r_1", "r%1"):
+        with pytest.raises(HTTPException) as err:
+            await search_parts(limit=100, scan_id=catalogue["snapshot"], maker=maker)
+        assert err.value.status_code == 404
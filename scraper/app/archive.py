@@ -0,0 +1,167 @@
+import mmap
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+from http import HTTPStatus
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+from loguru import logger
+
+GZIP_WBITS = 31
+READ_CHUNK = 64 * 1024
+
+
+class ArchiveMiss(KeyError):
+    """A replayed scan asked for a page its archive doesn't hold."""
+
+
+class ArchiveRecord(NamedTuple):
+    url: str
+    status_code: int
+    body: bytes
+
+
+def archive_paths(directory: Path, scan_id: int) -> list[Path]:
+    """The archive files of a scan, one per node for a distributed scan."""
+    directory = Path(directory)
+    return sorted([*directory.glob(f"scan-{scan_id}.warc.gz"), *directory.glob(f"scan-{scan_id}-*.warc.gz")])
+
+
+def archive_path(directory: Path, scan_id: int, node_id: Optional[str] = None) -> Path:
+    name = f"scan-{scan_id}-{node_id}" if node_id else f"scan-{scan_id}"
+    return Path(directory) / f"{name}.warc.gz"
+
+
+def warc_record(record_type: str, headers: dict[str, str], block: bytes) -> bytes:
+    header_lines = {
+        "WARC-Type": record_type,
+        "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>",
+        "WARC-Date": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        **headers,
+        "Content-Length": str(len(block)),
+    }
+    head = "WARC/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in header_lines.items()) + "\r\n"
+    return head.encode() + block + b"\r\n\r\n"
+
+
+def parse_warc_record(data: bytes) -> tuple[dict[str, str], bytes]:
+    head, _, rest = data.partition(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")[1:]
+    headers = dict(line.split(": ", 1) for line in lines)
+    length = int(headers["Content-Length"])
+    return headers, rest[:length]
+
+
+class ArchiveWriter:
+    """Append-only WARC file of the pages fetched in a scan, one gzip member per record.
+
+    Every record is compressed on its own, so a file cut short by a crash keeps
+    all complete records, and a resumed scan simply appends to it.
+    """
+
+    def __init__(self, path: Path, scan_id: int, compress_level: int = 6):
+        self.path = Path(path)
+        self.compress_level = compress_level
+        self.records = 0
+        self.bytes = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = self.path.open("ab")
+        self._lock = threading.Lock()
+        if new_file:
+            info = f"software: catalogue-scraper\r\nscan-id: {scan_id}\r\n".encode()
+            self._append(warc_record("warcinfo", {"Content-Type": "application/warc-fields"}, info))
+
+    def _append(self, record: bytes, responses: int = 0) -> None:
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, GZIP_WBITS)
+        member = compressor.compress(record) + compressor.flush()
+        with self._lock:
+            self._file.write(member)
+            self.bytes += len(member)
+            self.records += responses
+
+    def write(self, url: str, status_code: int, body: bytes) -> None:
+        """Append a response record, safe to call from several threads."""
+        http = (
+            f"HTTP/1.1 {status_code} {HTTPStatus(status_code).phrase}\r\n"
+            f"Content-Type: text/html\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        headers = {"WARC-Target-URI": url, "Content-Type": "application/http; msgtype=response"}
+        self._append(warc_record("response", headers, http.encode() + body), responses=1)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+        logger.info(f"archived {self.records} pages to {self.path} ({self.bytes / 2**20:.1f} MB)")
+
+
+class ArchiveReader:
+    """Random access to the responses of archive files by url.
+
+    Opening maps the files and indexes the offset of every response record,
+    get() inflates just the record asked for.
+    """
+
+    def __init__(self, paths: list[Path]):
+        self._maps: list[mmap.mmap] = []
+        self._index: dict[str, tuple[int, int, int]] = {}
+        for path in paths:
+            with Path(path).open("rb") as archive_file:
+                if archive_file.seek(0, 2) == 0:
+                    continue
+                self._maps.append(mmap.mmap(archive_file.fileno(), 0, access=mmap.ACCESS_READ))
+            self._index_file(len(self._maps) - 1)
+        logger.info(f"indexed {len(self._index)} archived pages from {len(self._maps)} files")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _members(self, file_index: int) -> Iterator[tuple[int, int, bytes]]:
+        """Offset, compressed length and contents of every complete record of a file."""
+        view = memoryview(self._maps[file_index])
+        offset = 0
+        while offset < len(view):
+            decompressor = zlib.decompressobj(GZIP_WBITS)
+            chunks = []
+            position = offset
+            try:
+                # fed in chunks, unused_data would otherwise copy the rest of the file for every record
+                while not decompressor.eof and position < len(view):
+                    end = position + READ_CHUNK
+                    chunks.append(decompressor.decompress(view[position:end]))
+                    position = min(end, len(view))
+            except zlib.error as err:
+                logger.warning(f"archive truncated at byte {offset}: {err}")
+                return
+            if not decompressor.eof:
+                logger.warning(f"archive truncated at byte {offset}: incomplete record")
+                return
+            length = position - offset - len(decompressor.unused_data)
+            yield offset, length, b"".join(chunks)
+            offset += length
+
+    def _index_file(self, file_index: int) -> None:
+        for offset, length, data in self._members(file_index):
+            headers, _ = parse_warc_record(data)
+            if headers.get("WARC-Type") == "response":
+                # a page recorded twice, by a resumed scan, is served from its last record
+                self._index[headers["WARC-Target-URI"]] = (file_index, offset, length)
+
+    def get(self, url: str) -> ArchiveRecord:
+        location = self._index.get(url)
+        if location is None:
+            raise ArchiveMiss(url)
+        file_index, offset, length = location
+        end = offset + length
+        data = zlib.decompress(self._maps[file_index][offset:end], GZIP_WBITS)
+        _, block = parse_warc_record(data)
+        status_line, _, rest = block.partition(b"\r\n")
+        _, _, body = rest.partition(b"\r\n\r\n")
+        return ArchiveRecord(url=url, status_code=int(status_line.split()[1]), body=body)
+
+    def close(self) -> None:
+        for archive_map in self._maps:
+            archive_map.close()
+        self._maps.clear()
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from loguru import logger
+
+from db.database import Postgres
+from db.queries import INSERT_FRONTIER_QUERY, MARK_FRONTIER_DONE_QUERY
+
+
+class FrontierCheckpoint:
+    """Buffers enqueued and finished pages of a scan and writes them to crawl_frontier in batches.
+
+    Enqueued pages are always flushed before finished ones, so a page is never
+    marked done without its children being saved.
+    """
+
+    def __init__(self, database: Postgres, scan_id: int, batch_size: int, interval: float):
+        self.database = database
+        self.scan_id = scan_id
+        self.batch_size = batch_size
+        self.interval = interval
+        self._enqueued: list[tuple] = []
+        self._done: list[str] = []
+        self._flush_needed = asyncio.Event()
+
+    def enqueued(self, url: str, level: str, directory: dict[str, str]) -> None:
+        self._enqueued.append((self.scan_id, url, level, json.dumps(directory)))
+        self._check_batch()
+
+    def done(self, url: str) -> None:
+        self._done.append(url)
+        self._check_batch()
+
+    def _check_batch(self) -> None:
+        if len(self._enqueued) + len(self._done) >= self.batch_size:
+            self._flush_needed.set()
+
+    async def flush(self) -> None:
+        enqueued, self._enqueued = self._enqueued, []
+        done, self._done = self._done, []
+        enqueued_count, done_count = len(enqueued), len(done)
+        try:
+            if enqueued:
+                await self.database.executemany(INSERT_FRONTIER_QUERY, enqueued)
+                enqueued = []
+            if done:
+                await self.database.execute(MARK_FRONTIER_DONE_QUERY, self.scan_id, done)
+        except Exception:
+            # put back what wasn't written ahead of what was buffered meanwhile, the next flush retries it
+            self._enqueued[:0] = enqueued
+            self._done[:0] = done
+            raise
+        if enqueued_count or done_count:
+            logger.debug(f"frontier checkpoint: {enqueued_count} enqueued, {done_count} done")
+
+    async def run(self) -> None:
+        """Flush every `interval` seconds, or sooner once a batch is full, until cancelled."""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.flush()
+            except Exception as err:
+                logger.error(f"frontier checkpoint failed: {err}")
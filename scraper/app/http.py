@@ -0,0 +1,38 @@
+import httpx
+
+from config.settings import HttpClientConfig
+from models import ScrapingStatus
+
+
+def create_http_client(config: HttpClientConfig, status: ScrapingStatus) -> httpx.AsyncClient:
+    """Build the scraper's shared client and count requests, new connections and TLS handshakes in status.http."""
+
+    async def trace(event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            status.http.connections += 1
+        elif event_name == "connection.start_tls.complete":
+            status.http.tls_handshakes += 1
+
+    async def on_request(request: httpx.Request):
+        request.extensions["trace"] = trace
+
+    async def on_response(response: httpx.Response):
+        status.http.requests += 1
+        if response.http_version == "HTTP/2":
+            status.http.http2_responses += 1
+
+    return httpx.AsyncClient(
+        http2=config.http2,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            connect=config.connect_timeout,
+            read=config.read_timeout,
+            write=config.write_timeout,
+            pool=config.pool_timeout,
+        ),
+        event_hooks={"request": [on_request], "response": [on_response]},
+    )
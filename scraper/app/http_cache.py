@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from loguru import logger
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+
+
+def conditional_headers(cached: Optional[CachedResponse]) -> dict[str, str]:
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+    return headers
+
+
+class ResponseCache:
+    """On-disk cache of page bodies with their validators, one file per URL.
+
+    A file holds a JSON header line (url, etag, last_modified) followed by the
+    zlib-compressed body. The least recently used files are removed once the
+    directory grows past `max_bytes`. Pages are cached from several worker
+    threads at once, so the index and size are only touched under a lock.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = sorted(self.directory.glob("*.cache"), key=lambda path: path.stat().st_mtime)
+        self._sizes: OrderedDict[Path, int] = OrderedDict((path, path.stat().st_size) for path in files)
+        self.size = sum(self._sizes.values())
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode()).hexdigest()}.cache"
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        path = self._path(url)
+        with self._lock:
+            if path not in self._sizes:
+                return None
+        try:
+            with path.open("rb") as cache_file:
+                header = json.loads(cache_file.readline())
+                body = zlib.decompress(cache_file.read())
+        except (OSError, ValueError, zlib.error) as err:
+            logger.warning(f"dropping unreadable cache entry for {url}: {err}")
+            self._remove(path)
+            return None
+        with self._lock:
+            if path not in self._sizes:
+                # evicted by another thread while it was read
+                return None
+            self._sizes.move_to_end(path)
+        os.utime(path)
+        return CachedResponse(etag=header.get("etag"), last_modified=header.get("last_modified"), body=body)
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes) -> None:
+        path = self._path(url)
+        header = json.dumps({"url": url, "etag": etag, "last_modified": last_modified}).encode()
+        data = header + b"\n" + zlib.compress(body)
+        # a temporary file of its own, two threads may cache the same url at once
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_file.name, path)
+
+        with self._lock:
+            self.size -= self._sizes.pop(path, 0)
+            self._sizes[path] = len(data)
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self._sizes) > 1:
+                self._evict(next(iter(self._sizes)))
+
+    def _remove(self, path: Path) -> None:
+        with self._lock:
+            self._evict(path)
+
+    def _evict(self, path: Path) -> None:
+        """Remove an entry, with the lock held."""
+        self.size -= self._sizes.pop(path, 0)
+        path.unlink(missing_ok=True)
@@ -0,0 +1,33 @@
+"""Prometheus metrics of the scraper, served by the `/metrics` endpoint.
+
+Fetch, parse and flush timings are split so a slow scan shows whether it is
+bound by the network, the parser or the database.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+FETCH_SECONDS = Histogram("scraper_fetch_seconds", "Catalogue page request latency", ["level"], buckets=LATENCY_BUCKETS)
+HTTP_RESPONSES = Counter(
+    "scraper_http_responses_total",
+    "Catalogue page responses by status code, `error` when none was received",
+    ["status"],
+)
+RETRIES = Counter("scraper_retries_total", "Page fetches queued again after a failure", ["level"])
+DROPPED_PAGES = Counter("scraper_dropped_pages_total", "Pages given up on after the last retry", ["level"])
+PAGES = Counter("scraper_pages_total", "Pages processed", ["level"])
+PARSE_SECONDS = Histogram("scraper_parse_seconds", "Catalogue page parse time", ["level"], buckets=PARSE_BUCKETS)
+DB_FLUSH_SECONDS = Histogram(
+    "scraper_db_flush_seconds", "Duration of a parts batch insert", ["mode"], buckets=LATENCY_BUCKETS
+)
+DB_FLUSH_ROWS = Counter("scraper_db_rows_total", "Parts rows inserted", ["mode"])
+QUEUE_DEPTH = Gauge("scraper_queue_depth", "Pages waiting in the crawl frontier of this node")
+RETRY_DEFERRED = Gauge("scraper_retry_deferred", "Failed pages waiting out their retry backoff on this node")
+VISITED_URLS = Gauge("scraper_visited_urls", "Pages visited in the current scan")
+WRITER_QUEUE_DEPTH = Gauge("scraper_writer_queue_depth", "Parsed parts pages waiting for the writer")
+PIPELINE_UTILIZATION = Gauge(
+    "scraper_pipeline_utilization", "Share of worker time a pipeline stage spent busy in the current scan", ["stage"]
+)
+PIPELINE_QUEUE_DEPTH = Gauge("scraper_pipeline_queue_depth", "Items waiting for a pipeline stage", ["stage"])
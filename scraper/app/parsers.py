@@ -0,0 +1,69 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+
+from config.settings import ParseExecutor, ParserBackend, ScraperConfig
+from models import CatalogueLevels
+
+# (href, link text) of one catalogue entry
+RawLink = tuple[str, str]
+
+
+def _catalogue_items_xpath(level: CatalogueLevels) -> etree.XPath:
+    # the catalogue list is the first div whose last class is the level name,
+    # XPath 1.0 has no ends-with() so the tail of the class attribute is compared
+    classes = "concat(' ', normalize-space(@class))"
+    tail = f"substring({classes}, string-length({classes}) - {len(level.value)})"
+    return etree.XPath(f"(//div[{tail} = ' {level.value}'])[1]//li")
+
+
+CATALOGUE_ITEMS_XPATHS = {level: _catalogue_items_xpath(level) for level in CatalogueLevels}
+FIRST_ANCHOR_XPATH = etree.XPath("(.//a)[1]")
+
+
+def parse_links_lxml(content: bytes, level: CatalogueLevels) -> list[RawLink]:
+    """Extract catalogue links with compiled XPath, without building a soup."""
+    root = lxml_html.document_fromstring(content)
+    parsed_links = []
+    for li in CATALOGUE_ITEMS_XPATHS[level](root):
+        anchors = FIRST_ANCHOR_XPATH(li)
+        if anchors:
+            parsed_links.append((anchors[0].get("href"), anchors[0].text_content().strip()))
+
+    return parsed_links
+
+
+def parse_links_soup(content: bytes, level: CatalogueLevels) -> list[RawLink]:
+    """Extract catalogue links from a full BeautifulSoup tree."""
+    soup = BeautifulSoup(content, "lxml")
+    catalogue_divs = [i for i in soup.find_all("div") if i.get("class") and i.get("class")[-1] == level]
+    list_items = catalogue_divs[0].find_all("li")
+    parsed_links = []
+    for li in list_items:
+        a_tag = li.find("a")
+        if a_tag:
+            parsed_links.append((a_tag.get("href"), a_tag.text.strip()))
+
+    return parsed_links
+
+
+PARSERS = {
+    ParserBackend.LXML: parse_links_lxml,
+    ParserBackend.SOUP: parse_links_soup,
+}
+
+
+def parse_links(content: bytes, level: CatalogueLevels, backend: ParserBackend) -> list[RawLink]:
+    return PARSERS[backend](content, level)
+
+
+def create_parse_executor(config: ScraperConfig) -> Optional[Executor]:
+    """Pool that parse_links runs in, so big pages don't block the fetch workers on the event loop."""
+    if config.parse_executor == ParseExecutor.PROCESS:
+        return ProcessPoolExecutor(max_workers=config.parse_workers)
+    if config.parse_executor == ParseExecutor.THREAD:
+        return ThreadPoolExecutor(max_workers=config.parse_workers, thread_name_prefix="parser")
+    return None
@@ -0,0 +1,52 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class Stage:
+    """Worker pool of one scan pipeline stage, with the time its workers spend busy.
+
+    Stages hand items on through bounded queues, so a slow stage holds back the
+    one feeding it instead of letting work pile up in memory. Utilization is the
+    share of worker time spent on the stage's own work since start(): close to 1
+    for the bottleneck stage, low for a stage waiting on its input. Waiting on
+    the next stage or the rate limiter doesn't count as busy.
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: Optional[int] = None):
+        self.name = name
+        self.workers = workers
+        # None for a stage fed by something else, like the crawl frontier
+        self.queue: Optional[asyncio.Queue] = asyncio.Queue(maxsize=queue_size) if queue_size is not None else None
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._started: Optional[float] = None
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self, worker: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+        """Run `workers` copies of `worker`, or only start the clock for a stage with workers of its own."""
+        self._started = time.monotonic()
+        if worker is not None:
+            self._tasks = [asyncio.create_task(worker(), name=f"{self.name}-{i}") for i in range(self.workers)]
+
+    def record(self, seconds: float, items: int = 1) -> None:
+        """Time a worker spent on the stage's own work for `items` items."""
+        self.busy_seconds += seconds
+        self.items += items
+
+    @property
+    def utilization(self) -> float:
+        if self._started is None or not self.workers:
+            return 0.0
+        elapsed = time.monotonic() - self._started
+        return min(1.0, self.busy_seconds / (self.workers * elapsed)) if elapsed > 0 else 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,112 @@
+import cProfile
+import enum
+import marshal
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+
+class ProfileMode(str, enum.Enum):
+    CPROFILE = "cprofile"
+    SAMPLER = "sampler"
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread.
+
+    The result is in the collapsed format of flamegraph.pl and speedscope, one
+    `outer;inner count` line per distinct stack.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> bytes:
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common()).encode()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+
+class CpuProfiler:
+    """cProfile or stack sampler over the event loop thread, started from a request handler."""
+
+    def __init__(self, mode: ProfileMode, interval: float):
+        self.mode = mode
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        if mode == ProfileMode.CPROFILE:
+            self._profile = cProfile.Profile()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), interval)
+
+    def start(self) -> None:
+        if self._profile is not None:
+            # profiles the calling thread, which is the event loop running the scan
+            self._profile.enable()
+        else:
+            self._sampler.start()
+
+    def stop(self) -> bytes:
+        """pstats file contents for cProfile, collapsed stacks for the sampler."""
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.create_stats()
+            return marshal.dumps(self._profile.stats)
+        return self._sampler.stop()
+
+
+class Profiling:
+    """The profilers attached to the running app, at most one of each kind at a time."""
+
+    def __init__(self):
+        self.cpu: Optional[CpuProfiler] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start_cpu(self, mode: ProfileMode, interval: float) -> None:
+        if self.cpu is not None:
+            raise RuntimeError("profiler is running")
+        self.cpu = CpuProfiler(mode, interval)
+        self.cpu.start()
+
+    def stop_cpu(self) -> tuple[ProfileMode, bytes]:
+        if self.cpu is None:
+            raise RuntimeError("profiler is not running")
+        cpu, self.cpu = self.cpu, None
+        return cpu.mode, cpu.stop()
+
+    def start_memory(self, frames: int) -> None:
+        if self._snapshot is not None:
+            raise RuntimeError("tracemalloc is running")
+        tracemalloc.start(frames)
+        self._snapshot = tracemalloc.take_snapshot()
+
+    def stop_memory(self, limit: int) -> str:
+        """The allocations that grew the most since start_memory(), as text."""
+        if self._snapshot is None:
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        first, self._snapshot = self._snapshot, None
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = snapshot.filter_traces(filters).compare_to(first.filter_traces(filters), "lineno")
+        return "".join(f"{stat}\n" for stat in diff[:limit])
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from loguru import logger
+
+from config.settings import ScraperConfig
+
+
+class AdaptiveRateLimiter:
+    """Token bucket plus concurrency limit for one host, with AIMD rate adjustment.
+
+    The rate grows by `rate_increase` after every window of `window_size` healthy
+    responses whose mean latency stays under `target_latency`, and is multiplied by
+    `rate_decrease` on 429/5xx or connection errors (at most once per `cooldown`).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        concurrency: int,
+        min_rate: float,
+        max_rate: float,
+        max_concurrency: int,
+        target_latency: float,
+        rate_increase: float = 1.0,
+        rate_decrease: float = 0.5,
+        window_size: int = 20,
+        cooldown: float = 1.0,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.rate_increase = rate_increase
+        self.rate_decrease = rate_decrease
+        self.window_size = window_size
+        self.cooldown = cooldown
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.concurrency = min(max(concurrency, 1), max_concurrency)
+        self.in_flight = 0
+
+        self._tokens = 1.0
+        self._refilled_at = time.monotonic()
+        self._decreased_at = 0.0
+        self._token_lock = asyncio.Lock()
+        self._slots = asyncio.Condition()
+        self._window_responses = 0
+        self._window_latency = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for a token, then for a free concurrency slot, and hold the slot for one request."""
+        await self._take_token()
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._slots:
+                self.in_flight -= 1
+                self._slots.notify()
+
+    async def _take_token(self):
+        # the lock queues waiters in arrival order, only its holder sleeps for the next token
+        async with self._token_lock:
+            while True:
+                now = time.monotonic()
+                burst = max(1.0, float(self.concurrency))
+                self._tokens = min(burst, self._tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def record(self, latency: float, status_code: Optional[int]) -> None:
+        """Feed one response (status_code None for transport errors) back into the rate."""
+        if status_code is None or status_code == 429 or status_code >= 500:
+            now = time.monotonic()
+            if now - self._decreased_at >= self.cooldown:
+                self._decreased_at = now
+                self.rate = max(self.min_rate, self.rate * self.rate_decrease)
+                logger.warning(f"rate limit decreased to {self.rate:.2f} req/s (status: {status_code})")
+            self._window_responses = 0
+            self._window_latency = 0.0
+            return
+
+        self._window_responses += 1
+        self._window_latency += latency
+        if self._window_responses >= self.window_size:
+            if self._window_latency / self._window_responses <= self.target_latency:
+                self.rate = min(self.max_rate, self.rate + self.rate_increase)
+                logger.debug(f"rate limit increased to {self.rate:.2f} req/s")
+            self._window_responses = 0
+            self._window_latency = 0.0
+
+    async def update(self, rate: Optional[float] = None, concurrency: Optional[int] = None) -> None:
+        if rate is not None:
+            self.rate = min(max(rate, self.min_rate), self.max_rate)
+        if concurrency is not None:
+            self.concurrency = min(max(concurrency, 1), self.max_concurrency)
+            async with self._slots:
+                self._slots.notify_all()
+
+
+class RateLimiterRegistry:
+    """One AdaptiveRateLimiter per host, created on first use with the configured defaults."""
+
+    def __init__(self, config: ScraperConfig):
+        self.config = config
+        self._limiters: dict[str, AdaptiveRateLimiter] = {}
+
+    def for_host(self, host: str) -> AdaptiveRateLimiter:
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(
+                rate=self.config.rate_limit,
+                concurrency=self.config.concurrent_requests,
+                min_rate=self.config.min_rate_limit,
+                max_rate=self.config.max_rate_limit,
+                max_concurrency=self.config.max_concurrent_requests,
+                target_latency=self.config.target_latency,
+            )
+            self._limiters[host] = limiter
+        return limiter
+
+    def items(self):
+        return self._limiters.items()
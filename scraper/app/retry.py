@@ -0,0 +1,65 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from httpx import HTTPError, HTTPStatusError, TimeoutException
+
+from config.settings import ErrorClass, RetryConfig, RetryPolicy
+
+
+def classify_error(err: HTTPError) -> ErrorClass:
+    if isinstance(err, HTTPStatusError):
+        status_code = err.response.status_code
+        if status_code == 429:
+            return ErrorClass.THROTTLED
+        if status_code >= 500:
+            return ErrorClass.SERVER
+        return ErrorClass.CLIENT
+    if isinstance(err, TimeoutException):
+        return ErrorClass.TIMEOUT
+    # transport errors and anything raised without a response
+    return ErrorClass.CONNECTION
+
+
+def error_status_code(err: HTTPError) -> Optional[int]:
+    return err.response.status_code if isinstance(err, HTTPStatusError) else None
+
+
+def retry_after(err: HTTPError) -> Optional[float]:
+    """Seconds asked for by the Retry-After header of a 429/503 response, in seconds or as an HTTP date."""
+    if not isinstance(err, HTTPStatusError):
+        return None
+    value = err.response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(policy: RetryPolicy, attempt: int, jitter: float, rng: random.Random = random) -> float:
+    """Exponential backoff after the failed `attempt`, the last `jitter` share of it drawn at random.
+
+    The jitter spreads the retries of pages that failed together, so they don't
+    hit the host again as one burst.
+    """
+    delay = min(policy.max_delay, policy.base_delay * 2 ** (attempt - 1))
+    return delay * (1 - jitter) + rng.uniform(0, delay * jitter)
+
+
+def plan_retry(
+    err: HTTPError, attempt: int, config: RetryConfig, rng: random.Random = random
+) -> tuple[ErrorClass, Optional[float]]:
+    """Error class of a fetch that failed on its `attempt`, and the delay before the next one or None to give up."""
+    error_class = classify_error(err)
+    policy = config.policies[error_class]
+    if attempt >= policy.max_attempts:
+        return error_class, None
+    # a server asking for a longer pause gets it
+    return error_class, max(backoff(policy, attempt, config.jitter, rng), retry_after(err) or 0.0)
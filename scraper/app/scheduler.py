@@ -0,0 +1,330 @@
+import asyncio
+import heapq
+import itertools
+import json
+import tempfile
+from typing import Callable, Optional
+
+from loguru import logger
+
+from db.database import Postgres
+from db.queries import (
+    CLAIM_FRONTIER_QUERY,
+    COUNT_PENDING_FRONTIER_QUERY,
+    ENQUEUE_FRONTIER_QUERY,
+    MARK_FRONTIER_DONE_QUERY,
+    RELEASE_FRONTIER_QUERY,
+)
+
+from .visited import UrlHashSet, UrlSet
+
+
+class SpillFile:
+    """Append-only FIFO of json lines in an anonymous temporary file."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self._file = tempfile.TemporaryFile(mode="w+b", dir=directory)
+        self._write_pos = 0
+        self._read_pos = 0
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def append(self, item) -> None:
+        self._file.seek(self._write_pos)
+        self._file.write(json.dumps(item).encode() + b"\n")
+        self._write_pos = self._file.tell()
+        self._len += 1
+
+    def pop(self):
+        self._file.seek(self._read_pos)
+        item = json.loads(self._file.readline())
+        self._read_pos = self._file.tell()
+        self._len -= 1
+        if not self._len:
+            # drained, start over instead of growing the file
+            self._file.seek(0)
+            self._file.truncate()
+            self._write_pos = self._read_pos = 0
+        return item
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class DeferredPages:
+    """Pages waiting out their retry backoff, kept in a heap by due time.
+
+    One timer task sleeps until the earliest page is due and hands every due
+    page to `release`, so backoff holds neither a worker nor a fetch slot.
+    """
+
+    def __init__(self, release: Callable[[object], None]):
+        self.release = release
+        self._heap: list = []
+        self._order = itertools.count()
+        self._changed = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, payload, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        heapq.heappush(self._heap, (loop.time() + delay, next(self._order), payload))
+        self._drained.clear()
+        self._changed.set()
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+
+    async def drained(self) -> None:
+        await self._drained.wait()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._heap:
+            due = self._heap[0][0]
+            if due <= loop.time():
+                _, _, payload = heapq.heappop(self._heap)
+                self.release(payload)
+                continue
+            # woken early when a page due sooner is pushed
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), due - loop.time())
+            except asyncio.TimeoutError:
+                pass
+        self._task = None
+        self._drained.set()
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._heap.clear()
+        self._drained.set()
+
+
+class CrawlScheduler:
+    """Crawl frontier served lowest `priority(payload)` first, FIFO within a priority.
+
+    URLs are deduplicated when they are enqueued: a page that is queued, in
+    flight or already visited is not queued again, only retries bypass that.
+    Like asyncio.Queue, join() returns once every queued page was marked done
+    and no retry is waiting out its backoff.
+
+    With a `memory_limit`, pages queued while that many are held in memory are
+    spilled to a temporary file per priority, stored as `encode(payload)` plus
+    the attempt and rebuilt with `decode(url, level, directory, attempt)`. They
+    are loaded back as soon as pages are taken from memory, so memory only runs
+    empty once nothing is spilled.
+    """
+
+    def __init__(
+        self,
+        priority: Callable[[object], int] = lambda payload: 0,
+        seen: Optional[UrlSet] = None,
+        memory_limit: Optional[int] = None,
+        encode: Optional[Callable[[object], tuple[str, str, str]]] = None,
+        decode: Optional[Callable[[str, str, str, int], object]] = None,
+        spill_dir: Optional[str] = None,
+    ):
+        self.priority = priority
+        self.memory_limit = memory_limit
+        self.encode = encode
+        self.decode = decode
+        self.spill_dir = spill_dir
+        self.spilled = 0
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._seen = seen if seen is not None else UrlHashSet()
+        self._spill: dict[int, SpillFile] = {}
+        self._deferred = DeferredPages(self._push)
+
+    def __len__(self) -> int:
+        return self._queue.qsize() + self.spilled_pending()
+
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def spilled_pending(self) -> int:
+        return sum(len(spill) for spill in self._spill.values())
+
+    @property
+    def deferred(self) -> int:
+        """Retries waiting out their backoff, not counted in len()."""
+        return len(self._deferred)
+
+    async def put(self, payload) -> bool:
+        """Queue a page unless its url was seen before, return whether it was queued."""
+        url = payload.link.url.geturl()
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        self._push(payload)
+        return True
+
+    async def put_many(self, payloads: list) -> list:
+        """Queue several pages, return the ones that were queued."""
+        return [payload for payload in payloads if await self.put(payload)]
+
+    async def retry(self, payload, delay: float = 0.0) -> None:
+        """Queue a failed page again once `delay` seconds have passed."""
+        if delay > 0:
+            self._deferred.push(payload, delay)
+        else:
+            self._push(payload)
+
+    async def discard(self, payload) -> None:
+        """Give up on a page. Nothing is left to do in memory, the caller records it as a dead letter.
+
+        Its checkpoint row stays pending only until the scan finishes and deletes
+        its frontier, so it is the `dead_letters` table that keeps the page.
+        """
+
+    def _push(self, payload) -> None:
+        priority = self.priority(payload)
+        spill = self._spill.get(priority)
+        if self.memory_limit is not None and (self._queue.qsize() >= self.memory_limit or spill):
+            if spill is None:
+                spill = self._spill[priority] = SpillFile(self.spill_dir)
+            spill.append([*self.encode(payload), payload.attempt])
+            self.spilled += 1
+            return
+        self._queue.put_nowait((priority, next(self._order), payload))
+
+    def _unspill(self) -> None:
+        for priority in sorted(self._spill):
+            spill = self._spill[priority]
+            while spill and self._queue.qsize() < self.memory_limit:
+                self._queue.put_nowait((priority, next(self._order), self.decode(*spill.pop())))
+
+    async def get(self):
+        _, _, payload = await self._queue.get()
+        if self._spill:
+            self._unspill()
+        return payload
+
+    def task_done(self) -> None:
+        self._queue.task_done()
+
+    async def join(self) -> None:
+        while True:
+            await self._queue.join()
+            if not self._deferred:
+                return
+            # released pages are queued before the heap runs empty, the next join() waits for them
+            await self._deferred.drained()
+
+    def close(self) -> None:
+        self._deferred.close()
+        for spill in self._spill.values():
+            spill.close()
+        self._spill.clear()
+
+
+class DistributedScheduler:
+    """Crawl frontier of a scan shared by several scraper nodes through the crawl_frontier table.
+
+    Pages are claimed in batches with `FOR UPDATE SKIP LOCKED` and leased to the
+    claiming node for `lease_timeout` seconds, a page whose node died is claimed
+    again once its lease expired. Pages are finished by marking their row done,
+    join() returns once no row of the scan is left undone on any node.
+
+    `encode` turns a payload into (url, level, directory json) and `decode`
+    builds it back from (url, level, directory json, attempt).
+    """
+
+    def __init__(
+        self,
+        database: Postgres,
+        scan_id: int,
+        node_id: str,
+        encode: Callable[[object], tuple[str, str, str]],
+        decode: Callable[[str, str, str, int], object],
+        priority: Callable[[object], int] = lambda payload: 0,
+        lease_timeout: float = 60.0,
+        claim_batch_size: int = 10,
+        poll_interval: float = 1.0,
+    ):
+        self.database = database
+        self.scan_id = scan_id
+        self.node_id = node_id
+        self.encode = encode
+        self.decode = decode
+        self.priority = priority
+        self.lease_timeout = lease_timeout
+        self.claim_batch_size = claim_batch_size
+        self.poll_interval = poll_interval
+        self._claimed: list = []
+        self._claim_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._claimed)
+
+    def empty(self) -> bool:
+        return not self._claimed
+
+    async def put(self, payload) -> bool:
+        return bool(await self.put_many([payload]))
+
+    async def put_many(self, payloads: list) -> list:
+        """Add pages to the shared frontier, return the ones no node had queued before."""
+        if not payloads:
+            return []
+        rows = [self.encode(payload) for payload in payloads]
+        queued = await self.database.fetch(
+            ENQUEUE_FRONTIER_QUERY,
+            self.scan_id,
+            [url for url, _, _ in rows],
+            [level for _, level, _ in rows],
+            [directory for _, _, directory in rows],
+            [self.priority(payload) for payload in payloads],
+        )
+        queued_urls = {row[0] for row in queued}
+        return [payload for payload, (url, _, _) in zip(payloads, rows) if url in queued_urls]
+
+    @property
+    def deferred(self) -> int:
+        # deferred pages are released rows of the shared frontier
+        return 0
+
+    async def retry(self, payload, delay: float = 0.0) -> None:
+        """Release the page with its attempt count, any node may claim it again once `delay` seconds have passed."""
+        url, _, _ = self.encode(payload)
+        await self.database.execute(RELEASE_FRONTIER_QUERY, self.scan_id, url, payload.attempt, delay)
+
+    async def discard(self, payload) -> None:
+        """Give up on a page, it is marked done so the scan can finish."""
+        url, _, _ = self.encode(payload)
+        await self.database.execute(MARK_FRONTIER_DONE_QUERY, self.scan_id, [url])
+
+    async def get(self):
+        async with self._claim_lock:
+            while not self._claimed:
+                rows = await self.database.fetch(
+                    CLAIM_FRONTIER_QUERY, self.scan_id, self.node_id, self.lease_timeout, self.claim_batch_size
+                )
+                if not rows:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                logger.debug(f"{self.node_id} claimed {len(rows)} pages of scan {self.scan_id}")
+                # served from the end of the list, highest priority value first in
+                rows = sorted(rows, key=lambda row: row[4], reverse=True)
+                self._claimed = [
+                    self.decode(url, level, directory, attempt) for url, level, directory, attempt, _ in rows
+                ]
+            return self._claimed.pop()
+
+    def task_done(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    async def join(self) -> None:
+        while await self.database.fetchval(COUNT_PENDING_FRONTIER_QUERY, self.scan_id):
+            await asyncio.sleep(self.poll_interval)
@@ -1,65 +1,264 @@
 import asyncio
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import json
+import resource
+import sys
+import time
 import urllib
 import urllib.parse
 from datetime import datetime
+from typing import Optional
 
-import httpx
 from asyncpg import PostgresError
-from bs4 import BeautifulSoup
-from httpx import HTTPError
+from httpx import AsyncClient, HTTPError
 from loguru import logger
 
+from app.archive import ArchiveMiss, ArchiveReader, ArchiveWriter, archive_path, archive_paths
+from app.frontier import FrontierCheckpoint
+from app.http_cache import ResponseCache, conditional_headers
+from app.metrics import (
+    DB_FLUSH_ROWS,
+    DB_FLUSH_SECONDS,
+    DROPPED_PAGES,
+    FETCH_SECONDS,
+    HTTP_RESPONSES,
+    PAGES,
+    PARSE_SECONDS,
+    PIPELINE_QUEUE_DEPTH,
+    PIPELINE_UTILIZATION,
+    QUEUE_DEPTH,
+    RETRIES,
+    RETRY_DEFERRED,
+    VISITED_URLS,
+    WRITER_QUEUE_DEPTH,
+)
+from app.parsers import RawLink, create_parse_executor, parse_links
+from app.pipeline import Stage
+from app.ratelimit import RateLimiterRegistry
+from app.retry import error_status_code, plan_retry
+from app.scheduler import CrawlScheduler, DistributedScheduler
+from app.visited import create_url_set
+from app.writer import PartsWriter
+from config.settings import InsertMode, ParserBackend, ScanScope, ScraperConfig, StorageMode
 from db.database import Postgres
-from db.queries import GET_NEW_SCAN_ID, INSERT_DATA_QUERY, SCAN_ENDED
+from db.queries import (
+    CARRY_FORWARD_PAGE_HASHES_QUERY,
+    CARRY_FORWARD_PARTS_QUERY,
+    CARRY_FORWARD_RANGES_QUERY,
+    COPY_SUBTREE_PARTS_QUERY,
+    DELETE_FRONTIER_QUERY,
+    EXTEND_SUBTREE_RANGES_QUERY,
+    FINISH_SCAN_QUERY,
+    GET_NEW_SCAN_ID,
+    GET_PREVIOUS_SCAN_ID,
+    GET_SCAN_SETTINGS_QUERY,
+    INSERT_DEAD_LETTER_QUERY,
+    INSERT_PAGE_HASH,
+    INSERT_PART_RANGE_QUERY,
+    INSERT_PARTS_QUERY,
+    MERGE_STAGED_PART_RANGES_QUERY,
+    MERGE_STAGED_PARTS_QUERY,
+    PARTS_STAGING_COLUMNS,
+    PARTS_STAGING_TABLE,
+    SCAN_ENDED,
+    SELECT_FRONTIER_QUERY,
+    SELECT_PAGE_HASHES,
+    SET_SCAN_SCOPE_QUERY,
+    SET_SCAN_STAGE_SECONDS_QUERY,
+)
 from models import (
-    REQUEST_DELAY,
+    ArchiveStats,
+    CacheStats,
     CatalogueLevels,
     CatalogueLink,
     CataloguePart,
+    DirectoryPath,
+    HttpStats,
+    IncrementalStats,
+    InsertStats,
+    MemoryStats,
     PartDetails,
+    PipelineStageStats,
+    RetryStats,
     ScraperContext,
     ScraperPayload,
     ScrapingStatus,
+    StageStats,
+    WriterStats,
 )
 
-CONCURRENT_REQUESTS = 10
+# deeper levels first: parts pages reach the database early and the frontier stays small
+LEVEL_PRIORITY = {
+    CatalogueLevels.PARTS: 0,
+    CatalogueLevels.MODELS: 1,
+    CatalogueLevels.CATEGORIES: 2,
+    CatalogueLevels.MAKERS: 3,
+}
+
 
+def crawl_priority(payload: ScraperPayload) -> int:
+    return LEVEL_PRIORITY[payload.level]
+
+
+async def fetch_html(payload: ScraperPayload, ctx: ScraperContext) -> bytes:
+    """Page body from the archive of a replayed scan, otherwise from the site, recorded when archiving."""
+    url = payload.link.url.geturl()
+    if ctx.replay is not None:
+        return replay_page(url, ctx)
+    content = await fetch_from_site(payload, ctx)
+    if ctx.archive is not None:
+        # compressed off the event loop
+        await asyncio.to_thread(ctx.archive.write, url, 200, content)
+        ctx.scraping_status.archive.recorded = ctx.archive.records
+        ctx.scraping_status.archive.recorded_bytes = ctx.archive.bytes
+    return content
+
+
+def record_busy(name: str, seconds: float, ctx: ScraperContext) -> None:
+    """Count time spent on a stage's own work, network I/O for fetch and parsing for parse, towards its utilization."""
+    stage = ctx.pipeline.get(name)
+    if stage is not None:
+        stage.record(seconds)
+
+
+def replay_page(url: str, ctx: ScraperContext) -> bytes:
+    started = time.perf_counter()
+    try:
+        record = ctx.replay.get(url)
+    except ArchiveMiss:
+        ctx.scraping_status.archive.misses += 1
+        raise
+    ctx.scraping_status.archive.replayed += 1
+    elapsed = time.perf_counter() - started
+    ctx.scraping_status.stages.fetch += elapsed
+    record_busy("fetch", elapsed, ctx)
+    return record.body
 
-async def fetch_html(payload: ScraperPayload, ctx: ScraperContext) -> str:
-    async with ctx.semaphore:
-        await asyncio.sleep(payload.delay)
+
+async def fetch_from_site(payload: ScraperPayload, ctx: ScraperContext) -> bytes:
+    url = payload.link.url.geturl()
+    cache = ctx.response_cache
+    cached = await asyncio.to_thread(cache.get, url) if cache else None
+    limiter = ctx.rate_limiters.for_host(payload.link.url.netloc)
+    waiting = time.perf_counter()
+    async with limiter.slot():
+        started = time.perf_counter()
+        ctx.scraping_status.stages.limiter_wait += started - waiting
+        status_code = None
         try:
-            url = payload.link.url.geturl()
             logger.debug(f"fetching {url}")
-            resp = await ctx.http_client.get(url)
+            resp = await ctx.http_client.get(url, headers=conditional_headers(cached))
+            status_code = resp.status_code
+            if cached is not None and status_code == 304:
+                ctx.scraping_status.cache.hits += 1
+                ctx.scraping_status.cache.bytes_saved += len(cached.body)
+                return cached.body
             resp.raise_for_status()
-            return resp.text
         except HTTPError as err:
             logger.error(f"failed to fetch {url}: {err}")
             raise err
+        finally:
+            latency = time.perf_counter() - started
+            ctx.scraping_status.stages.fetch += latency
+            record_busy("fetch", latency, ctx)
+            limiter.record(latency=latency, status_code=status_code)
+            FETCH_SECONDS.labels(payload.level.value).observe(latency)
+            HTTP_RESPONSES.labels("error" if status_code is None else str(status_code)).inc()
+
+    if cache:
+        ctx.scraping_status.cache.misses += 1
+        etag, last_modified = resp.headers.get("etag"), resp.headers.get("last-modified")
+        if etag or last_modified:
+            await asyncio.to_thread(cache.put, url, etag, last_modified, resp.content)
+    return resp.content
+
+
+def build_links(raw_links: list[RawLink], payload: ScraperPayload) -> list[CatalogueLink]:
+    url = payload.link.url
+    directory = payload.link.directory
+    return [
+        CatalogueLink(url=url._replace(path=href), directory=directory.child(payload.level, text))
+        for href, text in raw_links
+    ]
+
+
+def extract_links(
+    content: bytes, payload: ScraperPayload, backend: ParserBackend = ParserBackend.LXML
+) -> list[CatalogueLink]:
+    return build_links(parse_links(content, payload.level, backend), payload)
+
+
+async def parse_page(content: bytes, payload: ScraperPayload, ctx: ScraperContext) -> list[CatalogueLink]:
+    backend = ctx.config.parser_backend
+    started = time.perf_counter()
+    if ctx.parse_executor is None:
+        links = extract_links(content=content, payload=payload, backend=backend)
+    else:
+        loop = asyncio.get_running_loop()
+        raw_links = await loop.run_in_executor(ctx.parse_executor, parse_links, content, payload.level, backend)
+        links = build_links(raw_links, payload)
+    elapsed = time.perf_counter() - started
+    ctx.scraping_status.stages.parse += elapsed
+    PARSE_SECONDS.labels(payload.level.value).observe(elapsed)
+    return links
 
 
-def extract_links(soup: BeautifulSoup, payload: ScraperPayload) -> list[CatalogueLink]:
-    catalogue_divs = [i for i in soup.find_all("div") if i.get("class") and i.get("class")[-1] == payload.level]
-    list_items = catalogue_divs[0].find_all("li")
-    parsed_links = []
-    for li in list_items:
-        a_tag = li.find("a")
-        if a_tag:
-            link = a_tag.get("href")
-            catalogue_link = CatalogueLink(url=payload.link.url._replace(path=link), directory=payload.link.directory)
-            text = a_tag.text.strip()
-            catalogue_link.directory[payload.level] = text
-            parsed_links.append(catalogue_link)
+def frontier_row(payload: ScraperPayload) -> tuple[str, str, str]:
+    """The url, level and json directory a payload is stored with in crawl_frontier."""
+    directory = {level.value: name for level, name in payload.link.directory.items()}
+    return payload.link.url.geturl(), payload.level.value, json.dumps(directory)
 
-    return parsed_links
+
+def frontier_payload(url: str, level: str, directory: str, attempt: int = 1) -> ScraperPayload:
+    link = CatalogueLink(
+        url=urllib.parse.urlparse(url),
+        directory=DirectoryPath((CatalogueLevels(name), value) for name, value in json.loads(directory).items()),
+    )
+    return ScraperPayload(link=link, level=CatalogueLevels(level), attempt=attempt)
+
+
+def checkpoint_enqueued(payload: ScraperPayload, ctx: ScraperContext) -> None:
+    # a distributed frontier is written by the scheduler itself
+    if ctx.checkpoint is not None and not isinstance(ctx.queue, DistributedScheduler):
+        directory = {level.value: name for level, name in payload.link.directory.items()}
+        ctx.checkpoint.enqueued(payload.link.url.geturl(), payload.level.value, directory)
+
+
+def in_scope(directory: DirectoryPath, scope: ScanScope) -> bool:
+    """Whether a link can lead to parts within the scan's scope, levels the link doesn't reach yet always match."""
+    levels = (
+        (CatalogueLevels.MAKERS, scope.makers),
+        (CatalogueLevels.CATEGORIES, scope.categories),
+        (CatalogueLevels.MODELS, scope.models),
+    )
+    for level, names in levels:
+        if names and level in directory and directory[level].lower() not in names:
+            return False
+    return True
 
 
 async def enqueue_links(links: list[CatalogueLink], next_level: CatalogueLevels, ctx: ScraperContext) -> None:
-    for link in links:
-        new_payload = ScraperPayload(link=link, level=next_level)
+    if not ctx.config.scope.full:
+        links = [link for link in links if in_scope(link.directory, ctx.config.scope)]
+    payloads = [ScraperPayload(link=link, level=next_level) for link in links]
+    for new_payload in await ctx.queue.put_many(payloads):
         logger.debug(f"queue put {new_payload}")
-        await ctx.queue.put(new_payload)
+        checkpoint_enqueued(new_payload, ctx)
+
+
+async def load_frontier(database: Postgres, scan_id: int) -> tuple[list[ScraperPayload], set[str]]:
+    """Pending payloads and visited urls of an unfinished scan's checkpoint."""
+    pending = []
+    visited = set()
+    for url, level, directory, done in await database.fetch(SELECT_FRONTIER_QUERY, scan_id):
+        if done:
+            visited.add(url)
+            continue
+        pending.append(frontier_payload(url, level, directory))
+    return pending, visited
 
 
 def parse_parts(links: list[CatalogueLink]) -> list[PartDetails]:
@@ -81,40 +280,186 @@ def parse_parts(links: list[CatalogueLink]) -> list[PartDetails]:
 
 
 async def insert_parts(parts: list[PartDetails], ctx: ScraperContext):
+    db = ctx.db_connection
+    started = time.perf_counter()
     try:
+        makers = await db.resolve_dimension_ids("makers", (p.maker for p in parts))
+        categories = await db.resolve_dimension_ids("categories", (p.category for p in parts))
+        models = await db.resolve_dimension_ids("models", (p.model for p in parts))
         parts_set = set(
-            [(p.maker, p.category, p.model, p.part.number, p.part.category, p.part.url, ctx.scan_id) for p in parts]
-        )
-        await ctx.db_connection.executemany(
-            INSERT_DATA_QUERY,
-            parts_set,
+            [
+                (
+                    makers[p.maker],
+                    categories[p.category],
+                    models[p.model],
+                    p.part.number,
+                    p.part.category,
+                    p.part.url,
+                    ctx.scan_id,
+                )
+                for p in parts
+            ]
         )
+        if ctx.config.storage_mode == StorageMode.RANGES:
+            await insert_part_ranges(parts_set, ctx)
+        elif ctx.config.insert_mode == InsertMode.COPY:
+            await db.copy_and_execute(
+                PARTS_STAGING_TABLE,
+                records=parts_set,
+                columns=PARTS_STAGING_COLUMNS,
+                query=MERGE_STAGED_PARTS_QUERY,
+            )
+        else:
+            await db.executemany(
+                INSERT_PARTS_QUERY,
+                parts_set,
+            )
         if len(parts) > len(parts_set):
             logger.warning(f"duplicates in bulk insert: {len(parts) - len(parts_set)}")
-        logger.debug(f"insert query complete items: {len(parts_set)}")
     except PostgresError as err:
-        logger.error(f"db insertion failed: items: {len(parts_set)}")
+        logger.error(f"db insertion failed: items: {len(parts)}")
         raise err
 
+    elapsed = time.perf_counter() - started
+    ctx.scraping_status.insert.record(rows=len(parts_set), seconds=elapsed)
+    ctx.scraping_status.stages.insert += elapsed
+    DB_FLUSH_SECONDS.labels(ctx.config.insert_mode.value).observe(elapsed)
+    DB_FLUSH_ROWS.labels(ctx.config.insert_mode.value).inc(len(parts_set))
+    logger.debug(f"insert query complete items: {len(parts_set)}, {len(parts_set) / elapsed:.0f} rows/sec")
+
+
+async def insert_part_ranges(rows: set[tuple], ctx: ScraperContext) -> None:
+    """Extend the ranges of parts already seen in the previous scan to the current one, start ranges for new parts."""
+    if ctx.config.insert_mode == InsertMode.COPY:
+        await ctx.db_connection.copy_and_execute(
+            PARTS_STAGING_TABLE,
+            rows,
+            PARTS_STAGING_COLUMNS,
+            MERGE_STAGED_PART_RANGES_QUERY,
+            ctx.scan_id,
+            ctx.previous_scan_id,
+        )
+    else:
+        await ctx.db_connection.executemany(INSERT_PART_RANGE_QUERY, [(*row, ctx.previous_scan_id) for row in rows])
+
+
+def page_hash(links: list[CatalogueLink], level: CatalogueLevels) -> str:
+    """Hash of the entries listed on a catalogue page, blind to markup that doesn't change the links."""
+    entries = sorted(f"{link.url.path}\t{link.directory.get(level, '')}" for link in links)
+    return hashlib.sha256("\n".join(entries).encode()).hexdigest()
+
+
+async def copy_subtree_forward(payload: ScraperPayload, ctx: ScraperContext) -> None:
+    """Copy the previous scan's parts of an unchanged maker/category subtree into the current scan.
+
+    With range storage the ranges of the subtree's parts are extended instead.
+    """
+    maker = payload.link.directory[CatalogueLevels.MAKERS]
+    category = payload.link.directory[CatalogueLevels.CATEGORIES]
+    makers = await ctx.db_connection.resolve_dimension_ids("makers", [maker])
+    categories = await ctx.db_connection.resolve_dimension_ids("categories", [category])
+    query = EXTEND_SUBTREE_RANGES_QUERY if ctx.config.storage_mode == StorageMode.RANGES else COPY_SUBTREE_PARTS_QUERY
+    result = await ctx.db_connection.execute(
+        query, ctx.scan_id, ctx.previous_scan_id, makers[maker], categories[category]
+    )
+    copied_rows = int(result.split()[-1])
+    ctx.scraping_status.incremental.skipped_subtrees += 1
+    ctx.scraping_status.incremental.copied_rows += copied_rows
+    logger.debug(f"unchanged subtree {maker} / {category}: copied {copied_rows} parts")
+
+
+async def carry_forward(database: Postgres, config: ScraperConfig, scan_id: int, previous_scan_id: int) -> int:
+    """Carry the previous scan's parts outside the scope of a partial scan into it, return the number of parts."""
+    scope = config.scope
+    query = CARRY_FORWARD_RANGES_QUERY if config.storage_mode == StorageMode.RANGES else CARRY_FORWARD_PARTS_QUERY
+    result = await database.execute(
+        query, scan_id, previous_scan_id, scope.makers or None, scope.categories or None, scope.models or None
+    )
+    await database.execute(CARRY_FORWARD_PAGE_HASHES_QUERY, scan_id, previous_scan_id)
+    return int(result.split()[-1])
+
 
-async def process_page(payload: ScraperPayload, ctx: ScraperContext) -> None:
+def mark_visited(url: str, ctx: ScraperContext) -> None:
+    ctx.visited_urls.add(url)
+    if ctx.checkpoint is not None:
+        ctx.checkpoint.done(url)
+
+
+def mark_pages_visited(urls: list[str], ctx: ScraperContext) -> None:
+    for url in urls:
+        mark_visited(url, ctx)
+
+
+async def retry_page(payload: ScraperPayload, err: HTTPError, ctx: ScraperContext) -> None:
+    """Defer a failed page for its backoff, or record it as a dead letter when its error class allows no retry."""
     url = payload.link.url.geturl()
     level = payload.level
+    error_class, delay = plan_retry(err, payload.attempt, ctx.config.retry)
+    retries = ctx.scraping_status.retries
+    if delay is not None:
+        logger.debug(
+            f"retrying fetch {url} in {delay:.2f}s - attempt: {payload.attempt + 1}, {error_class.value}: {err}"
+        )
+        RETRIES.labels(level.value).inc()
+        retries.retried += 1
+        await ctx.queue.retry(dataclasses.replace(payload, attempt=payload.attempt + 1), delay)
+        return
+
+    logger.warning(f"giving up on {url} after {payload.attempt} attempts, {error_class.value}: {err}")
+    DROPPED_PAGES.labels(level.value).inc()
+    retries.dead_letters += 1
+    await ctx.db_connection.execute(
+        INSERT_DEAD_LETTER_QUERY,
+        ctx.scan_id,
+        url,
+        level.value,
+        payload.attempt,
+        error_class.value,
+        str(err),
+        error_status_code(err),
+    )
+    await ctx.queue.discard(payload)
+
+
+async def fetch_page(payload: ScraperPayload, ctx: ScraperContext) -> Optional[bytes]:
+    """Content of a page, None when it was visited already or failed and went to its retry or dead letter."""
+    url = payload.link.url.geturl()
     if url in ctx.visited_urls:
         logger.debug(f"visited url: {url}")
-        return
+        return None
 
     try:
-        html_text = await fetch_html(payload, ctx)
+        return await fetch_html(payload, ctx)
     except HTTPError as err:
-        payload.attempt += 1
-        payload.delay *= 2
-        logger.debug(f"retrying fetch {url.geturl()} - attempt:{payload.attempt}, delay: {payload.delay}, error: {err}")
-        if payload.attempt <= 3:
-            await ctx.queue.put(payload)
+        await retry_page(payload, err, ctx)
+    except ArchiveMiss:
+        logger.warning(f"{url} is not in the archive of scan {ctx.config.replay_scan_id}")
+        DROPPED_PAGES.labels(payload.level.value).inc()
+        await ctx.queue.discard(payload)
+    return None
+
+
+async def handle_page(payload: ScraperPayload, content: bytes, ctx: ScraperContext) -> None:
+    """Parse a fetched page, queue its links and hand its parts to the writer."""
+    url = payload.link.url.geturl()
+    level = payload.level
+    started = time.perf_counter()
+    links = await parse_page(content=content, payload=payload, ctx=ctx)
+    content_hash = page_hash(links, level) if level != CatalogueLevels.PARTS else None
+    parts = parse_parts(links=links) if level == CatalogueLevels.PARTS else []
+    # queueing links and handing parts on wait on the database and the writer, which isn't parse work
+    record_busy("parse", time.perf_counter() - started, ctx)
 
-    soup = BeautifulSoup(html_text, "lxml")
-    links = extract_links(soup=soup, payload=payload)
+    if content_hash is not None:
+        await ctx.db_connection.execute(INSERT_PAGE_HASH, ctx.scan_id, url, level.value, content_hash)
+        if (
+            ctx.config.incremental
+            and level == CatalogueLevels.MODELS
+            and ctx.previous_page_hashes.get(url) == content_hash
+        ):
+            await copy_subtree_forward(payload, ctx)
+            mark_visited(url, ctx)
+            return
 
     if level == CatalogueLevels.MAKERS:
         await enqueue_links(links=links, next_level=CatalogueLevels.CATEGORIES, ctx=ctx)
@@ -123,53 +468,298 @@ async def process_page(payload: ScraperPayload, ctx: ScraperContext) -> None:
     elif level == CatalogueLevels.MODELS:
         await enqueue_links(links=links, next_level=CatalogueLevels.PARTS, ctx=ctx)
     elif level == CatalogueLevels.PARTS:
-        parts = parse_parts(links=links)
+        if ctx.writer is not None:
+            # the page is marked visited once the writer flushed its parts
+            await ctx.writer.put(url, parts)
+            return
         await insert_parts(parts=parts, ctx=ctx)
 
-    ctx.visited_urls.add(url)
+    mark_visited(url, ctx)
+
 
+def create_pipeline(config: ScraperConfig) -> dict[str, Stage]:
+    """Stages of a scan: fetch workers feed parse workers through a bounded queue, parse workers feed the writer."""
+    return {
+        # the rate limiter decides how many requests run at once, fetch workers only bound its maximum
+        "fetch": Stage("fetch", config.max_concurrent_requests),
+        "parse": Stage("parse", config.parse_workers, queue_size=config.parse_queue_size),
+        "write": Stage("write", config.writer_workers),
+    }
 
-async def scraper_worker(ctx: ScraperContext):
+
+async def fetch_worker(ctx: ScraperContext, parse_stage: Stage) -> None:
+    """Fetch pages from the frontier until cancelled, a fetched page counts as unfinished until it was parsed."""
     ctx.scraping_status.scraping = True
-    while not ctx.queue.empty():
+    while True:
+        waiting = time.perf_counter()
         payload = await ctx.queue.get()
+        ctx.scraping_status.stages.queue_wait += time.perf_counter() - waiting
+        content = None
+        try:
+            content = await fetch_page(payload, ctx)
+        except Exception as err:
+            logger.error(err)
+        if content is None:
+            ctx.queue.task_done()
+            continue
+        # blocks while the parse stage is behind, which holds back fetching instead of piling up pages
+        await parse_stage.queue.put((payload, content))
+
+
+async def parse_worker(ctx: ScraperContext, stage: Stage) -> None:
+    """Parse fetched pages until cancelled, run_scraper cancels the workers once the frontier is drained."""
+    while True:
+        payload, content = await stage.queue.get()
         try:
-            await process_page(payload, ctx)
+            await handle_page(payload, content, ctx)
             ctx.scraping_status.scraping_counter += 1
+            PAGES.labels(payload.level.value).inc()
         except Exception as err:
             logger.error(err)
         finally:
+            stage.queue.task_done()
             ctx.queue.task_done()
 
 
-async def run_scraper(database: Postgres, status: ScrapingStatus):
-    logger.info("running scraping...")
-    queue = asyncio.Queue()
-    semaphore = asyncio.Semaphore(CONCURRENT_REQUESTS)
-    base_url = "https://www.urparts.com/"
-    url = f"{base_url}index.cfm/page/catalogue"
-
-    scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now())
-
-    async with httpx.AsyncClient() as http_client:
-        context = ScraperContext(
-            semaphore=semaphore,
-            visited_urls=set(),
-            queue=queue,
-            http_client=http_client,
-            db_connection=database,
-            scan_id=scan_id,
-            scraping_status=status,
+def update_pipeline_status(stages: dict[str, Stage], ctx: ScraperContext) -> None:
+    status = ctx.scraping_status
+    queue_depths = {
+        "fetch": len(ctx.queue),
+        "parse": stages["parse"].queue_depth,
+        "write": status.writer.queue_depth,
+    }
+    for name, stage in stages.items():
+        status.pipeline[name] = PipelineStageStats(
+            workers=stage.workers,
+            items=stage.items,
+            busy_seconds=stage.busy_seconds,
+            utilization=stage.utilization,
+            queue_depth=queue_depths[name],
         )
+        PIPELINE_UTILIZATION.labels(name).set(stage.utilization)
+        PIPELINE_QUEUE_DEPTH.labels(name).set(queue_depths[name])
+    status.retries.deferred = ctx.queue.deferred
+    QUEUE_DEPTH.set(queue_depths["fetch"])
+    RETRY_DEFERRED.set(ctx.queue.deferred)
+    VISITED_URLS.set(len(ctx.visited_urls))
+    WRITER_QUEUE_DEPTH.set(queue_depths["write"])
+
+
+async def monitor_pipeline(stages: dict[str, Stage], ctx: ScraperContext, interval: float = 1.0) -> None:
+    while True:
+        update_pipeline_status(stages, ctx)
+        await asyncio.sleep(interval)
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def run_scraper(
+    database: Postgres,
+    status: ScrapingStatus,
+    config: ScraperConfig,
+    rate_limiters: RateLimiterRegistry,
+    http_client: AsyncClient,
+    scan_id: Optional[int] = None,
+) -> int:
+    """Run a new scan, or resume the unfinished scan `scan_id` from its frontier checkpoint, return the scan id."""
+    logger.info(
+        f"running scraping... insert mode: {config.insert_mode.value}, storage: {config.storage_mode.value}, "
+        f"parser: {config.parser_backend.value} ({config.parse_executor.value} x{config.parse_workers})"
+    )
+    url = f"{config.base_url}index.cfm/page/catalogue"
+
+    new_scan = scan_id is None
+    if new_scan:
+        scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now(), config.storage_mode.value)
+        if config.storage_mode == StorageMode.SNAPSHOT:
+            await database.create_parts_partition(scan_id)
+        if not config.scope.full:
+            await database.execute(SET_SCAN_SCOPE_QUERY, scan_id, config.scope.model_dump_json())
+    else:
+        # a resumed or joined scan keeps the storage and scope it was started with
+        storage, scope = (await database.fetch(GET_SCAN_SETTINGS_QUERY, scan_id))[0]
+        scope = ScanScope.model_validate_json(scope) if scope else ScanScope()
+        config = config.model_copy(update={"storage_mode": StorageMode(storage), "scope": scope})
+        if config.storage_mode == StorageMode.SNAPSHOT:
+            # scans from before parts were partitioned may have none yet
+            await database.create_parts_partition(scan_id)
+    visited_urls = create_url_set(config)
+    seen_urls = create_url_set(config)
+    if new_scan or config.distributed:
+        # a node joining a distributed scan finds its pages in the shared frontier, the root is already queued
         link = CatalogueLink(url=urllib.parse.urlparse(url))
-        status.scraping = True
-        try:
-            await queue.put(ScraperPayload(link=link, level=CatalogueLevels.MAKERS, attempt=1, delay=REQUEST_DELAY))
-            tasks = [asyncio.create_task(scraper_worker(ctx=context)) for _ in range(CONCURRENT_REQUESTS)]
-            await queue.join()
-            for task in tasks:
-                task.cancel()
-        finally:
-            status.scraping = False
+        pending = [ScraperPayload(link=link, level=CatalogueLevels.MAKERS)]
+    else:
+        pending, done_urls = await load_frontier(database, scan_id)
+        for done_url in done_urls:
+            visited_urls.add(done_url)
+            seen_urls.add(done_url)
+        logger.info(f"resuming scan {scan_id}: {len(pending)} pending pages, {len(done_urls)} done")
+        del done_urls
+    await database.preload_dimensions()
+
+    previous_scan_id = None
+    previous_page_hashes = {}
+    if config.incremental or config.storage_mode == StorageMode.RANGES or not config.scope.full:
+        # part ranges continue from the previous scan of the same storage
+        previous_scan_id = await database.fetchval(GET_PREVIOUS_SCAN_ID, scan_id, config.storage_mode.value)
+    if new_scan and not config.scope.full:
+        if previous_scan_id is None:
+            logger.warning(f"partial scan {scan_id} has no previous scan, only its scope will be stored")
+        else:
+            carried = await carry_forward(database, config, scan_id, previous_scan_id)
+            logger.info(
+                f"partial scan {scan_id} of {config.scope}: carried {carried} parts from scan {previous_scan_id}"
+            )
+    if config.incremental:
+        if previous_scan_id is not None:
+            rows = await database.fetch(SELECT_PAGE_HASHES, previous_scan_id, CatalogueLevels.MODELS.value)
+            previous_page_hashes = {page_url: content_hash for page_url, content_hash in rows}
+        logger.info(f"incremental scan against scan {previous_scan_id}: {len(previous_page_hashes)} model pages")
+
+    parse_executor = create_parse_executor(config)
+    response_cache = None
+    if config.http_cache_dir:
+        response_cache = await asyncio.to_thread(ResponseCache, config.http_cache_dir, config.http_cache_max_bytes)
+    archive, replay = None, None
+    if config.replay_scan_id is not None:
+        # no network and no rate limit, pages are parsed as fast as the archive inflates
+        paths = archive_paths(config.archive_dir, config.replay_scan_id)
+        replay = await asyncio.to_thread(ArchiveReader, paths)
+        logger.info(f"scan {scan_id} replays scan {config.replay_scan_id}: {len(replay)} pages in {len(paths)} files")
+    elif config.archive_dir:
+        node_id = config.node_id if config.distributed else None
+        archive = ArchiveWriter(archive_path(config.archive_dir, scan_id, node_id), scan_id)
+    if config.distributed:
+        queue = DistributedScheduler(
+            database,
+            scan_id,
+            config.node_id,
+            encode=frontier_row,
+            decode=frontier_payload,
+            priority=crawl_priority,
+            lease_timeout=config.lease_timeout,
+            claim_batch_size=config.claim_batch_size,
+            poll_interval=config.frontier_poll_interval,
+        )
+        logger.info(f"node {config.node_id} working on distributed scan {scan_id}")
+    else:
+        queue = CrawlScheduler(
+            priority=crawl_priority,
+            seen=seen_urls,
+            memory_limit=config.frontier_memory_limit,
+            encode=frontier_row,
+            decode=frontier_payload,
+            spill_dir=config.frontier_spill_dir,
+        )
+    checkpoint = FrontierCheckpoint(database, scan_id, config.checkpoint_batch_size, config.checkpoint_interval)
+    status.scraping = True
+    status.scraping_counter = 0
+    status.insert = InsertStats(mode=config.insert_mode.value)
+    status.http = HttpStats()
+    status.cache = CacheStats()
+    status.archive = ArchiveStats()
+    status.incremental = IncrementalStats(previous_scan_id=previous_scan_id if config.incremental else None)
+    status.writer = WriterStats()
+    status.stages = StageStats()
+    status.scan_id = scan_id
+    status.memory = MemoryStats()
+    status.retries = RetryStats()
+    status.pipeline = {}
+    context = ScraperContext(
+        rate_limiters=rate_limiters,
+        visited_urls=visited_urls,
+        queue=queue,
+        http_client=http_client,
+        db_connection=database,
+        scan_id=scan_id,
+        scraping_status=status,
+        config=config,
+        parse_executor=parse_executor,
+        response_cache=response_cache,
+        archive=archive,
+        replay=replay,
+        previous_scan_id=previous_scan_id,
+        previous_page_hashes=previous_page_hashes,
+        checkpoint=checkpoint,
+    )
+    stages = create_pipeline(config)
+    context.pipeline = stages
+    context.writer = PartsWriter(
+        write=functools.partial(insert_parts, ctx=context),
+        on_flushed=functools.partial(mark_pages_visited, ctx=context),
+        stats=status.writer,
+        flush_rows=config.writer_flush_rows,
+        flush_interval=config.writer_flush_interval,
+        max_pending=config.writer_max_pending,
+        workers=config.writer_workers,
+        stage=stages["write"],
+    )
+    context.writer.start()
+    checkpoint_task = asyncio.create_task(checkpoint.run())
+    monitor_task = asyncio.create_task(monitor_pipeline(stages, context))
+    try:
+        for payload in pending:
+            if await queue.put(payload) and new_scan:
+                checkpoint_enqueued(payload, context)
+        stages["write"].start()
+        stages["parse"].start(functools.partial(parse_worker, context, stages["parse"]))
+        stages["fetch"].start(functools.partial(fetch_worker, context, stages["parse"]))
+        await queue.join()
+        # a failed flush fails the scan, it isn't marked finished and keeps its frontier for /resume
+        await context.writer.close()
+    finally:
+        status.scraping = False
+        for stage in stages.values():
+            await stage.stop()
+        with contextlib.suppress(Exception):
+            # still open when the scan failed already, its flush errors were logged
+            await context.writer.close()
+        monitor_task.cancel()
+        update_pipeline_status(stages, context)
+        checkpoint_task.cancel()
+        await checkpoint.flush()
+        if parse_executor is not None:
+            parse_executor.shutdown(cancel_futures=True)
+        queue.close()
+        if archive is not None:
+            archive.close()
+        if replay is not None:
+            replay.close()
+        status.memory = MemoryStats(
+            visited_urls=len(visited_urls),
+            visited_bytes=visited_urls.nbytes,
+            spilled_pages=queue.spilled if isinstance(queue, CrawlScheduler) else 0,
+            peak_rss_bytes=peak_rss_bytes(),
+        )
 
-    await database.execute(SCAN_ENDED, scan_id, datetime.now())
+    if config.distributed:
+        # every node sees the frontier drain, the first one to get here ends the scan
+        finished = await database.fetchval(FINISH_SCAN_QUERY, scan_id, datetime.now()) is not None
+    else:
+        await database.execute(SCAN_ENDED, scan_id, datetime.now())
+        finished = True
+    if finished:
+        await database.execute(DELETE_FRONTIER_QUERY, scan_id)
+        if config.retain_scans:
+            await database.drop_expired_scans(keep=config.retain_scans)
+    await database.execute(SET_SCAN_STAGE_SECONDS_QUERY, scan_id, config.node_id, status.stages.model_dump_json())
+    logger.info(
+        f"scan {scan_id} finished: pages: {status.scraping_counter}, rows: {status.insert.rows}, "
+        f"insert rate ({status.insert.mode}): {status.insert.rows_per_sec:.0f} rows/sec, "
+        f"http requests: {status.http.requests}, new connections: {status.http.connections}, "
+        f"tls handshakes: {status.http.tls_handshakes}, connection reuse: {status.http.connection_reuse:.1%}, "
+        f"cache hits: {status.cache.hits}, misses: {status.cache.misses}, bytes saved: {status.cache.bytes_saved}, "
+        f"archived pages: {status.archive.recorded}, replayed pages: {status.archive.replayed}, "
+        f"unchanged subtrees: {status.incremental.skipped_subtrees}, copied rows: {status.incremental.copied_rows}, "
+        f"writer flushes: {status.writer.flushes}, max flush: {status.writer.max_flush_seconds:.2f}s, "
+        f"visited urls: {status.memory.visited_urls} ({status.memory.visited_bytes / 2**20:.1f} MB), "
+        f"spilled pages: {status.memory.spilled_pages}, peak rss: {status.memory.peak_rss_bytes / 2**20:.0f} MB, "
+        f"stage seconds: {status.stages.model_dump()}, "
+        f"utilization: {', '.join(f'{name} {stage.utilization:.0%}' for name, stage in status.pipeline.items())}"
+    )
+    return scan_id
@@ -0,0 +1,112 @@
+import hashlib
+import math
+from array import array
+from typing import Union
+
+from config.settings import ScraperConfig, VisitedSetMode
+
+
+def url_hash(url: str) -> int:
+    """64-bit hash of a url, never 0 so 0 can mark empty slots."""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "little") or 1
+
+
+class UrlHashSet:
+    """Set of urls stored as 64-bit hashes in an open addressing table.
+
+    Takes 8 bytes per slot instead of a python string per url, the chance of
+    two urls of a catalogue sharing a hash is negligible (~n^2 / 2^65).
+    """
+
+    MAX_LOAD = 0.6
+
+    def __init__(self, capacity: int = 1024):
+        size = 1 << max(4, math.ceil(math.log2(capacity / self.MAX_LOAD)))
+        self._slots = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, url: str) -> bool:
+        key = url_hash(url)
+        return self._slots[self._find(key)] == key
+
+    def add(self, url: str) -> None:
+        self._add_hash(url_hash(url))
+
+    @property
+    def nbytes(self) -> int:
+        return self._slots.itemsize * len(self._slots)
+
+    def _find(self, key: int) -> int:
+        """Slot holding the key, or the empty slot where it belongs."""
+        index = key & self._mask
+        while self._slots[index] not in (0, key):
+            index = (index + 1) & self._mask
+        return index
+
+    def _add_hash(self, key: int) -> None:
+        index = self._find(key)
+        if self._slots[index] == key:
+            return
+        self._slots[index] = key
+        self._len += 1
+        if self._len > self.MAX_LOAD * len(self._slots):
+            self._grow()
+
+    def _grow(self) -> None:
+        keys = [key for key in self._slots if key]
+        self._slots = array("Q", bytes(16 * len(self._slots)))
+        self._mask = len(self._slots) - 1
+        self._len = 0
+        for key in keys:
+            self._add_hash(key)
+
+
+class BloomFilter:
+    """Bloom filter of urls sized for `capacity` urls at the given false positive rate.
+
+    A false positive makes the scraper treat an unseen page as visited, so the
+    rate bounds the share of pages a scan may miss in exchange for a fixed size.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, url: str) -> bool:
+        return all(self._bits[bit >> 3] & (1 << (bit & 7)) for bit in self._bit_indexes(url))
+
+    def add(self, url: str) -> None:
+        added = False
+        for bit in self._bit_indexes(url):
+            if not self._bits[bit >> 3] & (1 << (bit & 7)):
+                self._bits[bit >> 3] |= 1 << (bit & 7)
+                added = True
+        self._len += added
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def _bit_indexes(self, url: str):
+        # double hashing: k indexes from two 64-bit halves of one digest
+        digest = hashlib.blake2b(url.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+
+UrlSet = Union[UrlHashSet, BloomFilter]
+
+
+def create_url_set(config: ScraperConfig) -> UrlSet:
+    if config.visited_set_mode == VisitedSetMode.BLOOM:
+        return BloomFilter(capacity=config.visited_capacity, error_rate=config.visited_error_rate)
+    return UrlHashSet()
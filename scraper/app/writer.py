@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+from .pipeline import Stage
+
+_STOP = object()
+
+
+class PartsWriter:
+    """Task that gathers parsed parts across pages and writes them in batches.
+
+    A batch is flushed once it holds `flush_rows` rows or its oldest page waited
+    `flush_interval` seconds, with up to `workers` flushes running at once while
+    the next batch is gathered. put() blocks while `max_pending` pages are queued,
+    which holds the parse stage back when the database falls behind. `on_flushed`
+    gets the urls of the pages whose parts were written.
+
+    A failed flush leaves its pages unfinished and is raised again by close(),
+    so the scan fails instead of being finished with parts missing.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list], Awaitable[None]],
+        on_flushed: Callable[[list[str]], None],
+        stats,
+        flush_rows: int,
+        flush_interval: float,
+        max_pending: int,
+        workers: int = 1,
+        stage: Optional[Stage] = None,
+    ):
+        self.write = write
+        self.on_flushed = on_flushed
+        self.stats = stats
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.stage = stage
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._slots = asyncio.Semaphore(workers)
+        self._flushes: set[asyncio.Task] = set()
+        self._task = None
+        self.error: Optional[Exception] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, url: str, parts: list) -> None:
+        await self._queue.put((url, parts))
+        self.stats.queue_depth = self._queue.qsize()
+
+    async def close(self) -> None:
+        """Write what is still queued and stop the writer task, raise the first failed flush."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(_STOP)
+        try:
+            await self._task
+        finally:
+            self._task = None
+        if self.error is not None:
+            raise self.error
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch, urls = [], []
+        deadline = None
+        has_slot = False
+        while True:
+            if not has_slot:
+                # a new batch is only started once a flush slot is free, so the queue fills up behind busy flushes
+                await self._slots.acquire()
+                has_slot = True
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                item = None
+            self.stats.queue_depth = self._queue.qsize()
+
+            if item is not None and item is not _STOP:
+                url, parts = item
+                batch.extend(parts)
+                urls.append(url)
+                if deadline is None:
+                    deadline = loop.time() + self.flush_interval
+
+            # a batch of pages without parts is still flushed, to mark them visited
+            if urls and (item is None or item is _STOP or len(batch) >= self.flush_rows):
+                flush = asyncio.create_task(self._flush(batch, urls))
+                self._flushes.add(flush)
+                flush.add_done_callback(self._flushes.discard)
+                batch, urls = [], []
+                deadline = None
+                has_slot = False
+            if item is _STOP:
+                await asyncio.gather(*self._flushes)
+                return
+
+    async def _flush(self, batch: list, urls: list[str]) -> None:
+        started = time.perf_counter()
+        try:
+            if batch:
+                await self.write(batch)
+        except Exception as err:
+            # the pages stay unfinished in the frontier checkpoint, close() fails the scan so it can be resumed
+            logger.error(f"writing {len(batch)} parts of {len(urls)} pages failed: {err}")
+            if self.error is None:
+                self.error = err
+            return
+        finally:
+            self._slots.release()
+            if self.stage is not None:
+                self.stage.record(time.perf_counter() - started, items=len(urls))
+        if batch:
+            self.stats.record(rows=len(batch), seconds=time.perf_counter() - started)
+        self.on_flushed(urls)
@@ -0,0 +1,124 @@
+"""Micro-benchmark of the crawl payload and part representations.
+
+Compares the slotted dataclasses of `models` against the pydantic models they
+replaced, building links and parts the way `build_links` and `parse_parts` do:
+
+    python -m benchmarks.bench_models --links 100000
+"""
+
+import argparse
+import timeit
+import tracemalloc
+from typing import Optional
+from urllib.parse import ParseResult as ParsedUrl
+from urllib.parse import urlparse
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.scraper import build_links, parse_parts
+from models import CatalogueLevels, CatalogueLink, ScraperPayload
+
+
+class PydanticPart(BaseModel):
+    number: str
+    category: str
+    url: str
+
+    model_config = ConfigDict(frozen=True)
+
+
+class PydanticPartDetails(BaseModel):
+    maker: Optional[str]
+    category: Optional[str]
+    model: Optional[str]
+    part: Optional[PydanticPart]
+
+    model_config = ConfigDict(frozen=True)
+
+
+class PydanticLink(BaseModel):
+    url: ParsedUrl
+    directory: dict[CatalogueLevels, str] = Field(default=dict())
+
+
+class PydanticPayload(BaseModel):
+    link: PydanticLink
+    level: CatalogueLevels
+    attempt: int = Field(default=1)
+    delay: float = Field(default=0.5)
+
+
+def pydantic_build_links(raw_links, payload: PydanticPayload) -> list[PydanticLink]:
+    parsed_links = []
+    for href, text in raw_links:
+        link = PydanticLink(url=payload.link.url._replace(path=href), directory=payload.link.directory)
+        link.directory[payload.level] = text
+        parsed_links.append(link)
+    return parsed_links
+
+
+def pydantic_parse_parts(links: list[PydanticLink]) -> list[PydanticPartDetails]:
+    parsed_parts = []
+    for link in links:
+        number, _, category = link.directory[CatalogueLevels.PARTS].partition(" - ")
+        part = PydanticPart(number=number, category=category, url=link.url.geturl())
+        parsed_parts.append(
+            PydanticPartDetails(
+                maker=link.directory[CatalogueLevels.MAKERS],
+                category=link.directory[CatalogueLevels.CATEGORIES],
+                model=link.directory[CatalogueLevels.MODELS],
+                part=part,
+            )
+        )
+    return parsed_parts
+
+
+def crawl_pydantic(raw_links):
+    directory = {CatalogueLevels.MAKERS: "MAKER", CatalogueLevels.CATEGORIES: "CATEGORY", CatalogueLevels.MODELS: "M"}
+    link = PydanticLink(url=urlparse("https://www.example.com/catalogue"), directory=directory)
+    links = pydantic_build_links(raw_links, PydanticPayload(link=link, level=CatalogueLevels.PARTS))
+    payloads = [PydanticPayload(link=link, level=CatalogueLevels.PARTS) for link in links]
+    return payloads, pydantic_parse_parts(links)
+
+
+def crawl_dataclasses(raw_links):
+    directory = {CatalogueLevels.MAKERS: "MAKER", CatalogueLevels.CATEGORIES: "CATEGORY", CatalogueLevels.MODELS: "M"}
+    link = CatalogueLink(url=urlparse("https://www.example.com/catalogue"), directory=directory)
+    links = build_links(raw_links, ScraperPayload(link=link, level=CatalogueLevels.PARTS))
+    payloads = [ScraperPayload(link=link, level=CatalogueLevels.PARTS) for link in links]
+    return payloads, parse_parts(links)
+
+
+def allocated_bytes(crawl, raw_links) -> int:
+    """Bytes still allocated while the links, payloads and parts of one round are alive."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = crawl(raw_links)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=20000, help="parts links per round")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    raw_links = [(f"/catalogue/part/{i}", f"{i:06d} - PART CATEGORY {i % 50}") for i in range(args.links)]
+    print(f"{args.links} links per round, {args.repeat} rounds")
+
+    for name, crawl in (("pydantic", crawl_pydantic), ("dataclass", crawl_dataclasses)):
+        seconds = min(timeit.repeat(lambda: crawl(raw_links), number=1, repeat=args.repeat))
+        memory = allocated_bytes(crawl, raw_links)
+        print(
+            f"{name:>9}: {seconds * 1000:8.2f} ms/round, {args.links / seconds:10.0f} links/s, "
+            f"{memory / 2**20:7.1f} MiB, {memory / args.links:6.0f} bytes/link"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Micro-benchmark of the catalogue link parser backends.
+
+Run from the scraper directory against saved pages:
+
+    python -m benchmarks.bench_parsers --level allparts saved/allparts_*.html
+
+Without page files a synthetic catalogue page with `--items` entries is used.
+"""
+
+import argparse
+import timeit
+from pathlib import Path
+
+from app.parsers import PARSERS
+from models import CatalogueLevels
+
+
+def synthetic_page(level: CatalogueLevels, items: int) -> bytes:
+    entries = "\n".join(f'<li><a href="/catalogue/{level.value}/{i}">{i:06d} - ITEM {i}</a></li>' for i in range(items))
+    navigation = "\n".join(
+        f'<div class="nav"><ul><li><a href="/nav/{i}">nav {i}</a></li></ul></div>' for i in range(200)
+    )
+    return (
+        f"<html><head><title>catalogue</title></head><body>{navigation}"
+        f'<div class="c_container {level.value}"><ul>{entries}</ul></div></body></html>'
+    ).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="*", type=Path, help="saved catalogue pages")
+    parser.add_argument("--level", type=CatalogueLevels, default=CatalogueLevels.PARTS)
+    parser.add_argument("--items", type=int, default=2000, help="entries of the synthetic page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = [page.read_bytes() for page in args.pages] or [synthetic_page(args.level, args.items)]
+    total_bytes = sum(len(page) for page in pages)
+    print(f"{len(pages)} page(s), {total_bytes / 1024:.0f} KiB, level {args.level.value}, {args.repeat} rounds")
+
+    for backend, parse in PARSERS.items():
+        links = sum(len(parse(page, args.level)) for page in pages)
+        seconds = min(timeit.repeat(lambda: [parse(page, args.level) for page in pages], number=1, repeat=args.repeat))
+        print(
+            f"{backend.value:>5}: {seconds * 1000:8.2f} ms/round, {len(pages) / seconds:8.1f} pages/s, "
+            f"{total_bytes / seconds / 2**20:6.1f} MiB/s, {links} links"
+        )
+
+
+if __name__ == "__main__":
+    main()
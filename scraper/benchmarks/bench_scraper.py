@@ -0,0 +1,214 @@
+"""End-to-end scraper benchmark against the local synthetic catalogue.
+
+Starts `benchmarks.catalogue_server` in a subprocess, runs `run_scraper`
+against it and the Postgres configured by the usual DB_* variables, and
+reports pages/sec, rows/sec, fetch latency percentiles and peak memory:
+
+    python -m benchmarks.bench_scraper --fanout 5,5,10,100 --latency 0.02 --output results/HEAD.json
+    python -m benchmarks.bench_scraper --baseline results/HEAD.json
+
+With `--baseline` the change of every metric against an earlier result file is printed.
+With `--archive-dir` the fetched pages are recorded, and `--replay <scan id>` runs
+parse and insert alone over that scan's archive, without the server:
+
+    python -m benchmarks.bench_scraper --archive-dir archives
+    python -m benchmarks.bench_scraper --archive-dir archives --replay 42
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from loguru import logger
+
+from app.http import create_http_client
+from app.ratelimit import RateLimiterRegistry
+from app.scraper import run_scraper
+from benchmarks.catalogue_server import CatalogueShape, parse_fanout
+from config.settings import DbConfig, InsertMode, ParseExecutor, ScraperConfig
+from db.database import Postgres
+from db.utils import initialize_database
+from models import ScrapingStatus
+
+SERVER_START_TIMEOUT = 10.0  # seconds
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def wait_for_server(url: str) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+def start_server(args: argparse.Namespace) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.catalogue_server",
+            f"--port={args.port}",
+            f"--fanout={','.join(str(fanout) for fanout in args.fanout)}",
+            f"--latency={args.latency}",
+            f"--jitter={args.jitter}",
+            f"--error-rate={args.error_rate}",
+        ]
+    )
+
+
+async def run_benchmark(args: argparse.Namespace, shape: CatalogueShape) -> dict:
+    config = ScraperConfig(
+        base_url=f"http://127.0.0.1:{args.port}/",
+        insert_mode=args.insert_mode,
+        parse_executor=args.parse_executor,
+        concurrent_requests=args.max_concurrent_requests,
+        max_concurrent_requests=args.max_concurrent_requests,
+        rate_limit=args.rate_limit,
+        max_rate_limit=args.rate_limit,
+        archive_dir=args.archive_dir,
+        replay_scan_id=args.replay,
+    )
+    database = Postgres(
+        db_config=DbConfig(
+            host=os.getenv("DB_HOST", "localhost"),
+            port=int(os.getenv("DB_PORT", "5432")),
+            database=os.getenv("DB_NAME", "parts_catalogue"),
+            user=os.getenv("DB_USER", "user"),
+            password=os.getenv("DB_PASS", "pass"),
+        )
+    )
+    await database.connect()
+    await initialize_database(db=database)
+
+    status = ScrapingStatus()
+    http_client = create_http_client(config=config.http, status=status)
+    latencies = []
+    errors = 0
+
+    async def on_request(request: httpx.Request):
+        request.extensions["bench_started"] = time.perf_counter()
+
+    async def on_response(response: httpx.Response):
+        nonlocal errors
+        latencies.append(time.perf_counter() - response.request.extensions["bench_started"])
+        errors += response.status_code >= 400
+
+    http_client.event_hooks["request"].append(on_request)
+    http_client.event_hooks["response"].append(on_response)
+
+    started = time.perf_counter()
+    try:
+        scan_id = await run_scraper(database, status, config, RateLimiterRegistry(config), http_client)
+        seconds = time.perf_counter() - started
+        rows = await database.fetchval("SELECT count(*) FROM parts WHERE scan_id = $1", scan_id)
+    finally:
+        await http_client.aclose()
+        await database.disconnect()
+
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "catalogue": {
+            "fanout": list(shape.fanout),
+            "latency": shape.latency,
+            "jitter": shape.jitter,
+            "error_rate": shape.error_rate,
+        },
+        "scraper": {
+            "insert_mode": config.insert_mode.value,
+            "parse_executor": config.parse_executor.value,
+            "max_concurrent_requests": config.max_concurrent_requests,
+            "rate_limit": config.rate_limit,
+            "replay_scan_id": config.replay_scan_id,
+        },
+        "results": {
+            "seconds": round(seconds, 3),
+            "pages": status.scraping_counter,
+            "expected_pages": shape.pages,
+            "pages_per_sec": round(status.scraping_counter / seconds, 1),
+            "rows": rows,
+            "expected_rows": shape.parts,
+            "rows_per_sec": round(rows / seconds, 1),
+            "requests": len(latencies),
+            "http_errors": errors,
+            "fetch_latency_p50_ms": round(percentiles[49] * 1000, 2),
+            "fetch_latency_p99_ms": round(percentiles[98] * 1000, 2),
+            "peak_rss_mb": round(status.memory.peak_rss_bytes / 2**20, 1),
+        },
+    }
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print(f"against {baseline['commit'][:12]} ({baseline['timestamp']}):")
+    for metric, value in results["results"].items():
+        previous = baseline["results"].get(metric)
+        if not previous:
+            continue
+        print(f"  {metric:>22}: {previous:>12} -> {value:>12} ({(value - previous) / previous:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fanout", type=parse_fanout, default=(5, 5, 10, 100), help="entries per level")
+    parser.add_argument("--latency", type=float, default=0.02, help="response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra delay of up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--insert-mode", type=InsertMode, default=InsertMode.COPY)
+    parser.add_argument("--parse-executor", type=ParseExecutor, default=ParseExecutor.PROCESS)
+    parser.add_argument("--max-concurrent-requests", type=int, default=50)
+    parser.add_argument("--rate-limit", type=float, default=1000.0, help="requests per second")
+    parser.add_argument("--archive-dir", help="record fetched pages to, or replay them from, this directory")
+    parser.add_argument("--replay", type=int, metavar="SCAN_ID", help="replay the archive of this scan")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--output", type=Path, help="write the results as json")
+    parser.add_argument("--baseline", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    shape = CatalogueShape(fanout=args.fanout, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    if args.replay is not None:
+        if not args.archive_dir:
+            parser.error("--replay needs --archive-dir")
+        results = asyncio.run(run_benchmark(args, shape))
+    else:
+        server = start_server(args)
+        try:
+            asyncio.run(wait_for_server(f"http://127.0.0.1:{args.port}/"))
+            results = asyncio.run(run_benchmark(args, shape))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(results, indent=2))
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text()))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
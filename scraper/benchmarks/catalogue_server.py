@@ -0,0 +1,139 @@
+"""Local synthetic catalogue with the page layout of urparts.
+
+Serves `allmakes`, `allcategories`, `allmodels` and `allparts` pages under
+`/index.cfm/page/catalogue`, with `--fanout` entries per page, a response
+delay of `--latency` seconds plus up to `--jitter`, and a share of
+`--error-rate` requests answered with a 500:
+
+    python -m benchmarks.catalogue_server --port 8765 --fanout 10,10,10,50 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass
+
+import uvicorn
+
+from models import CatalogueLevels
+
+CATALOGUE_PATH = "/index.cfm/page/catalogue"
+PART_PATH = "/index.cfm/page/part"
+LEVELS = list(CatalogueLevels)
+
+
+@dataclass(frozen=True)
+class CatalogueShape:
+    fanout: tuple[int, int, int, int]  # entries of a makers, categories, models and parts page
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+
+    @property
+    def pages(self) -> int:
+        """Catalogue pages a full scan fetches."""
+        pages, width = 0, 1
+        for fanout in self.fanout:
+            pages += width
+            width *= fanout
+        return pages
+
+    @property
+    def parts(self) -> int:
+        parts = 1
+        for fanout in self.fanout:
+            parts *= fanout
+        return parts
+
+
+def parse_fanout(value: str) -> tuple[int, int, int, int]:
+    fanout = tuple(int(part) for part in value.split(","))
+    if len(fanout) != len(LEVELS):
+        raise argparse.ArgumentTypeError(f"expected {len(LEVELS)} comma separated numbers")
+    return fanout
+
+
+def entry_name(level: CatalogueLevels, path: list[str], index: int) -> str:
+    if level == CatalogueLevels.MAKERS:
+        return f"MAKER {index}"
+    if level == CatalogueLevels.CATEGORIES:
+        return f"CATEGORY {index}"
+    if level == CatalogueLevels.MODELS:
+        return f"MODEL {'-'.join(path)}-{index}"
+    return f"{'-'.join(path)}-{index:06d} - PART CATEGORY {index % 10}"
+
+
+def render_page(shape: CatalogueShape, path: list[str]) -> bytes:
+    level = LEVELS[len(path)]
+    base = PART_PATH if level == CatalogueLevels.PARTS else CATALOGUE_PATH
+    entries = "".join(
+        f'<li><a href="{"/".join([base, *path, str(i)])}">{entry_name(level, path, i)}</a></li>'
+        for i in range(shape.fanout[len(path)])
+    )
+    return (
+        '<html><body><div class="c_container_header"><ul><li><a href="/">home</a></li></ul></div>'
+        f'<div class="c_container {level.value}"><ul>{entries}</ul></div></body></html>'
+    ).encode()
+
+
+class CatalogueServer:
+    """ASGI app serving the synthetic catalogue."""
+
+    def __init__(self, shape: CatalogueShape, seed: int = 0):
+        self.shape = shape
+        self.random = random.Random(seed)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        delay = self.shape.latency + self.random.uniform(0, self.shape.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        status, body = 200, b""
+        path = scope["path"].rstrip("/")
+        if not path.startswith(CATALOGUE_PATH):
+            status = 404
+        elif self.random.random() < self.shape.error_rate:
+            status = 500
+        else:
+            segments = [segment for segment in path.removeprefix(CATALOGUE_PATH).split("/") if segment]
+            if len(segments) < len(LEVELS):
+                body = render_page(self.shape, segments)
+            else:
+                status = 404
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"text/html"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fanout", type=parse_fanout, default=(10, 10, 10, 50), help="entries per level")
+    parser.add_argument("--latency", type=float, default=0.0, help="response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra delay of up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    shape = CatalogueShape(fanout=args.fanout, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    uvicorn.run(
+        CatalogueServer(shape, seed=args.seed),
+        host=args.host,
+        port=args.port,
+        lifespan="off",
+        log_level="warning",
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
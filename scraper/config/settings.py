@@ -1,4 +1,43 @@
-from pydantic import BaseModel
+import os
+import socket
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class InsertMode(str, Enum):
+    EXECUTEMANY = "executemany"
+    COPY = "copy"
+
+
+class StorageMode(str, Enum):
+    SNAPSHOT = "snapshot"  # every scan's parts in its own partition of parts
+    RANGES = "ranges"  # every distinct part once in part_ranges, with the range of scans it was seen in
+
+
+class ParserBackend(str, Enum):
+    LXML = "lxml"
+    SOUP = "soup"
+
+
+class ParseExecutor(str, Enum):
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class VisitedSetMode(str, Enum):
+    HASH = "hash"
+    BLOOM = "bloom"
+
+
+class ErrorClass(str, Enum):
+    TIMEOUT = "timeout"
+    CONNECTION = "connection"
+    THROTTLED = "throttled"  # 429
+    SERVER = "server"  # 5xx
+    CLIENT = "client"  # other 4xx
 
 
 class DbConfig(BaseModel):
@@ -7,8 +46,107 @@ class DbConfig(BaseModel):
     database: str
     user: str
     password: str
+    dimension_cache_size: int = Field(default=10000)
+
+
+class HttpClientConfig(BaseModel):
+    http2: bool = Field(default=True)
+    max_connections: int = Field(default=100)
+    max_keepalive_connections: int = Field(default=20)
+    keepalive_expiry: float = Field(default=30.0)  # seconds
+    connect_timeout: float = Field(default=5.0)
+    read_timeout: float = Field(default=30.0)
+    write_timeout: float = Field(default=10.0)
+    pool_timeout: float = Field(default=10.0)
+
+
+class RetryPolicy(BaseModel):
+    max_attempts: int = Field(default=3)  # including the first fetch
+    base_delay: float = Field(default=1.0)  # seconds, doubled on every attempt
+    max_delay: float = Field(default=60.0)  # seconds
+
+
+def default_retry_policies() -> dict[ErrorClass, RetryPolicy]:
+    return {
+        ErrorClass.TIMEOUT: RetryPolicy(max_attempts=4, base_delay=2.0),
+        ErrorClass.CONNECTION: RetryPolicy(max_attempts=4),
+        ErrorClass.THROTTLED: RetryPolicy(max_attempts=6, base_delay=5.0, max_delay=300.0),
+        ErrorClass.SERVER: RetryPolicy(),
+        # the same request gets the same answer
+        ErrorClass.CLIENT: RetryPolicy(max_attempts=1),
+    }
+
+
+class RetryConfig(BaseModel):
+    jitter: float = Field(default=0.5)  # share of the backoff drawn at random
+    policies: dict[ErrorClass, RetryPolicy] = Field(default_factory=default_retry_policies)
+
+    @field_validator("policies")
+    @classmethod
+    def merge_default_policies(cls, policies: dict[ErrorClass, RetryPolicy]) -> dict[ErrorClass, RetryPolicy]:
+        """Policies given for some error classes replace their defaults, the other classes keep theirs."""
+        return {**default_retry_policies(), **policies}
+
+
+class ScanScope(BaseModel):
+    """Catalogue entries a scan is limited to by lower-cased name, an empty list doesn't restrict its level."""
+
+    makers: list[str] = Field(default_factory=list)
+    categories: list[str] = Field(default_factory=list)
+    models: list[str] = Field(default_factory=list)
+
+    @field_validator("makers", "categories", "models")
+    @classmethod
+    def lower_names(cls, names: list[str]) -> list[str]:
+        return [name.strip().lower() for name in names]
+
+    @property
+    def full(self) -> bool:
+        return not (self.makers or self.categories or self.models)
+
+
+class ScraperConfig(BaseModel):
+    base_url: str = Field(default="https://www.urparts.com/")
+    insert_mode: InsertMode = Field(default=InsertMode.EXECUTEMANY)
+    storage_mode: StorageMode = Field(default=StorageMode.SNAPSHOT)
+    parser_backend: ParserBackend = Field(default=ParserBackend.LXML)
+    parse_executor: ParseExecutor = Field(default=ParseExecutor.PROCESS)
+    parse_workers: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    concurrent_requests: int = Field(default=10)
+    max_concurrent_requests: int = Field(default=50)
+    rate_limit: float = Field(default=20.0)  # requests per second per host
+    min_rate_limit: float = Field(default=1.0)
+    max_rate_limit: float = Field(default=100.0)
+    target_latency: float = Field(default=1.0)  # seconds
+    http: HttpClientConfig = Field(default_factory=HttpClientConfig)
+    retry: RetryConfig = Field(default_factory=RetryConfig)
+    http_cache_dir: Optional[str] = Field(default=None)
+    http_cache_max_bytes: int = Field(default=1024 * 2**20)
+    archive_dir: Optional[str] = Field(default=None)  # every fetched page is recorded when set
+    replay_scan_id: Optional[int] = Field(default=None)  # pages come from this scan's archive instead of the site
+    incremental: bool = Field(default=False)
+    scope: ScanScope = Field(default_factory=ScanScope)
+    retain_scans: int = Field(default=0)  # finished scans whose parts are kept, 0 keeps all
+    checkpoint_batch_size: int = Field(default=500)
+    checkpoint_interval: float = Field(default=5.0)  # seconds
+    writer_flush_rows: int = Field(default=5000)
+    writer_flush_interval: float = Field(default=1.0)  # seconds
+    writer_max_pending: int = Field(default=100)  # pages
+    writer_workers: int = Field(default=1)  # concurrent flushes
+    parse_queue_size: int = Field(default=100)  # fetched pages waiting to be parsed
+    visited_set_mode: VisitedSetMode = Field(default=VisitedSetMode.HASH)
+    visited_capacity: int = Field(default=1_000_000)  # urls the bloom filter is sized for
+    visited_error_rate: float = Field(default=0.0001)
+    frontier_memory_limit: int = Field(default=100_000)  # pages
+    frontier_spill_dir: Optional[str] = Field(default=None)
+    distributed: bool = Field(default=False)
+    node_id: str = Field(default_factory=lambda: f"{socket.gethostname()}-{os.getpid()}")
+    lease_timeout: float = Field(default=60.0)  # seconds
+    claim_batch_size: int = Field(default=10)
+    frontier_poll_interval: float = Field(default=1.0)  # seconds
 
 
 class AppConfig(BaseModel):
     port: int
     db: DbConfig
+    scraper: ScraperConfig = Field(default_factory=ScraperConfig)
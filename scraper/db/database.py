@@ -1,10 +1,26 @@
-from typing import Optional
+from typing import Iterable, Optional
 
 import asyncpg
 from loguru import logger
 
 from config.settings import DbConfig
 
+from .dimensions import DimensionCache
+from .queries import (
+    CREATE_PARTS_PARTITION_QUERY,
+    DELETE_EXPIRED_PART_RANGES_QUERY,
+    DELETE_SCANS_QUERY,
+    DETACH_PARTS_PARTITION_QUERY,
+    DIMENSION_COLUMNS,
+    DROP_PARTS_PARTITION_QUERY,
+    PARTS_PARTITION_NAME,
+    SELECT_DIMENSION_IDS_QUERY,
+    SELECT_DIMENSION_QUERY,
+    SELECT_EXPIRED_SCANS_QUERY,
+    SELECT_PARTS_PARTITIONS_QUERY,
+    UPSERT_DIMENSION_QUERY,
+)
+
 
 class Postgres:
     def __init__(self, db_config: DbConfig):
@@ -14,6 +30,9 @@ class Postgres:
         self.user = db_config.user
         self.password = db_config.password
         self.pool: Optional[asyncpg.Pool] = None
+        self.dimensions = {
+            table: DimensionCache(max_size=db_config.dimension_cache_size) for table in DIMENSION_COLUMNS
+        }
 
     async def connect(self):
         """Initialize the connection pool."""
@@ -47,7 +66,79 @@ class Postgres:
             logger.error(f"request to db failed {err}")
             raise err
 
+    async def copy_and_execute(self, table: str, records: Iterable[tuple], columns: list[str], query: str, *args):
+        """COPY records into a table and run a follow-up query in the same transaction."""
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.transaction():
+                    await connection.copy_records_to_table(table, records=records, columns=columns)
+                    return await connection.execute(query, *args)
+        except asyncpg.PostgresError as err:
+            logger.error(f"bulk copy into {table} failed {err}")
+            raise err
+
     async def fetchval(self, query: str, *args):
         """Fetch a single value."""
         async with self.pool.acquire() as connection:
             return await connection.fetchval(query, *args)
+
+    async def fetch(self, query: str, *args):
+        """Fetch all rows."""
+        async with self.pool.acquire() as connection:
+            return await connection.fetch(query, *args)
+
+    async def preload_dimensions(self):
+        """Fill the dimension caches from the makers, categories and models tables."""
+        for table, cache in self.dimensions.items():
+            rows = await self.fetch(
+                SELECT_DIMENSION_QUERY.format(table=table, column=DIMENSION_COLUMNS[table]), cache.max_size
+            )
+            cache.clear()
+            for name, dimension_id in rows:
+                cache.put(name, dimension_id)
+            logger.debug(f"preloaded {len(cache)} {table}")
+
+    async def resolve_dimension_ids(self, table: str, names: Iterable[str]) -> dict[str, int]:
+        """Map dimension names to ids, inserting the names missing from the cache in one batch."""
+        cache = self.dimensions[table]
+        column = DIMENSION_COLUMNS[table]
+        ids = {}
+        missing = []
+        for name in set(names):
+            dimension_id = cache.get(name)
+            if dimension_id is None:
+                missing.append(name)
+            else:
+                ids[name] = dimension_id
+
+        if missing:
+            rows = await self.fetch(UPSERT_DIMENSION_QUERY.format(table=table, column=column), sorted(missing))
+            # a name inserted by a concurrent transaction is neither returned by the upsert
+            # nor visible in its snapshot, look it up again once that transaction committed
+            not_found = set(missing).difference(name for name, _ in rows)
+            if not_found:
+                rows += await self.fetch(SELECT_DIMENSION_IDS_QUERY.format(table=table, column=column), list(not_found))
+            for name, dimension_id in rows:
+                cache.put(name, dimension_id)
+                ids[name] = dimension_id
+
+        return ids
+
+    async def create_parts_partition(self, scan_id: int):
+        """Create the parts partition of a scan."""
+        await self.execute(CREATE_PARTS_PARTITION_QUERY.format(scan_id=int(scan_id)))
+
+    async def drop_expired_scans(self, keep: int) -> list[int]:
+        """Drop the parts partitions, part ranges and rows of finished scans older than the `keep` most recent ones."""
+        expired = [scan_id for scan_id, in await self.fetch(SELECT_EXPIRED_SCANS_QUERY, keep)]
+        if not expired:
+            return []
+        partitions = {name for name, in await self.fetch(SELECT_PARTS_PARTITIONS_QUERY)}
+        for scan_id in expired:
+            if PARTS_PARTITION_NAME.format(scan_id=scan_id) in partitions:
+                await self.execute(DETACH_PARTS_PARTITION_QUERY.format(scan_id=scan_id))
+            await self.execute(DROP_PARTS_PARTITION_QUERY.format(scan_id=scan_id))
+        await self.execute(DELETE_EXPIRED_PART_RANGES_QUERY, max(expired))
+        await self.execute(DELETE_SCANS_QUERY, expired)
+        logger.info(f"dropped {len(expired)} expired scans: {expired}")
+        return expired
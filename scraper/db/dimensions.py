@@ -0,0 +1,32 @@
+from collections import OrderedDict
+from typing import Optional
+
+
+class DimensionCache:
+    """Bounded name -> id map for one dimension table (makers, categories or models).
+
+    Least recently used names are evicted once `max_size` is reached, a miss only
+    costs one more batched upsert.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._ids: OrderedDict[str, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, name: str) -> Optional[int]:
+        dimension_id = self._ids.get(name)
+        if dimension_id is not None:
+            self._ids.move_to_end(name)
+        return dimension_id
+
+    def put(self, name: str, dimension_id: int) -> None:
+        self._ids[name] = dimension_id
+        self._ids.move_to_end(name)
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def clear(self) -> None:
+        self._ids.clear()
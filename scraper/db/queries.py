@@ -5,6 +5,13 @@ CREATE TABLE IF NOT EXISTS scans (
     time_end TIMESTAMP
 );
 
+-- seconds per crawl stage of every node that worked on the scan
+ALTER TABLE scans ADD COLUMN IF NOT EXISTS stage_seconds JSONB;
+-- where the scan's parts are stored, `snapshot` (parts) or `ranges` (part_ranges)
+ALTER TABLE scans ADD COLUMN IF NOT EXISTS storage TEXT NOT NULL DEFAULT 'snapshot';
+-- makers, categories and models a partial scan crawled, NULL for a full scan
+ALTER TABLE scans ADD COLUMN IF NOT EXISTS scope JSONB;
+
 CREATE TABLE IF NOT EXISTS makers (
     id SERIAL PRIMARY KEY,
     maker TEXT NOT NULL UNIQUE
@@ -20,8 +27,17 @@ CREATE TABLE IF NOT EXISTS models (
     model TEXT NOT NULL UNIQUE
 );
 
+-- parts used to be one plain table, it is moved aside and copied into per-scan partitions below
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('parts') AND relkind = 'r') THEN
+        ALTER TABLE parts RENAME TO parts_unpartitioned;
+    END IF;
+END $$;
+
+-- one partition per scan, see CREATE_PARTS_PARTITION_QUERY
 CREATE TABLE IF NOT EXISTS parts (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     maker_id INT NOT NULL,
     category_id INT NOT NULL,
     model_id INT NOT NULL,
@@ -29,17 +45,131 @@ CREATE TABLE IF NOT EXISTS parts (
     part_category TEXT NOT NULL,
     url TEXT NOT NULL,
     scan_id INT NOT NULL,
+    PRIMARY KEY (scan_id, id),
     UNIQUE (maker_id, category_id, model_id, part_number, part_category, url, scan_id),
     FOREIGN KEY (maker_id) REFERENCES makers (id) ON DELETE CASCADE,
     FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE CASCADE,
     FOREIGN KEY (model_id) REFERENCES models (id) ON DELETE CASCADE,
     FOREIGN KEY (scan_id) REFERENCES scans (id) ON DELETE CASCADE
+) PARTITION BY LIST (scan_id);
+
+DO $$
+DECLARE
+    legacy_scan_id INT;
+BEGIN
+    IF to_regclass('parts_unpartitioned') IS NOT NULL THEN
+        -- every scan gets its partition, an unfinished one without parts yet too so it can be resumed
+        FOR legacy_scan_id IN SELECT id FROM scans LOOP
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF parts FOR VALUES IN (%s)',
+                'parts_scan_' || legacy_scan_id,
+                legacy_scan_id
+            );
+        END LOOP;
+        INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id)
+        SELECT maker_id, category_id, model_id, part_number, part_category, url, scan_id
+        FROM parts_unpartitioned;
+        DROP TABLE parts_unpartitioned;
+    END IF;
+END $$;
+
+-- every distinct part once, a member of all scans from first_scan_id to last_scan_id. The scan
+-- columns have no foreign key so expired scans can be deleted without touching live ranges.
+-- last_scan_id is not indexed and pages keep free space, so extending a range is a HOT update
+-- that writes no index entries.
+CREATE TABLE IF NOT EXISTS part_ranges (
+    id BIGSERIAL PRIMARY KEY,
+    maker_id INT NOT NULL,
+    category_id INT NOT NULL,
+    model_id INT NOT NULL,
+    part_number TEXT NOT NULL,
+    part_category TEXT NOT NULL,
+    url TEXT NOT NULL,
+    first_scan_id INT NOT NULL,
+    last_scan_id INT NOT NULL,
+    UNIQUE (maker_id, category_id, model_id, part_number, part_category, url, first_scan_id),
+    FOREIGN KEY (maker_id) REFERENCES makers (id) ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE CASCADE,
+    FOREIGN KEY (model_id) REFERENCES models (id) ON DELETE CASCADE
+) WITH (fillfactor = 70);
+
+-- narrows `first_scan_id <= $1 AND last_scan_id >= $1` to the ranges that started by scan $1, the
+-- last_scan_id bound is a filter. An index on last_scan_id would cover both bounds, but every scan
+-- updates last_scan_id of all live parts: with (last_scan_id, first_scan_id) or a GiST range index
+-- those updates lose HOT and rewrite an index entry per part, which made extending ranges 5.5x
+-- (btree) to 18x (GiST) slower and the table 2.6x to 4.6x bigger, for no faster reads of the
+-- newest scans. first_scan_id never changes, so this index keeps extending ranges HOT.
+CREATE INDEX IF NOT EXISTS part_ranges_first_scan_idx ON part_ranges (first_scan_id);
+
+CREATE TABLE IF NOT EXISTS page_hashes (
+    scan_id INT NOT NULL,
+    url TEXT NOT NULL,
+    level TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (scan_id, url),
+    FOREIGN KEY (scan_id) REFERENCES scans (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS crawl_frontier (
+    scan_id INT NOT NULL,
+    url TEXT NOT NULL,
+    level TEXT NOT NULL,
+    directory JSONB NOT NULL,
+    done BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (scan_id, url),
+    FOREIGN KEY (scan_id) REFERENCES scans (id) ON DELETE CASCADE
+);
+
+-- pages given up on after their last retry
+CREATE TABLE IF NOT EXISTS dead_letters (
+    scan_id INT NOT NULL,
+    url TEXT NOT NULL,
+    level TEXT NOT NULL,
+    attempts INT NOT NULL,
+    error_class TEXT NOT NULL,
+    error TEXT NOT NULL,
+    status_code INT,
+    failed_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (scan_id, url),
+    FOREIGN KEY (scan_id) REFERENCES scans (id) ON DELETE CASCADE
+);
+
+-- work queue columns of distributed scans, a row is claimed by a node until its lease expires
+ALTER TABLE crawl_frontier
+    ADD COLUMN IF NOT EXISTS priority INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS enqueued_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    ADD COLUMN IF NOT EXISTS attempt INT NOT NULL DEFAULT 1,
+    ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+    ADD COLUMN IF NOT EXISTS lease_until TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS crawl_frontier_pending_idx
+    ON crawl_frontier (scan_id, priority, enqueued_at) WHERE NOT done;
+
+-- parts_staging used to carry maker/category/model names, it only holds
+-- in-flight rows so it is recreated with id columns.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns WHERE table_name = 'parts_staging' AND column_name = 'maker'
+    ) THEN
+        DROP TABLE parts_staging;
+    END IF;
+END $$;
+
+CREATE UNLOGGED TABLE IF NOT EXISTS parts_staging (
+    maker_id INT NOT NULL,
+    category_id INT NOT NULL,
+    model_id INT NOT NULL,
+    part_number TEXT NOT NULL,
+    part_category TEXT NOT NULL,
+    url TEXT NOT NULL,
+    scan_id INT NOT NULL
 );
 """
 
 GET_NEW_SCAN_ID = """
-INSERT INTO scans (time_start)
-VALUES ($1)
+INSERT INTO scans (time_start, storage)
+VALUES ($1, $2)
 RETURNING scans.id
 """
 
@@ -49,31 +179,340 @@ SET time_end = ($2)
 WHERE id = ($1)
 """
 
+# $2 node id, $3 that node's stage timings
+SET_SCAN_STAGE_SECONDS_QUERY = """
+UPDATE scans
+SET stage_seconds = COALESCE(stage_seconds, '{}'::jsonb) || jsonb_build_object($2::text, $3::jsonb)
+WHERE id = $1
+"""
 
-INSERT_DATA_QUERY = """
-WITH maker_insert AS (
-    INSERT INTO makers (maker)
-    VALUES ($1)
-    ON CONFLICT (maker) DO NOTHING
-    RETURNING id
-),
-category_insert AS (
-    INSERT INTO categories (category)
-    VALUES ($2)
-    ON CONFLICT (category) DO NOTHING
+GET_SCAN_QUERY = """
+SELECT id, time_start, time_end
+FROM scans
+WHERE id = $1
+"""
+
+GET_SCAN_SETTINGS_QUERY = """
+SELECT storage, scope::text
+FROM scans
+WHERE id = $1
+"""
+
+SET_SCAN_SCOPE_QUERY = """
+UPDATE scans
+SET scope = $2::jsonb
+WHERE id = $1
+"""
+
+GET_PREVIOUS_SCAN_ID = """
+SELECT id
+FROM scans
+WHERE time_end IS NOT NULL AND id < $1 AND storage = $2
+ORDER BY id DESC
+LIMIT 1
+"""
+
+SELECT_PAGE_HASHES = """
+SELECT url, content_hash
+FROM page_hashes
+WHERE scan_id = $1 AND level = $2
+"""
+
+INSERT_PAGE_HASH = """
+INSERT INTO page_hashes (scan_id, url, level, content_hash)
+VALUES ($1, $2, $3, $4)
+ON CONFLICT (scan_id, url) DO UPDATE SET content_hash = EXCLUDED.content_hash
+"""
+
+PARTS_PARTITION_NAME = "parts_scan_{scan_id}"
+
+CREATE_PARTS_PARTITION_QUERY = """
+CREATE TABLE IF NOT EXISTS parts_scan_{scan_id} PARTITION OF parts FOR VALUES IN ({scan_id})
+"""
+
+SELECT_PARTS_PARTITIONS_QUERY = """
+SELECT partition.relname
+FROM pg_inherits
+JOIN pg_class AS partition ON partition.oid = pg_inherits.inhrelid
+JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+WHERE parent.relname = 'parts'
+"""
+
+# finished scans older than the $1 most recent ones
+SELECT_EXPIRED_SCANS_QUERY = """
+SELECT id
+FROM scans
+WHERE time_end IS NOT NULL
+ORDER BY id DESC
+OFFSET $1
+"""
+
+# CONCURRENTLY only locks the partition, API reads of other scans go on, it can't run in a transaction
+DETACH_PARTS_PARTITION_QUERY = """
+ALTER TABLE parts DETACH PARTITION parts_scan_{scan_id} CONCURRENTLY
+"""
+
+DROP_PARTS_PARTITION_QUERY = """
+DROP TABLE IF EXISTS parts_scan_{scan_id}
+"""
+
+# ranges that ended at or before the newest expired scan $1 belong to no kept scan, except those of an
+# unfinished scan: it never expires and isn't extended by later scans, but can still be resumed
+DELETE_EXPIRED_PART_RANGES_QUERY = """
+DELETE FROM part_ranges
+WHERE last_scan_id <= $1
+AND NOT EXISTS (
+    SELECT 1
+    FROM scans
+    WHERE scans.time_end IS NULL
+    AND scans.id BETWEEN part_ranges.first_scan_id AND part_ranges.last_scan_id
+)
+"""
+
+DELETE_SCANS_QUERY = """
+DELETE FROM scans
+WHERE id = ANY($1::int[])
+"""
+
+# $1 new scan, $2 previous scan, $3 maker id, $4 category id
+COPY_SUBTREE_PARTS_QUERY = """
+INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id)
+SELECT maker_id, category_id, model_id, part_number, part_category, url, $1
+FROM parts
+WHERE scan_id = $2 AND maker_id = $3 AND category_id = $4
+ON CONFLICT DO NOTHING
+"""
+
+# $1 new scan, $2 previous scan, $3 maker id, $4 category id
+EXTEND_SUBTREE_RANGES_QUERY = """
+UPDATE part_ranges
+SET last_scan_id = $1
+WHERE maker_id = $3 AND category_id = $4 AND last_scan_id >= $2 AND last_scan_id < $1
+"""
+
+# Parts of the previous scan $2 outside the scope of the partial scan $1. The scope arrays hold
+# lower-cased entry names, NULL leaves the level unrestricted.
+OUTSIDE_SCOPE_CONDITION = """
+NOT (
+    ($3::text[] IS NULL OR lower(makers.maker) = ANY($3::text[]))
+    AND ($4::text[] IS NULL OR lower(categories.category) = ANY($4::text[]))
+    AND ($5::text[] IS NULL OR lower(models.model) = ANY($5::text[]))
+)
+"""
+
+CARRY_FORWARD_PARTS_QUERY = f"""
+INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id)
+SELECT parts.maker_id, parts.category_id, parts.model_id, parts.part_number, parts.part_category, parts.url, $1
+FROM parts
+JOIN makers ON makers.id = parts.maker_id
+JOIN categories ON categories.id = parts.category_id
+JOIN models ON models.id = parts.model_id
+WHERE parts.scan_id = $2 AND {OUTSIDE_SCOPE_CONDITION}
+ON CONFLICT DO NOTHING
+"""
+
+CARRY_FORWARD_RANGES_QUERY = f"""
+UPDATE part_ranges
+SET last_scan_id = $1
+FROM makers, categories, models
+WHERE makers.id = part_ranges.maker_id
+    AND categories.id = part_ranges.category_id
+    AND models.id = part_ranges.model_id
+    AND part_ranges.last_scan_id >= $2
+    AND part_ranges.last_scan_id < $1
+    AND {OUTSIDE_SCOPE_CONDITION}
+"""
+
+# pages outside the scope keep their previous hashes for the next incremental scan,
+# pages the partial scan fetches overwrite theirs
+CARRY_FORWARD_PAGE_HASHES_QUERY = """
+INSERT INTO page_hashes (scan_id, url, level, content_hash)
+SELECT $1, url, level, content_hash
+FROM page_hashes
+WHERE scan_id = $2
+ON CONFLICT DO NOTHING
+"""
+
+INSERT_FRONTIER_QUERY = """
+INSERT INTO crawl_frontier (scan_id, url, level, directory)
+VALUES ($1, $2, $3, $4::jsonb)
+ON CONFLICT (scan_id, url) DO NOTHING
+"""
+
+MARK_FRONTIER_DONE_QUERY = """
+UPDATE crawl_frontier
+SET done = TRUE
+WHERE scan_id = $1 AND url = ANY($2::text[])
+"""
+
+SELECT_FRONTIER_QUERY = """
+SELECT url, level, directory::text, done
+FROM crawl_frontier
+WHERE scan_id = $1
+"""
+
+# $1 scan, then one array per column; nothing is queued once the scan has ended
+ENQUEUE_FRONTIER_QUERY = """
+INSERT INTO crawl_frontier (scan_id, url, level, directory, priority)
+SELECT $1, url, level, directory::jsonb, priority
+FROM unnest($2::text[], $3::text[], $4::text[], $5::int[]) AS page (url, level, directory, priority)
+WHERE EXISTS (SELECT 1 FROM scans WHERE id = $1 AND time_end IS NULL)
+ON CONFLICT (scan_id, url) DO NOTHING
+RETURNING url
+"""
+
+# $1 scan, $2 node, $3 lease in seconds, $4 batch size
+CLAIM_FRONTIER_QUERY = """
+UPDATE crawl_frontier AS frontier
+SET claimed_by = $2, lease_until = now() + make_interval(secs => $3)
+FROM (
+    SELECT url
+    FROM crawl_frontier
+    WHERE scan_id = $1 AND NOT done AND (lease_until IS NULL OR lease_until < now())
+    ORDER BY priority, enqueued_at
+    LIMIT $4
+    FOR UPDATE SKIP LOCKED
+) AS claimable
+WHERE frontier.scan_id = $1 AND frontier.url = claimable.url
+RETURNING frontier.url, frontier.level, frontier.directory::text, frontier.attempt, frontier.priority
+"""
+
+# the lease of a released page runs out when its retry backoff ($4 seconds) is over
+RELEASE_FRONTIER_QUERY = """
+UPDATE crawl_frontier
+SET claimed_by = NULL, lease_until = now() + make_interval(secs => $4), attempt = $3
+WHERE scan_id = $1 AND url = $2
+"""
+
+INSERT_DEAD_LETTER_QUERY = """
+INSERT INTO dead_letters (scan_id, url, level, attempts, error_class, error, status_code)
+VALUES ($1, $2, $3, $4, $5, $6, $7)
+ON CONFLICT (scan_id, url) DO UPDATE
+SET attempts = EXCLUDED.attempts,
+    error_class = EXCLUDED.error_class,
+    error = EXCLUDED.error,
+    status_code = EXCLUDED.status_code,
+    failed_at = now()
+"""
+
+SELECT_DEAD_LETTERS_QUERY = """
+SELECT url, level, attempts, error_class, error, status_code, failed_at
+FROM dead_letters
+WHERE scan_id = $1
+ORDER BY failed_at
+"""
+
+COUNT_PENDING_FRONTIER_QUERY = """
+SELECT count(*)
+FROM crawl_frontier
+WHERE scan_id = $1 AND NOT done
+"""
+
+# only the first node to see the drained frontier gets the id back
+FINISH_SCAN_QUERY = """
+UPDATE scans
+SET time_end = $2
+WHERE id = $1 AND time_end IS NULL
+RETURNING id
+"""
+
+DELETE_FRONTIER_QUERY = """
+DELETE FROM crawl_frontier
+WHERE scan_id = $1
+"""
+
+DIMENSION_COLUMNS = {
+    "makers": "maker",
+    "categories": "category",
+    "models": "model",
+}
+
+SELECT_DIMENSION_QUERY = """
+SELECT {column}, id
+FROM {table}
+LIMIT $1
+"""
+
+SELECT_DIMENSION_IDS_QUERY = """
+SELECT {column}, id
+FROM {table}
+WHERE {column} = ANY($1::text[])
+"""
+
+# Rows inserted by the CTE are not visible to the second SELECT, rows that already
+# existed are not returned by the CTE, so together they cover every requested name.
+UPSERT_DIMENSION_QUERY = """
+WITH inserted AS (
+    INSERT INTO {table} ({column})
+    SELECT name FROM unnest($1::text[]) AS name ORDER BY name
+    ON CONFLICT ({column}) DO NOTHING
+    RETURNING {column}, id
+)
+SELECT {column}, id FROM inserted
+UNION ALL
+SELECT {column}, id FROM {table} WHERE {column} = ANY($1::text[])
+"""
+
+INSERT_PARTS_QUERY = """
+INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id)
+VALUES ($1, $2, $3, $4, $5, $6, $7)
+ON CONFLICT DO NOTHING
+"""
+
+PARTS_STAGING_TABLE = "parts_staging"
+PARTS_STAGING_COLUMNS = ["maker_id", "category_id", "model_id", "part_number", "part_category", "url", "scan_id"]
+
+# Runs in the same transaction as the COPY into parts_staging, so only the rows
+# of the current batch are visible and the final DELETE never touches other batches.
+MERGE_STAGED_PARTS_QUERY = """
+INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id)
+SELECT maker_id, category_id, model_id, part_number, part_category, url, scan_id
+FROM parts_staging
+ON CONFLICT DO NOTHING;
+
+DELETE FROM parts_staging;
+"""
+
+# A part still alive in the previous scan of the same storage ($2, NULL for the first one) gets
+# its range extended to the current scan $1, any other part starts a new range. A range already
+# extended to $1 matches again, so a resumed or retried batch changes nothing.
+PART_RANGE_KEY = "maker_id, category_id, model_id, part_number, part_category, url"
+
+INSERT_PART_RANGE_QUERY = f"""
+WITH extended AS (
+    UPDATE part_ranges
+    SET last_scan_id = $7
+    WHERE ({PART_RANGE_KEY}) = ($1, $2, $3, $4, $5, $6) AND last_scan_id >= COALESCE($8::int, $7::int)
     RETURNING id
+)
+INSERT INTO part_ranges ({PART_RANGE_KEY}, first_scan_id, last_scan_id)
+SELECT $1, $2, $3, $4, $5, $6, $7, $7
+WHERE NOT EXISTS (SELECT 1 FROM extended)
+ON CONFLICT DO NOTHING
+"""
+
+# Takes the batch out of parts_staging itself, so it is a single statement that can take parameters.
+MERGE_STAGED_PART_RANGES_QUERY = f"""
+WITH staged AS (
+    DELETE FROM parts_staging
+    RETURNING {PART_RANGE_KEY}
 ),
-model_insert AS (
-    INSERT INTO models (model)
-    VALUES ($3)
-    ON CONFLICT (model) DO NOTHING
-    RETURNING id
+extended AS (
+    UPDATE part_ranges AS ranges
+    SET last_scan_id = $1
+    FROM (SELECT DISTINCT {PART_RANGE_KEY} FROM staged) AS part
+    WHERE ranges.maker_id = part.maker_id
+        AND ranges.category_id = part.category_id
+        AND ranges.model_id = part.model_id
+        AND ranges.part_number = part.part_number
+        AND ranges.part_category = part.part_category
+        AND ranges.url = part.url
+        AND ranges.last_scan_id >= COALESCE($2::int, $1::int)
+    RETURNING {", ".join(f"ranges.{column}" for column in PART_RANGE_KEY.split(", "))}
 )
-INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id)
-VALUES (
-    COALESCE((SELECT id FROM maker_insert), (SELECT id FROM makers WHERE maker = $1)),
-    COALESCE((SELECT id FROM category_insert), (SELECT id FROM categories WHERE category = $2)),
-    COALESCE((SELECT id FROM model_insert), (SELECT id FROM models WHERE model = $3)),
-    $4, $5, $6, $7
-);
+INSERT INTO part_ranges ({PART_RANGE_KEY}, first_scan_id, last_scan_id)
+SELECT DISTINCT {PART_RANGE_KEY}, $1::int, $1::int
+FROM staged
+WHERE ({PART_RANGE_KEY}) NOT IN (SELECT {PART_RANGE_KEY} FROM extended)
+ON CONFLICT DO NOTHING
 """
@@ -1,5 +1,7 @@
 import asyncio
+import json
 import os
+import socket
 from contextlib import asynccontextmanager
 from datetime import datetime
 
@@ -7,11 +9,16 @@ import uvicorn
 from fastapi import FastAPI
 from loguru import logger
 
-from config.settings import AppConfig, DbConfig
+from app.http import create_http_client
+from app.profiling import Profiling
+from app.ratelimit import RateLimiterRegistry
+from config.settings import AppConfig, DbConfig, HttpClientConfig, RetryConfig, ScraperConfig
 from db.database import Postgres
 from db.utils import initialize_database
 from models import ScrapingStatus
 from routers.healthcheck import router as healthcheck_router
+from routers.metrics import router as metrics_router
+from routers.profiling import router as profiling_router
 from routers.scraper import router as scraper_router
 
 
@@ -23,9 +30,14 @@ async def lifespan(app: FastAPI):
     await initialize_database(db=database)
     app.state.db = database
     logger.info("Database initialized.")
+    # one client for the app lifetime so scans start with warm keep-alive connections
+    app.state.http_client = create_http_client(
+        config=app.state.app_config.scraper.http, status=app.state.scraping_status
+    )
 
     yield
 
+    await app.state.http_client.aclose()
     await database.disconnect()
 
 
@@ -35,10 +47,66 @@ db_config = DbConfig(
     database=os.getenv("DB_NAME", "parts_catalogue"),
     user=os.getenv("DB_USER", "user"),
     password=os.getenv("DB_PASS", "pass"),
+    dimension_cache_size=int(os.getenv("DIMENSION_CACHE_SIZE", "10000")),
+)
+http_client_config = HttpClientConfig(
+    http2=os.getenv("HTTP2", "true").lower() == "true",
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+    write_timeout=float(os.getenv("HTTP_WRITE_TIMEOUT", "10")),
+    pool_timeout=float(os.getenv("HTTP_POOL_TIMEOUT", "10")),
+)
+retry_config = RetryConfig(
+    jitter=float(os.getenv("RETRY_JITTER", "0.5")),
+    # {"<error class>": {"max_attempts": ..., "base_delay": ..., "max_delay": ...}} replacing the default policies,
+    # empty when compose passes on an unset variable
+    policies=json.loads(os.getenv("RETRY_POLICIES") or "{}"),
+)
+scraper_config = ScraperConfig(
+    base_url=os.getenv("BASE_URL", "https://www.urparts.com/"),
+    insert_mode=os.getenv("INSERT_MODE", "executemany"),
+    storage_mode=os.getenv("STORAGE_MODE", "snapshot"),
+    parser_backend=os.getenv("PARSER_BACKEND", "lxml"),
+    parse_executor=os.getenv("PARSE_EXECUTOR", "process"),
+    parse_workers=int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1)),
+    concurrent_requests=int(os.getenv("CONCURRENT_REQUESTS", "10")),
+    max_concurrent_requests=int(os.getenv("MAX_CONCURRENT_REQUESTS", "50")),
+    rate_limit=float(os.getenv("RATE_LIMIT", "20")),
+    min_rate_limit=float(os.getenv("MIN_RATE_LIMIT", "1")),
+    max_rate_limit=float(os.getenv("MAX_RATE_LIMIT", "100")),
+    target_latency=float(os.getenv("TARGET_LATENCY", "1")),
+    http=http_client_config,
+    retry=retry_config,
+    http_cache_dir=os.getenv("HTTP_CACHE_DIR"),
+    http_cache_max_bytes=int(os.getenv("HTTP_CACHE_MAX_MB", "1024")) * 2**20,
+    archive_dir=os.getenv("ARCHIVE_DIR"),
+    incremental=os.getenv("INCREMENTAL_SCAN", "false").lower() == "true",
+    retain_scans=int(os.getenv("RETAIN_SCANS", "0")),
+    checkpoint_batch_size=int(os.getenv("CHECKPOINT_BATCH_SIZE", "500")),
+    checkpoint_interval=float(os.getenv("CHECKPOINT_INTERVAL", "5")),
+    writer_flush_rows=int(os.getenv("WRITER_FLUSH_ROWS", "5000")),
+    writer_flush_interval=float(os.getenv("WRITER_FLUSH_INTERVAL", "1")),
+    writer_max_pending=int(os.getenv("WRITER_MAX_PENDING", "100")),
+    writer_workers=int(os.getenv("WRITER_WORKERS", "1")),
+    parse_queue_size=int(os.getenv("PARSE_QUEUE_SIZE", "100")),
+    visited_set_mode=os.getenv("VISITED_SET_MODE", "hash"),
+    visited_capacity=int(os.getenv("VISITED_CAPACITY", "1000000")),
+    visited_error_rate=float(os.getenv("VISITED_ERROR_RATE", "0.0001")),
+    frontier_memory_limit=int(os.getenv("FRONTIER_MEMORY_LIMIT", "100000")),
+    frontier_spill_dir=os.getenv("FRONTIER_SPILL_DIR"),
+    distributed=os.getenv("DISTRIBUTED_SCAN", "false").lower() == "true",
+    node_id=os.getenv("NODE_ID", f"{socket.gethostname()}-{os.getpid()}"),
+    lease_timeout=float(os.getenv("LEASE_TIMEOUT", "60")),
+    claim_batch_size=int(os.getenv("CLAIM_BATCH_SIZE", "10")),
+    frontier_poll_interval=float(os.getenv("FRONTIER_POLL_INTERVAL", "1")),
 )
 app_config = AppConfig(
     port=int(os.getenv("APP_PORT", 8080)),
     db=db_config,
+    scraper=scraper_config,
 )
 app = FastAPI(lifespan=lifespan)
 
@@ -46,10 +114,14 @@ app = FastAPI(lifespan=lifespan)
 def init_app(app: FastAPI, app_config: AppConfig):
     app.include_router(healthcheck_router)
     app.include_router(scraper_router)
+    app.include_router(metrics_router)
+    app.include_router(profiling_router)
 
     app.state.start_time = datetime.now()
     app.state.app_config = app_config
     app.state.scraping_status = ScrapingStatus()
+    app.state.rate_limiters = RateLimiterRegistry(config=app_config.scraper)
+    app.state.profiling = Profiling()
 
     logger.info("Application initialized.")
 
@@ -1,13 +1,37 @@
-from .catalogue import CatalogueLevels, CatalogueLink, CataloguePart, PartDetails
-from .service import REQUEST_DELAY, ScraperContext, ScraperPayload, ScrapingStatus
+from .catalogue import CatalogueLevels, CatalogueLink, CataloguePart, DirectoryPath, PartDetails
+from .service import (
+    ArchiveStats,
+    CacheStats,
+    HttpStats,
+    IncrementalStats,
+    InsertStats,
+    MemoryStats,
+    PipelineStageStats,
+    RetryStats,
+    ScraperContext,
+    ScraperPayload,
+    ScrapingStatus,
+    StageStats,
+    WriterStats,
+)
 
 __all__ = [
     "CatalogueLevels",
     "CataloguePart",
     "PartDetails",
     "CatalogueLink",
+    "DirectoryPath",
+    "ArchiveStats",
+    "CacheStats",
+    "HttpStats",
+    "IncrementalStats",
+    "InsertStats",
+    "MemoryStats",
+    "PipelineStageStats",
+    "RetryStats",
     "ScraperContext",
     "ScraperPayload",
     "ScrapingStatus",
-    "REQUEST_DELAY",
+    "StageStats",
+    "WriterStats",
 ]
@@ -1,12 +1,9 @@
-import os
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 from urllib.parse import ParseResult as ParsedUrl
 
-from pydantic import BaseModel, Field
-
-REQUEST_DELAY = float(os.getenv("REQUEST_DELAY", "0.5"))  # seconds
-
 
 class CatalogueLevels(str, Enum):
     MAKERS = "allmakes"
@@ -15,25 +12,63 @@ class CatalogueLevels(str, Enum):
     PARTS = "allparts"
 
 
-class CataloguePart(BaseModel):
+class DirectoryPath(Mapping):
+    """Immutable path of catalogue entries above a link, level -> entry name.
+
+    A child link gets its own path from `child()`, parent and child never share a
+    mutable dict. Compares equal to a dict with the same entries.
+    """
+
+    __slots__ = ("_entries",)
+
+    def __init__(self, entries: Iterable[tuple[CatalogueLevels, str]] = ()):
+        self._entries = tuple(entries)
+
+    def __getitem__(self, level: CatalogueLevels) -> str:
+        for entry_level, name in self._entries:
+            if entry_level == level:
+                return name
+        raise KeyError(level)
+
+    def __iter__(self) -> Iterator[CatalogueLevels]:
+        return (level for level, _ in self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __hash__(self) -> int:
+        return hash(self._entries)
+
+    def __repr__(self) -> str:
+        return f"DirectoryPath({dict(self._entries)!r})"
+
+    def child(self, level: CatalogueLevels, name: str) -> "DirectoryPath":
+        return DirectoryPath(self._entries + ((level, name),))
+
+
+EMPTY_DIRECTORY = DirectoryPath()
+
+
+@dataclass(frozen=True, slots=True)
+class CataloguePart:
     number: str
     category: str
     url: str
 
-    class Config:
-        frozen = True
-
 
-class PartDetails(BaseModel):
+@dataclass(frozen=True, slots=True)
+class PartDetails:
     maker: Optional[str]
     category: Optional[str]
     model: Optional[str]
     part: Optional[CataloguePart]
 
-    class Config:
-        frozen = True
 
-
-class CatalogueLink(BaseModel):
+@dataclass(frozen=True, slots=True)
+class CatalogueLink:
     url: ParsedUrl
-    directory: dict[CatalogueLevels, str] = Field(default=dict())
+    directory: DirectoryPath = EMPTY_DIRECTORY
+
+    def __post_init__(self):
+        if not isinstance(self.directory, DirectoryPath):
+            object.__setattr__(self, "directory", DirectoryPath(self.directory.items()))
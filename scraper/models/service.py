@@ -1,39 +1,163 @@
-import os
-from asyncio import Queue as AsyncQueue
-from asyncio import Semaphore
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Optional, Union
 
 from httpx import AsyncClient as HttpAsyncClient
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, computed_field
 
+from app.archive import ArchiveReader, ArchiveWriter
+from app.frontier import FrontierCheckpoint
+from app.http_cache import ResponseCache
+from app.pipeline import Stage
+from app.ratelimit import RateLimiterRegistry
+from app.scheduler import CrawlScheduler, DistributedScheduler
+from app.visited import BloomFilter, UrlHashSet
+from app.writer import PartsWriter
+from config.settings import ScraperConfig
 from db.database import Postgres
 
 from .catalogue import CatalogueLevels, CatalogueLink
 
-REQUEST_DELAY = float(os.getenv("REQUEST_DELAY", "0.5"))  # seconds
+
+class InsertStats(BaseModel):
+    mode: str = Field(default="")
+    batches: int = Field(default=0)
+    rows: int = Field(default=0)
+    seconds: float = Field(default=0.0)
+
+    @computed_field
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def record(self, rows: int, seconds: float) -> None:
+        self.batches += 1
+        self.rows += rows
+        self.seconds += seconds
+
+
+class HttpStats(BaseModel):
+    requests: int = Field(default=0)
+    connections: int = Field(default=0)
+    tls_handshakes: int = Field(default=0)
+    http2_responses: int = Field(default=0)
+
+    @computed_field
+    @property
+    def connection_reuse(self) -> float:
+        """Share of requests served on an already open connection."""
+        return 1 - self.connections / self.requests if self.requests else 0.0
+
+
+class CacheStats(BaseModel):
+    hits: int = Field(default=0)
+    misses: int = Field(default=0)
+    bytes_saved: int = Field(default=0)
+
+
+class ArchiveStats(BaseModel):
+    recorded: int = Field(default=0)
+    recorded_bytes: int = Field(default=0)
+    replayed: int = Field(default=0)
+    misses: int = Field(default=0)
+
+
+class IncrementalStats(BaseModel):
+    previous_scan_id: Optional[int] = Field(default=None)
+    skipped_subtrees: int = Field(default=0)
+    copied_rows: int = Field(default=0)
+
+
+class WriterStats(BaseModel):
+    flushes: int = Field(default=0)
+    rows: int = Field(default=0)
+    last_flush_rows: int = Field(default=0)
+    last_flush_seconds: float = Field(default=0.0)
+    max_flush_seconds: float = Field(default=0.0)
+    queue_depth: int = Field(default=0)
+
+    def record(self, rows: int, seconds: float) -> None:
+        self.flushes += 1
+        self.rows += rows
+        self.last_flush_rows = rows
+        self.last_flush_seconds = seconds
+        self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+
+
+class MemoryStats(BaseModel):
+    visited_urls: int = Field(default=0)
+    visited_bytes: int = Field(default=0)
+    spilled_pages: int = Field(default=0)
+    peak_rss_bytes: int = Field(default=0)
+
+
+class RetryStats(BaseModel):
+    retried: int = Field(default=0)
+    deferred: int = Field(default=0)  # waiting out their backoff
+    dead_letters: int = Field(default=0)
+
+
+class StageStats(BaseModel):
+    """Seconds spent per stage, summed over all workers of the scan."""
+
+    queue_wait: float = Field(default=0.0)
+    limiter_wait: float = Field(default=0.0)
+    fetch: float = Field(default=0.0)
+    parse: float = Field(default=0.0)
+    insert: float = Field(default=0.0)
+
+
+class PipelineStageStats(BaseModel):
+    workers: int = Field(default=0)
+    items: int = Field(default=0)
+    busy_seconds: float = Field(default=0.0)
+    utilization: float = Field(default=0.0)  # share of worker time spent busy
+    queue_depth: int = Field(default=0)  # items waiting for the stage
 
 
 class ScrapingStatus(BaseModel):
     scraping: bool = Field(default=False)
+    scan_id: Optional[int] = Field(default=None)
     scraping_counter: int = Field(default=0)
+    insert: InsertStats = Field(default_factory=InsertStats)
+    http: HttpStats = Field(default_factory=HttpStats)
+    cache: CacheStats = Field(default_factory=CacheStats)
+    archive: ArchiveStats = Field(default_factory=ArchiveStats)
+    incremental: IncrementalStats = Field(default_factory=IncrementalStats)
+    writer: WriterStats = Field(default_factory=WriterStats)
+    memory: MemoryStats = Field(default_factory=MemoryStats)
+    retries: RetryStats = Field(default_factory=RetryStats)
+    stages: StageStats = Field(default_factory=StageStats)
+    pipeline: dict[str, PipelineStageStats] = Field(default_factory=dict)
 
 
 class ScraperContext(BaseModel):
-    semaphore: Semaphore
-    visited_urls: set
-    queue: AsyncQueue
+    rate_limiters: RateLimiterRegistry
+    visited_urls: Union[UrlHashSet, BloomFilter, set]
+    queue: Union[CrawlScheduler, DistributedScheduler]
     http_client: HttpAsyncClient
     db_connection: Postgres
     scan_id: int
     scraping: bool = Field(default=False)
     scraping_status: ScrapingStatus
+    config: ScraperConfig = Field(default_factory=ScraperConfig)
+    parse_executor: Optional[Executor] = Field(default=None)
+    response_cache: Optional[ResponseCache] = Field(default=None)
+    archive: Optional[ArchiveWriter] = Field(default=None)
+    replay: Optional[ArchiveReader] = Field(default=None)
+    previous_scan_id: Optional[int] = Field(default=None)
+    previous_page_hashes: dict[str, str] = Field(default_factory=dict)
+    checkpoint: Optional[FrontierCheckpoint] = Field(default=None)
+    writer: Optional[PartsWriter] = Field(default=None)
+    pipeline: dict[str, Stage] = Field(default_factory=dict)
 
     model_config = ConfigDict(
         arbitrary_types_allowed=True,
     )
 
 
-class ScraperPayload(BaseModel):
+@dataclass(frozen=True, slots=True)
+class ScraperPayload:
     link: CatalogueLink
     level: CatalogueLevels
-    attempt: int = Field(default=1)
-    delay: float = Field(default=REQUEST_DELAY)
+    attempt: int = 1
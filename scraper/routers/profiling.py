@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from app.profiling import ProfileMode
+
+router = APIRouter(prefix="/admin")
+
+
+def check_scraping(request: Request) -> None:
+    if not request.app.state.scraping_status.scraping:
+        raise HTTPException(status_code=400, detail="no scan is running")
+
+
+@router.post("/profile/start")
+async def start_profile(
+    request: Request,
+    mode: ProfileMode = ProfileMode.SAMPLER,
+    interval: float = Query(default=0.005, gt=0),
+) -> str:
+    """Profile the event loop of the running scan with cProfile or a stack sampler taking a sample every `interval`."""
+    check_scraping(request)
+    try:
+        request.app.state.profiling.start_cpu(mode, interval)
+    except RuntimeError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return f"{mode.value} profiler started"
+
+
+@router.post("/profile/stop")
+async def stop_profile(request: Request) -> Response:
+    """Download the profile: a pstats file for cProfile, collapsed stacks for flamegraph tools for the sampler."""
+    try:
+        mode, content = request.app.state.profiling.stop_cpu()
+    except RuntimeError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    scan_id = request.app.state.scraping_status.scan_id
+    if mode == ProfileMode.CPROFILE:
+        filename, media_type = f"scan-{scan_id}.pstats", "application/octet-stream"
+    else:
+        filename, media_type = f"scan-{scan_id}.folded", "text/plain"
+    return Response(
+        content=content, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/tracemalloc/start")
+async def start_tracemalloc(request: Request, frames: int = Query(default=1, gt=0)) -> str:
+    check_scraping(request)
+    try:
+        request.app.state.profiling.start_memory(frames)
+    except RuntimeError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return "tracemalloc started"
+
+
+@router.post("/tracemalloc/stop")
+async def stop_tracemalloc(request: Request, limit: int = Query(default=25, gt=0)) -> Response:
+    """The `limit` source lines whose allocations grew the most since tracemalloc was started."""
+    try:
+        diff = request.app.state.profiling.stop_memory(limit)
+    except RuntimeError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return Response(content=diff, media_type="text/plain")
@@ -1,22 +1,143 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from datetime import datetime
+from typing import Optional
 
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+
+from app.archive import archive_paths
+from app.ratelimit import AdaptiveRateLimiter
 from app.scraper import run_scraper
+from config.settings import ScanScope, ScraperConfig
+from db.queries import GET_SCAN_QUERY, SELECT_DEAD_LETTERS_QUERY
 from models import ScrapingStatus
 
 router = APIRouter()
 
 
-@router.get("/run")
-async def scrape(request: Request, background_tasks: BackgroundTasks) -> str:
+class RateLimitState(BaseModel):
+    host: str
+    rate: float
+    concurrency: int
+    in_flight: int
+
+
+class DeadLetter(BaseModel):
+    url: str
+    level: str
+    attempts: int
+    error_class: str
+    error: str
+    status_code: Optional[int]
+    failed_at: datetime
+
+
+class RateLimitUpdate(BaseModel):
+    rate: Optional[float] = Field(default=None, gt=0)
+    concurrency: Optional[int] = Field(default=None, gt=0)
+
+
+def rate_limit_state(host: str, limiter: AdaptiveRateLimiter) -> RateLimitState:
+    return RateLimitState(host=host, rate=limiter.rate, concurrency=limiter.concurrency, in_flight=limiter.in_flight)
+
+
+def start_scraper(
+    request: Request, background_tasks: BackgroundTasks, config: ScraperConfig, scan_id: Optional[int] = None
+) -> None:
     if request.app.state.scraping_status.scraping:
         raise HTTPException(
             status_code=400,
             detail="scraping is running",
         )
-    background_tasks.add_task(run_scraper, request.app.state.db, request.app.state.scraping_status)
+    background_tasks.add_task(
+        run_scraper,
+        request.app.state.db,
+        request.app.state.scraping_status,
+        config,
+        request.app.state.rate_limiters,
+        request.app.state.http_client,
+        scan_id=scan_id,
+    )
+
+
+@router.get("/run")
+async def scrape(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    incremental: Optional[bool] = None,
+    distributed: Optional[bool] = None,
+    maker: list[str] = Query(default=[]),
+    category: list[str] = Query(default=[]),
+    model: list[str] = Query(default=[]),
+) -> str:
+    config = request.app.state.app_config.scraper
+    overrides = {"incremental": incremental, "distributed": distributed}
+    if maker or category or model:
+        # crawl only these subtrees, the previous scan's other parts are carried forward
+        overrides["scope"] = ScanScope(makers=maker, categories=category, models=model)
+    config = config.model_copy(update={key: value for key, value in overrides.items() if value is not None})
+    start_scraper(request, background_tasks, config)
     return "Scraper started successfully"
 
 
+@router.get("/replay")
+async def replay(request: Request, background_tasks: BackgroundTasks, scan_id: int) -> str:
+    """Run a new scan from the archived pages of scan `scan_id`, without fetching anything from the site."""
+    config = request.app.state.app_config.scraper
+    if not config.archive_dir:
+        raise HTTPException(status_code=400, detail="ARCHIVE_DIR is not set")
+    if not archive_paths(config.archive_dir, scan_id):
+        raise HTTPException(status_code=404, detail=f"no archive of scan {scan_id}")
+    config = config.model_copy(update={"replay_scan_id": scan_id, "distributed": False})
+    start_scraper(request, background_tasks, config)
+    return f"Replaying scan {scan_id}"
+
+
+async def check_unfinished_scan(request: Request, scan_id: int) -> None:
+    scans = await request.app.state.db.fetch(GET_SCAN_QUERY, scan_id)
+    if not scans:
+        raise HTTPException(status_code=404, detail=f"scan {scan_id} not found")
+    if scans[0]["time_end"] is not None:
+        raise HTTPException(status_code=400, detail=f"scan {scan_id} already finished")
+
+
+@router.get("/resume")
+async def resume(request: Request, background_tasks: BackgroundTasks, scan_id: int) -> str:
+    await check_unfinished_scan(request, scan_id)
+    config = request.app.state.app_config.scraper.model_copy(update={"distributed": False})
+    start_scraper(request, background_tasks, config, scan_id=scan_id)
+    return f"Scan {scan_id} resumed"
+
+
+@router.get("/join")
+async def join(request: Request, background_tasks: BackgroundTasks, scan_id: int) -> str:
+    await check_unfinished_scan(request, scan_id)
+    config = request.app.state.app_config.scraper.model_copy(update={"distributed": True})
+    start_scraper(request, background_tasks, config, scan_id=scan_id)
+    return f"Joined scan {scan_id}"
+
+
 @router.get("/status")
 async def status(request: Request) -> ScrapingStatus:
     return request.app.state.scraping_status
+
+
+@router.get("/status/dead-letters")
+async def dead_letters(request: Request, scan_id: Optional[int] = None) -> list[DeadLetter]:
+    """Pages given up on in a scan, the current or last one by default."""
+    scan_id = scan_id if scan_id is not None else request.app.state.scraping_status.scan_id
+    if scan_id is None:
+        raise HTTPException(status_code=400, detail="no scan_id given and no scan ran yet")
+    rows = await request.app.state.db.fetch(SELECT_DEAD_LETTERS_QUERY, scan_id)
+    return [DeadLetter(**dict(row)) for row in rows]
+
+
+@router.get("/status/rate-limit")
+async def rate_limits(request: Request) -> list[RateLimitState]:
+    return [rate_limit_state(host, limiter) for host, limiter in request.app.state.rate_limiters.items()]
+
+
+@router.patch("/status/rate-limit/{host}")
+async def update_rate_limit(host: str, update: RateLimitUpdate, request: Request) -> RateLimitState:
+    limiter = request.app.state.rate_limiters.for_host(host)
+    await limiter.update(rate=update.rate, concurrency=update.concurrency)
+    return rate_limit_state(host, limiter)
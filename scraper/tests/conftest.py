@@ -1,14 +1,18 @@
 import os
 import sys
-from asyncio import Queue, Semaphore
 from unittest.mock import AsyncMock
 
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient
 
 # Add parent directory to the sys.path to resolve relative imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.ratelimit import RateLimiterRegistry
+from app.scheduler import CrawlScheduler
+from config.settings import DbConfig, ScraperConfig
 from db.database import Postgres
+from db.utils import initialize_database
 from models import ScraperContext, ScrapingStatus
 
 
@@ -19,9 +23,9 @@ def fake_context():
     mock_db_client = AsyncMock(spec=Postgres)
 
     ctx = ScraperContext(
-        semaphore=Semaphore(1),
+        rate_limiters=RateLimiterRegistry(ScraperConfig()),
         visited_urls=set(),
-        queue=Queue(),
+        queue=CrawlScheduler(),
         http_client=mock_http_client,
         db_connection=mock_db_client,
         scan_id=1,
@@ -29,3 +33,23 @@ def fake_context():
     )
 
     return ctx
+
+
+@pytest_asyncio.fixture
+async def database():
+    """A real Postgres for integration tests, only available when TEST_DB_HOST is set."""
+    if not os.getenv('TEST_DB_HOST'):
+        pytest.skip('TEST_DB_HOST is not set')
+    db = Postgres(
+        db_config=DbConfig(
+            host=os.getenv('TEST_DB_HOST'),
+            port=int(os.getenv('TEST_DB_PORT', '5432')),
+            database=os.getenv('TEST_DB_NAME', 'parts_catalogue_test'),
+            user=os.getenv('TEST_DB_USER', 'user'),
+            password=os.getenv('TEST_DB_PASS', 'pass'),
+        )
+    )
+    await db.connect()
+    await initialize_database(db=db)
+    yield db
+    await db.disconnect()
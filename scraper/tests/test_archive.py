@@ -0,0 +1,69 @@
+from urllib.parse import urlparse
+
+import pytest
+
+from app.archive import ArchiveMiss, ArchiveReader, ArchiveWriter, archive_path, archive_paths
+from app.scraper import fetch_html
+from models import CatalogueLevels, CatalogueLink, ScraperPayload, ScrapingStatus
+
+
+def test_archive_round_trip_serves_the_last_record_of_a_url(tmp_path):
+    writer = ArchiveWriter(archive_path(tmp_path, 7), scan_id=7)
+    writer.write("https://example.com/a", 200, b"<html>a</html>")
+    writer.write("https://example.com/b", 200, b"<html>b</html>")
+    writer.close()
+    # a resumed scan appends to the same file
+    writer = ArchiveWriter(archive_path(tmp_path, 7), scan_id=7)
+    writer.write("https://example.com/a", 200, b"<html>a again</html>")
+    writer.close()
+
+    reader = ArchiveReader(archive_paths(tmp_path, 7))
+
+    assert len(reader) == 2
+    assert reader.get("https://example.com/a").body == b"<html>a again</html>"
+    assert reader.get("https://example.com/b").body == b"<html>b</html>"
+    with pytest.raises(ArchiveMiss):
+        reader.get("https://example.com/c")
+    reader.close()
+
+
+def test_archive_reader_keeps_the_records_before_a_truncated_one(tmp_path):
+    path = archive_path(tmp_path, 7, node_id="node-a")
+    writer = ArchiveWriter(path, scan_id=7)
+    writer.write("https://example.com/a", 200, b"<html>a</html>")
+    writer.close()
+    complete = path.stat().st_size
+    writer = ArchiveWriter(path, scan_id=7)
+    writer.write("https://example.com/b", 200, b"<html>b</html>" * 100)
+    writer.close()
+    with path.open("r+b") as archive_file:
+        archive_file.truncate(complete + 20)
+
+    reader = ArchiveReader(archive_paths(tmp_path, 7))
+
+    assert len(reader) == 1
+    assert reader.get("https://example.com/a").body == b"<html>a</html>"
+    reader.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_html_records_and_replays_pages(fake_context, tmp_path):
+    url = "https://example.com/archived"
+    payload = ScraperPayload(link=CatalogueLink(url=urlparse(url)), level=CatalogueLevels.MODELS)
+    fake_context.http_client.get.return_value.status_code = 200
+    fake_context.http_client.get.return_value.content = b"<html>live</html>"
+    writer = ArchiveWriter(archive_path(tmp_path, 1), scan_id=1)
+    recording = fake_context.model_copy(update={"archive": writer, "scraping_status": ScrapingStatus()})
+
+    assert await fetch_html(payload, recording) == b"<html>live</html>"
+    writer.close()
+    fake_context.http_client.get.reset_mock()
+    replaying = fake_context.model_copy(
+        update={"replay": ArchiveReader(archive_paths(tmp_path, 1)), "scraping_status": ScrapingStatus()}
+    )
+
+    assert await fetch_html(payload, replaying) == b"<html>live</html>"
+    fake_context.http_client.get.assert_not_called()
+    assert recording.scraping_status.archive.recorded == 1
+    assert replaying.scraping_status.archive.replayed == 1
+    replaying.replay.close()
@@ -0,0 +1,51 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from config.settings import DbConfig
+from db.database import Postgres
+from db.dimensions import DimensionCache
+
+
+@pytest.fixture
+def database():
+    db_config = DbConfig(host="localhost", port=5432, database="db", user="user", password="pass")
+    return Postgres(db_config=db_config)
+
+
+def test_dimension_cache_is_bounded():
+    cache = DimensionCache(max_size=2)
+    cache.put("A", 1)
+    cache.put("B", 2)
+    assert cache.get("A") == 1
+
+    cache.put("C", 3)
+
+    assert len(cache) == 2
+    assert cache.get("B") is None
+    assert cache.get("A") == 1
+    assert cache.get("C") == 3
+
+
+@pytest.mark.asyncio
+async def test_resolve_dimension_ids_upserts_only_misses(database):
+    database.dimensions["makers"].put("MAKER1", 1)
+    database.fetch = AsyncMock(return_value=[("MAKER2", 2)])
+
+    ids = await database.resolve_dimension_ids("makers", ["MAKER1", "MAKER2", "MAKER2"])
+
+    assert ids == {"MAKER1": 1, "MAKER2": 2}
+    database.fetch.assert_awaited_once()
+    assert database.fetch.call_args.args[1] == ["MAKER2"]
+    assert database.dimensions["makers"].get("MAKER2") == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_dimension_ids_all_cached(database):
+    database.dimensions["models"].put("MODEL1", 7)
+    database.fetch = AsyncMock()
+
+    ids = await database.resolve_dimension_ids("models", ["MODEL1"])
+
+    assert ids == {"MODEL1": 7}
+    database.fetch.assert_not_awaited()
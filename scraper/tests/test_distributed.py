@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock
+from urllib.parse import urlparse
+
+import pytest
+
+from app.scheduler import DistributedScheduler
+from app.scraper import crawl_priority, frontier_payload, frontier_row
+from db.database import Postgres
+from db.queries import (
+    CLAIM_FRONTIER_QUERY,
+    DELETE_FRONTIER_QUERY,
+    FINISH_SCAN_QUERY,
+    GET_NEW_SCAN_ID,
+    MARK_FRONTIER_DONE_QUERY,
+)
+from models import CatalogueLevels, CatalogueLink, ScraperPayload
+
+
+def make_payload(url: str, level: CatalogueLevels, **directory) -> ScraperPayload:
+    link = CatalogueLink(url=urlparse(url), directory={CatalogueLevels(k): v for k, v in directory.items()})
+    return ScraperPayload(link=link, level=level)
+
+
+def make_scheduler(database, scan_id: int, node_id: str, **kwargs) -> DistributedScheduler:
+    return DistributedScheduler(
+        database,
+        scan_id,
+        node_id,
+        encode=frontier_row,
+        decode=frontier_payload,
+        priority=crawl_priority,
+        poll_interval=0.05,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_put_many_returns_only_newly_queued_pages():
+    database = AsyncMock(spec=Postgres)
+    database.fetch.return_value = [("https://example.com/b",)]
+    scheduler = make_scheduler(database, 7, "node-a")
+    payloads = [
+        make_payload("https://example.com/a", CatalogueLevels.MODELS),
+        make_payload("https://example.com/b", CatalogueLevels.PARTS, allmakes="MAKER1"),
+    ]
+
+    queued = await scheduler.put_many(payloads)
+
+    assert queued == [payloads[1]]
+    _, scan_id, urls, levels, directories, priorities = database.fetch.await_args.args
+    assert (scan_id, urls, levels) == (7, ["https://example.com/a", "https://example.com/b"], ["allmodels", "allparts"])
+    assert directories == ["{}", '{"allmakes": "MAKER1"}']
+    assert priorities == [1, 0]
+
+
+@pytest.mark.asyncio
+async def test_get_serves_claimed_batch_by_priority():
+    database = AsyncMock(spec=Postgres)
+    database.fetch.return_value = [
+        ("https://example.com/models", "allmodels", "{}", 1, 1),
+        ("https://example.com/parts", "allparts", '{"allmakes": "MAKER1"}', 2, 0),
+    ]
+    scheduler = make_scheduler(database, 7, "node-a", lease_timeout=30, claim_batch_size=2)
+
+    first = await scheduler.get()
+    second = await scheduler.get()
+
+    database.fetch.assert_awaited_once_with(CLAIM_FRONTIER_QUERY, 7, "node-a", 30, 2)
+    assert first.link.url.path == "/parts"
+    assert first.attempt == 2
+    assert first.link.directory == {CatalogueLevels.MAKERS: "MAKER1"}
+    assert second.link.url.path == "/models"
+
+
+async def run_node(scheduler: DistributedScheduler, database: Postgres, processed: list, fanout: int):
+    """A scraper node: every page queues `fanout` children until the parts level."""
+    levels = list(CatalogueLevels)
+    while True:
+        payload = await scheduler.get()
+        url = payload.link.url.geturl()
+        processed.append(url)
+        depth = levels.index(payload.level)
+        if depth + 1 < len(levels):
+            children = [make_payload(f"{url}/{i}", levels[depth + 1]) for i in range(fanout)]
+            await scheduler.put_many(children)
+        await database.execute(MARK_FRONTIER_DONE_QUERY, scheduler.scan_id, [url])
+
+
+@pytest.mark.asyncio
+async def test_nodes_share_a_scan_and_one_of_them_finishes_it(database):
+    scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now(), "snapshot")
+    processed = []
+    schedulers = [make_scheduler(database, scan_id, f"node-{i}", claim_batch_size=3) for i in range(3)]
+    await schedulers[0].put(make_payload("https://example.com/root", CatalogueLevels.MAKERS))
+
+    workers = [
+        asyncio.create_task(run_node(scheduler, database, processed, fanout=3))
+        for scheduler in schedulers
+        for _ in range(2)
+    ]
+    await asyncio.wait_for(asyncio.gather(*(scheduler.join() for scheduler in schedulers)), timeout=30)
+    for worker in workers:
+        worker.cancel()
+    finished = [await database.fetchval(FINISH_SCAN_QUERY, scan_id, datetime.now()) for _ in schedulers]
+    await database.execute(DELETE_FRONTIER_QUERY, scan_id)
+
+    # 1 + 3 + 9 + 27 pages, each processed exactly once
+    assert len(processed) == 40
+    assert len(set(processed)) == 40
+    assert finished == [scan_id, None, None]
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_claimed_by_another_node(database):
+    scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now(), "snapshot")
+    dead_node = make_scheduler(database, scan_id, "dead-node", lease_timeout=0.2)
+    live_node = make_scheduler(database, scan_id, "live-node", lease_timeout=0.2)
+    await dead_node.put(make_payload("https://example.com/root", CatalogueLevels.PARTS))
+
+    # the dead node claims the page and never finishes it
+    await dead_node.get()
+    payload = await asyncio.wait_for(live_node.get(), timeout=5)
+    await database.execute(MARK_FRONTIER_DONE_QUERY, scan_id, [payload.link.url.geturl()])
+    await asyncio.wait_for(live_node.join(), timeout=5)
+    await database.execute(DELETE_FRONTIER_QUERY, scan_id)
+
+    assert payload.link.url.geturl() == "https://example.com/root"
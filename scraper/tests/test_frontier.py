@@ -0,0 +1,88 @@
+import json
+from unittest.mock import AsyncMock, call
+
+import pytest
+
+from app.frontier import FrontierCheckpoint
+from app.scraper import load_frontier
+from db.database import Postgres
+from db.queries import INSERT_FRONTIER_QUERY, MARK_FRONTIER_DONE_QUERY, SELECT_FRONTIER_QUERY
+from models import CatalogueLevels
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_flushes_enqueued_before_done():
+    database = AsyncMock(spec=Postgres)
+    manager = AsyncMock()
+    manager.attach_mock(database.executemany, "executemany")
+    manager.attach_mock(database.execute, "execute")
+    checkpoint = FrontierCheckpoint(database, scan_id=3, batch_size=2, interval=60)
+
+    checkpoint.done("https://example.com/parent")
+    checkpoint.enqueued("https://example.com/child", "allparts", {"allmakes": "MAKER1"})
+    await checkpoint.flush()
+    await checkpoint.flush()
+
+    assert manager.mock_calls == [
+        call.executemany(
+            INSERT_FRONTIER_QUERY, [(3, "https://example.com/child", "allparts", '{"allmakes": "MAKER1"}')]
+        ),
+        call.execute(MARK_FRONTIER_DONE_QUERY, 3, ["https://example.com/parent"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_keeps_buffered_pages_when_a_flush_fails():
+    database = AsyncMock(spec=Postgres)
+    database.execute.side_effect = [ConnectionError("connection lost"), None]
+    checkpoint = FrontierCheckpoint(database, scan_id=3, batch_size=10, interval=60)
+
+    checkpoint.enqueued("https://example.com/child", "allparts", {})
+    checkpoint.done("https://example.com/parent")
+    with pytest.raises(ConnectionError):
+        await checkpoint.flush()
+    checkpoint.done("https://example.com/child")
+    await checkpoint.flush()
+
+    # the children were written by the failed flush, only the done marks are retried
+    database.executemany.assert_awaited_once()
+    assert database.execute.call_args_list[-1] == call(
+        MARK_FRONTIER_DONE_QUERY, 3, ["https://example.com/parent", "https://example.com/child"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_retries_enqueued_pages_after_a_failed_insert():
+    database = AsyncMock(spec=Postgres)
+    database.executemany.side_effect = [ConnectionError("connection lost"), None]
+    checkpoint = FrontierCheckpoint(database, scan_id=3, batch_size=10, interval=60)
+
+    checkpoint.enqueued("https://example.com/child", "allparts", {})
+    checkpoint.done("https://example.com/parent")
+    with pytest.raises(ConnectionError):
+        await checkpoint.flush()
+    database.execute.assert_not_awaited()
+    await checkpoint.flush()
+
+    assert database.executemany.call_args == call(
+        INSERT_FRONTIER_QUERY, [(3, "https://example.com/child", "allparts", "{}")]
+    )
+    database.execute.assert_awaited_once_with(MARK_FRONTIER_DONE_QUERY, 3, ["https://example.com/parent"])
+
+
+@pytest.mark.asyncio
+async def test_load_frontier_restores_pending_payloads():
+    database = AsyncMock(spec=Postgres)
+    database.fetch.return_value = [
+        ("https://example.com/done", "allmakes", "{}", True),
+        ("https://example.com/todo", "allcategories", json.dumps({"allmakes": "MAKER1"}), False),
+    ]
+
+    pending, visited = await load_frontier(database, scan_id=3)
+
+    database.fetch.assert_awaited_once_with(SELECT_FRONTIER_QUERY, 3)
+    assert visited == {"https://example.com/done"}
+    assert len(pending) == 1
+    assert pending[0].level == CatalogueLevels.CATEGORIES
+    assert pending[0].link.url.geturl() == "https://example.com/todo"
+    assert pending[0].link.directory == {CatalogueLevels.MAKERS: "MAKER1"}
@@ -0,0 +1,29 @@
+import httpx
+import pytest
+
+from app.http import create_http_client
+from config.settings import HttpClientConfig
+from models import ScrapingStatus
+
+
+@pytest.mark.asyncio
+async def test_http_client_counts_connection_reuse():
+    status = ScrapingStatus()
+    client = create_http_client(HttpClientConfig(http2=False, connect_timeout=1.5, max_connections=7), status)
+
+    for i in range(4):
+        request = httpx.Request("GET", "https://example.com")
+        for hook in client.event_hooks["request"]:
+            await hook(request)
+        if i == 0:
+            await request.extensions["trace"]("connection.connect_tcp.complete", {})
+            await request.extensions["trace"]("connection.start_tls.complete", {})
+        for hook in client.event_hooks["response"]:
+            await hook(httpx.Response(200, request=request))
+    await client.aclose()
+
+    assert client.timeout.connect == 1.5
+    assert status.http.requests == 4
+    assert status.http.connections == 1
+    assert status.http.tls_handshakes == 1
+    assert status.http.connection_reuse == 0.75
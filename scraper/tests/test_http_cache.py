@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from urllib.parse import urlparse
+
+import pytest
+
+from app.http_cache import ResponseCache, conditional_headers
+from app.scraper import fetch_html
+from models import CatalogueLevels, CatalogueLink, ScraperPayload, ScrapingStatus
+
+
+def test_response_cache_roundtrip(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=2**20)
+    cache.put("https://example.com/a", '"v1"', None, b"<html>a</html>")
+
+    cached = ResponseCache(tmp_path, max_bytes=2**20).get("https://example.com/a")
+
+    assert cached.body == b"<html>a</html>"
+    assert conditional_headers(cached) == {"If-None-Match": '"v1"'}
+    assert cache.get("https://example.com/b") is None
+
+
+def test_response_cache_is_thread_safe(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=4096)
+
+    def use(i: int) -> None:
+        url = f"https://example.com/{i % 20}"
+        cache.put(url, f'"v{i}"', None, str(i).encode() * 200)
+        cache.get(url)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(use, range(2000)))
+
+    files = list(tmp_path.glob("*.cache"))
+    assert cache.size == sum(path.stat().st_size for path in files) <= 4096
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=2**20)
+    for name in "abc":
+        cache.put(f"https://example.com/{name}", '"v1"', None, name.encode() * 100)
+    cache.get("https://example.com/a")
+    cache.max_bytes = cache.size - 1
+
+    cache.put("https://example.com/a", '"v2"', None, b"a" * 100)
+
+    assert cache.get("https://example.com/b") is None
+    assert cache.get("https://example.com/a") is not None
+    assert cache.get("https://example.com/c") is not None
+
+
+@pytest.mark.asyncio
+async def test_fetch_html_serves_not_modified_from_cache(fake_context, tmp_path):
+    url = "https://example.com/cached"
+    cache = ResponseCache(tmp_path, max_bytes=2**20)
+    cache.put(url, '"v1"', None, b"<html>cached</html>")
+    ctx = fake_context.model_copy(update={"response_cache": cache, "scraping_status": ScrapingStatus()})
+    ctx.http_client.get.reset_mock()
+    ctx.http_client.get.return_value = MagicMock(status_code=304)
+    payload = ScraperPayload(link=CatalogueLink(url=urlparse(url)), level=CatalogueLevels.PARTS)
+
+    html = await fetch_html(payload, ctx)
+
+    assert html == b"<html>cached</html>"
+    ctx.http_client.get.assert_called_once_with(url, headers={"If-None-Match": '"v1"'})
+    assert ctx.scraping_status.cache.hits == 1
+    assert ctx.scraping_status.cache.bytes_saved == len(b"<html>cached</html>")
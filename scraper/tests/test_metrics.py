@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock, patch
+from urllib.parse import urlparse
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from httpx import HTTPError
+from prometheus_client import REGISTRY
+
+from app.scraper import fetch_page
+from models import CatalogueLevels, CatalogueLink, ScraperPayload
+from routers.metrics import router
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_records_fetch_and_retry_metrics(fake_context):
+    response = MagicMock(status_code=503)
+    response.raise_for_status.side_effect = HTTPError("unavailable")
+    fake_context.http_client.get.return_value = response
+    payload = ScraperPayload(
+        link=CatalogueLink(url=urlparse("https://example.com/metrics")), level=CatalogueLevels.MODELS
+    )
+    fetches = sample("scraper_fetch_seconds_count", level="allmodels")
+    responses = sample("scraper_http_responses_total", status="503")
+    retries = sample("scraper_retries_total", level="allmodels")
+
+    with patch.object(fake_context.queue, "retry") as retry:
+        assert await fetch_page(payload, fake_context) is None
+
+    retry.assert_awaited_once()
+    assert sample("scraper_fetch_seconds_count", level="allmodels") == fetches + 1
+    assert sample("scraper_http_responses_total", status="503") == responses + 1
+    assert sample("scraper_retries_total", level="allmodels") == retries + 1
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    app = FastAPI()
+    app.include_router(router)
+
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "scraper_fetch_seconds_bucket" in response.text
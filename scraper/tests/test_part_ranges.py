@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+
+from db.queries import (
+    GET_NEW_SCAN_ID,
+    INSERT_PART_RANGE_QUERY,
+    MERGE_STAGED_PART_RANGES_QUERY,
+    PARTS_STAGING_COLUMNS,
+    PARTS_STAGING_TABLE,
+    SCAN_ENDED,
+)
+
+
+async def ranged_scan(database, part_numbers, previous_scan_id, copy=False, finished=True) -> int:
+    scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now(), "ranges")
+    makers = await database.resolve_dimension_ids("makers", ["MAKER1"])
+    categories = await database.resolve_dimension_ids("categories", ["CATEGORY1"])
+    models = await database.resolve_dimension_ids("models", ["MODEL1"])
+    rows = [
+        (makers["MAKER1"], categories["CATEGORY1"], models["MODEL1"], number, "FOO", "https://a", scan_id)
+        for number in part_numbers
+    ]
+    if copy:
+        await database.copy_and_execute(
+            PARTS_STAGING_TABLE, rows, PARTS_STAGING_COLUMNS, MERGE_STAGED_PART_RANGES_QUERY, scan_id, previous_scan_id
+        )
+    else:
+        await database.executemany(INSERT_PART_RANGE_QUERY, [(*row, previous_scan_id) for row in rows])
+    if finished:
+        await database.execute(SCAN_ENDED, scan_id, datetime.now())
+    return scan_id
+
+
+async def scan_parts(database, scan_id) -> set[str]:
+    rows = await database.fetch(
+        "SELECT part_number FROM part_ranges WHERE first_scan_id <= $1 AND last_scan_id >= $1", scan_id
+    )
+    return {part_number for part_number, in rows}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("copy", [False, True])
+async def test_part_ranges_store_each_part_once(database, copy):
+    await database.execute("DELETE FROM part_ranges")
+    first = await ranged_scan(database, ["A", "B"], None, copy)
+    second = await ranged_scan(database, ["A", "B", "C"], first, copy)
+    third = await ranged_scan(database, ["A", "C"], second, copy)
+    fourth = await ranged_scan(database, ["A", "B"], third, copy)
+
+    assert await scan_parts(database, first) == {"A", "B"}
+    assert await scan_parts(database, second) == {"A", "B", "C"}
+    assert await scan_parts(database, third) == {"A", "C"}
+    assert await scan_parts(database, fourth) == {"A", "B"}
+    ranges = await database.fetch("SELECT part_number, first_scan_id, last_scan_id FROM part_ranges ORDER BY id")
+    assert sorted(tuple(row) for row in ranges) == [
+        ("A", first, fourth),
+        ("B", first, second),
+        ("B", fourth, fourth),
+        ("C", second, third),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_part_range_insert_is_idempotent(database):
+    await database.execute("DELETE FROM part_ranges")
+    first = await ranged_scan(database, ["A"], None)
+    makers = await database.resolve_dimension_ids("makers", ["MAKER1"])
+    categories = await database.resolve_dimension_ids("categories", ["CATEGORY1"])
+    models = await database.resolve_dimension_ids("models", ["MODEL1"])
+    row = (makers["MAKER1"], categories["CATEGORY1"], models["MODEL1"], "A", "FOO", "https://a", first, None)
+
+    await database.executemany(INSERT_PART_RANGE_QUERY, [row, row])
+
+    assert await database.fetchval("SELECT count(*) FROM part_ranges") == 1
+
+
+@pytest.mark.asyncio
+async def test_retention_keeps_the_ranges_of_an_unfinished_scan(database):
+    await database.execute("DELETE FROM part_ranges")
+    first = await ranged_scan(database, ["A"], None)
+    # an older scan that failed, later scans don't extend its ranges but /resume continues it
+    unfinished = await ranged_scan(database, ["U"], first, finished=False)
+    second = await ranged_scan(database, ["B"], first)
+    third = await ranged_scan(database, ["B"], second)
+    fourth = await ranged_scan(database, ["B"], third)
+
+    dropped = await database.drop_expired_scans(keep=2)
+
+    assert {first, second} <= set(dropped) and unfinished not in dropped
+    assert await scan_parts(database, unfinished) == {"U"}
+    assert await scan_parts(database, third) == {"B"}
+    assert await scan_parts(database, fourth) == {"B"}
+    ranges = await database.fetch("SELECT part_number, first_scan_id, last_scan_id FROM part_ranges ORDER BY id")
+    assert sorted(tuple(row) for row in ranges) == [("B", second, fourth), ("U", unfinished, unfinished)]
@@ -0,0 +1,139 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from db.queries import (
+    CREATE_TABLES_QUERY,
+    GET_NEW_SCAN_ID,
+    INSERT_PARTS_QUERY,
+    MERGE_STAGED_PARTS_QUERY,
+    PARTS_STAGING_COLUMNS,
+    PARTS_STAGING_TABLE,
+    SCAN_ENDED,
+    SELECT_PARTS_PARTITIONS_QUERY,
+)
+
+
+async def finished_scan_with_parts(database) -> int:
+    scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now(), "snapshot")
+    await database.create_parts_partition(scan_id)
+    makers = await database.resolve_dimension_ids("makers", ["MAKER1"])
+    categories = await database.resolve_dimension_ids("categories", ["CATEGORY1"])
+    models = await database.resolve_dimension_ids("models", ["MODEL1"])
+    await database.executemany(
+        INSERT_PARTS_QUERY,
+        [
+            (makers["MAKER1"], categories["CATEGORY1"], models["MODEL1"], f"{i}", "FOO", "https://a", scan_id)
+            for i in range(3)
+        ],
+    )
+    await database.execute(SCAN_ENDED, scan_id, datetime.now())
+    return scan_id
+
+
+@pytest.mark.asyncio
+async def test_staged_copy_merges_each_part_once(database):
+    scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now(), "snapshot")
+    await database.create_parts_partition(scan_id)
+    makers = await database.resolve_dimension_ids("makers", ["MAKER1"])
+    categories = await database.resolve_dimension_ids("categories", ["CATEGORY1"])
+    models = await database.resolve_dimension_ids("models", ["MODEL1"])
+    ids = (makers["MAKER1"], categories["CATEGORY1"], models["MODEL1"])
+    first = [(*ids, "1", "FOO", "https://a/1", scan_id), (*ids, "2", "FOO", "https://a/2", scan_id)]
+    # the second batch repeats a part of the first one
+    second = [(*ids, "2", "FOO", "https://a/2", scan_id), (*ids, "3", "BAR", "https://a/3", scan_id)]
+
+    for batch in (first, second):
+        await database.copy_and_execute(PARTS_STAGING_TABLE, batch, PARTS_STAGING_COLUMNS, MERGE_STAGED_PARTS_QUERY)
+
+    rows = await database.fetch(
+        "SELECT maker_id, category_id, model_id, part_number, part_category, url, scan_id "
+        "FROM parts WHERE scan_id = $1 ORDER BY part_number",
+        scan_id,
+    )
+    assert [tuple(row) for row in rows] == [first[0], first[1], second[1]]
+    assert await database.fetchval(f"SELECT count(*) FROM {PARTS_STAGING_TABLE}") == 0
+
+
+@pytest.mark.asyncio
+async def test_scan_filter_prunes_to_one_partition(database):
+    scan_id = await finished_scan_with_parts(database)
+    await finished_scan_with_parts(database)
+
+    plan = "\n".join(row[0] for row in await database.fetch(f"EXPLAIN SELECT * FROM parts WHERE scan_id = {scan_id}"))
+
+    assert set(re.findall(r"Scan on (parts_scan_\d+) ", plan)) == {f"parts_scan_{scan_id}"}
+
+
+@pytest.mark.asyncio
+async def test_drop_expired_scans_keeps_the_most_recent_ones(database):
+    scans = [await finished_scan_with_parts(database) for _ in range(3)]
+
+    dropped = await database.drop_expired_scans(keep=2)
+
+    partitions = {name for name, in await database.fetch(SELECT_PARTS_PARTITIONS_QUERY)}
+    assert scans[0] in dropped
+    assert scans[1] not in dropped and scans[2] not in dropped
+    assert f"parts_scan_{scans[0]}" not in partitions
+    assert {f"parts_scan_{scans[1]}", f"parts_scan_{scans[2]}"} <= partitions
+    assert await database.fetchval("SELECT count(*) FROM scans WHERE id = $1", scans[0]) == 0
+    assert await database.fetchval("SELECT count(*) FROM parts WHERE scan_id = $1", scans[2]) == 3
+
+
+# parts before it was partitioned by scan
+LEGACY_TABLES_QUERY = """
+CREATE TABLE scans (id SERIAL PRIMARY KEY, time_start TIMESTAMP NOT NULL, time_end TIMESTAMP);
+CREATE TABLE makers (id SERIAL PRIMARY KEY, maker TEXT NOT NULL UNIQUE);
+CREATE TABLE categories (id SERIAL PRIMARY KEY, category TEXT NOT NULL UNIQUE);
+CREATE TABLE models (id SERIAL PRIMARY KEY, model TEXT NOT NULL UNIQUE);
+CREATE TABLE parts (
+    id SERIAL PRIMARY KEY,
+    maker_id INT NOT NULL REFERENCES makers (id),
+    category_id INT NOT NULL REFERENCES categories (id),
+    model_id INT NOT NULL REFERENCES models (id),
+    part_number TEXT NOT NULL,
+    part_category TEXT NOT NULL,
+    url TEXT NOT NULL,
+    scan_id INT NOT NULL REFERENCES scans (id),
+    UNIQUE (maker_id, category_id, model_id, part_number, part_category, url, scan_id)
+);
+INSERT INTO scans (time_start, time_end) VALUES (now(), now()), (now(), NULL);
+INSERT INTO makers (maker) VALUES ('MAKER1');
+INSERT INTO categories (category) VALUES ('CATEGORY1');
+INSERT INTO models (model) VALUES ('MODEL1');
+INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id)
+VALUES (1, 1, 1, '4242', 'FOO', 'https://a', 1);
+"""
+
+
+@pytest.mark.asyncio
+async def test_migration_partitions_every_legacy_scan(database):
+    async with database.pool.acquire() as connection:
+        await connection.execute("DROP SCHEMA IF EXISTS legacy_catalogue CASCADE; CREATE SCHEMA legacy_catalogue")
+        try:
+            await connection.execute("SET search_path TO legacy_catalogue")
+            await connection.execute(LEGACY_TABLES_QUERY)
+            # the legacy parts table of another schema is left alone by a migration of the public one
+            await database.execute(CREATE_TABLES_QUERY)
+            relkinds = [
+                await connection.fetchval(f"SELECT relkind::text FROM pg_class WHERE oid = to_regclass('{name}')")
+                for name in ("public.parts", "legacy_catalogue.parts")
+            ]
+            await connection.execute(CREATE_TABLES_QUERY)
+
+            partitions = await connection.fetch(
+                "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass('parts') ORDER BY 1"
+            )
+            parts = await connection.fetch("SELECT part_number, scan_id FROM parts")
+            # the unfinished scan without parts gets its partition too, so it can be resumed
+            await connection.execute(
+                "INSERT INTO parts (maker_id, category_id, model_id, part_number, part_category, url, scan_id) "
+                "VALUES (1, 1, 1, '4343', 'FOO', 'https://b', 2)"
+            )
+        finally:
+            await connection.execute("RESET search_path; DROP SCHEMA legacy_catalogue CASCADE")
+
+    assert relkinds == ["p", "r"]
+    assert [name for name, in partitions] == ["parts_scan_1", "parts_scan_2"]
+    assert [tuple(row) for row in parts] == [("4242", 1)]
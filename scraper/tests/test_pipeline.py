@@ -0,0 +1,131 @@
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from urllib.parse import urlparse
+
+import pytest
+from httpx import AsyncClient
+
+from app.pipeline import Stage
+from app.scraper import fetch_from_site, handle_page
+from app.writer import PartsWriter
+from models import CatalogueLevels, CatalogueLink, ScraperPayload, ScrapingStatus, WriterStats
+
+
+@pytest.mark.asyncio
+async def test_stage_utilization_is_busy_share_of_worker_time():
+    stage = Stage("parse", workers=2, queue_size=10)
+
+    async def worker():
+        while True:
+            await stage.queue.get()
+            await asyncio.sleep(0.05)
+            stage.record(0.05)
+            stage.queue.task_done()
+
+    stage.start(worker)
+    for _ in range(2):
+        await stage.queue.put("page")
+    await stage.queue.join()
+    await asyncio.sleep(0.05)
+    await stage.stop()
+
+    assert stage.items == 2
+    assert 0.3 < stage.utilization < 0.7
+
+
+@pytest.mark.asyncio
+async def test_stage_queue_holds_back_the_stage_feeding_it():
+    stage = Stage("parse", workers=1, queue_size=1)
+
+    await stage.queue.put("page1")
+    blocked = asyncio.create_task(stage.queue.put("page2"))
+    await asyncio.sleep(0.01)
+
+    assert not blocked.done()
+    assert stage.queue_depth == 1
+    await stage.queue.get()
+    await asyncio.wait_for(blocked, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_fetch_busy_time_leaves_out_the_rate_limiter_wait(fake_context):
+    fetch = Stage("fetch", workers=1)
+    http_client = AsyncMock(spec=AsyncClient)
+    http_client.get.return_value = MagicMock(status_code=200, content=b"<html></html>")
+    ctx = fake_context.model_copy(
+        update={"http_client": http_client, "pipeline": {"fetch": fetch}, "scraping_status": ScrapingStatus()}
+    )
+    payload = ScraperPayload(link=CatalogueLink(url=urlparse("https://example.com/")), level=CatalogueLevels.MAKERS)
+
+    @asynccontextmanager
+    async def slow_slot(limiter):
+        await asyncio.sleep(0.1)
+        yield
+
+    with patch("app.ratelimit.AdaptiveRateLimiter.slot", slow_slot):
+        await fetch_from_site(payload, ctx)
+
+    assert fetch.items == 1
+    assert fetch.busy_seconds < 0.05
+    assert ctx.scraping_status.stages.limiter_wait >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_parse_busy_time_leaves_out_the_writer(fake_context):
+    parse = Stage("parse", workers=1)
+    writer = MagicMock(spec=PartsWriter)
+
+    async def slow_put(url, parts):
+        await asyncio.sleep(0.1)
+
+    writer.put.side_effect = slow_put
+    ctx = fake_context.model_copy(
+        update={"writer": writer, "pipeline": {"parse": parse}, "scraping_status": ScrapingStatus()}
+    )
+    payload = ScraperPayload(link=CatalogueLink(url=urlparse("https://example.com/p")), level=CatalogueLevels.PARTS)
+
+    with patch("app.scraper.parse_page", return_value=[]):
+        await handle_page(payload, b"<html></html>", ctx)
+
+    writer.put.assert_awaited_once_with("https://example.com/p", [])
+    assert parse.items == 1
+    assert parse.busy_seconds < 0.05
+
+
+@pytest.mark.asyncio
+async def test_writer_workers_flush_batches_concurrently():
+    running, peak = 0, 0
+    release = asyncio.Event()
+
+    async def write(parts):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+
+    stage = Stage("write", workers=2)
+    flushed = []
+    writer = PartsWriter(
+        write=write,
+        on_flushed=flushed.extend,
+        stats=WriterStats(),
+        flush_rows=1,
+        flush_interval=60,
+        max_pending=10,
+        workers=2,
+        stage=stage,
+    )
+    stage.start()
+    writer.start()
+    for i in range(3):
+        await writer.put(f"/page{i}", [f"p{i}"])
+    await asyncio.sleep(0.01)
+
+    assert peak == 2
+    release.set()
+    await writer.close()
+    assert sorted(flushed) == ["/page0", "/page1", "/page2"]
+    assert stage.items == 3
+    assert stage.busy_seconds > 0
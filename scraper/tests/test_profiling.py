@@ -0,0 +1,74 @@
+import marshal
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.profiling import ProfileMode, Profiling, StackSampler
+from models import ScrapingStatus
+from routers.profiling import router
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stack_sampler_collapses_stacks_of_the_sampled_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,))
+    thread.start()
+    sampler = StackSampler(thread.ident, interval=0.001)
+    sampler.start()
+    time.sleep(0.05)
+    folded = sampler.stop().decode()
+    stop.set()
+    thread.join()
+
+    lines = folded.splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "busy_loop" in stack.split(";")[-1]
+
+
+def test_cprofile_output_is_a_pstats_dump():
+    profiling = Profiling()
+    profiling.start_cpu(ProfileMode.CPROFILE, interval=0.005)
+    with pytest.raises(RuntimeError):
+        profiling.start_cpu(ProfileMode.SAMPLER, interval=0.005)
+    sum(range(1000))
+    mode, content = profiling.stop_cpu()
+
+    assert mode == ProfileMode.CPROFILE
+    stats = marshal.loads(content)
+    assert any(function == "<built-in method builtins.sum>" for _, _, function in stats)
+
+
+def test_tracemalloc_diff_shows_new_allocations():
+    profiling = Profiling()
+    profiling.start_memory(frames=1)
+    retained = [bytearray(1024) for _ in range(1000)]
+    diff = profiling.stop_memory(limit=5)
+
+    assert "test_profiling.py" in diff.splitlines()[0]
+    assert len(retained) == 1000
+
+
+def test_profile_endpoints_need_a_running_scan():
+    app = FastAPI()
+    app.include_router(router)
+    app.state.scraping_status = ScrapingStatus(scan_id=4)
+    app.state.profiling = Profiling()
+    client = TestClient(app)
+
+    assert client.post("/admin/profile/start").status_code == 400
+    app.state.scraping_status.scraping = True
+    assert client.post("/admin/profile/start", params={"mode": "sampler", "interval": 0.001}).status_code == 200
+    response = client.post("/admin/profile/stop")
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="scan-4.folded"'
+    assert client.post("/admin/profile/stop").status_code == 400
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.ratelimit import AdaptiveRateLimiter
+
+
+def make_limiter(**kwargs) -> AdaptiveRateLimiter:
+    params = dict(
+        rate=10.0, concurrency=2, min_rate=1.0, max_rate=20.0, max_concurrency=4, target_latency=0.5, window_size=2
+    )
+    params.update(kwargs)
+    return AdaptiveRateLimiter(**params)
+
+
+def test_rate_increases_while_healthy():
+    limiter = make_limiter()
+
+    limiter.record(latency=0.1, status_code=200)
+    limiter.record(latency=0.1, status_code=404)
+
+    assert limiter.rate == 11.0
+
+
+def test_rate_holds_on_slow_responses():
+    limiter = make_limiter()
+
+    limiter.record(latency=1.0, status_code=200)
+    limiter.record(latency=1.0, status_code=200)
+
+    assert limiter.rate == 10.0
+
+
+@pytest.mark.parametrize("status_code", [429, 503, None])
+def test_rate_backs_off_once_per_cooldown(status_code):
+    limiter = make_limiter(cooldown=60)
+
+    limiter.record(latency=0.1, status_code=status_code)
+    limiter.record(latency=0.1, status_code=status_code)
+
+    assert limiter.rate == 5.0
+
+
+@pytest.mark.asyncio
+async def test_slot_respects_concurrency_and_update():
+    limiter = make_limiter(rate=1000.0, concurrency=1)
+    entered = asyncio.Event()
+    release = asyncio.Event()
+
+    async def request():
+        async with limiter.slot():
+            entered.set()
+            await release.wait()
+
+    first = asyncio.create_task(request())
+    await entered.wait()
+    entered.clear()
+    second = asyncio.create_task(request())
+    await asyncio.sleep(0.01)
+    assert limiter.in_flight == 1
+
+    await limiter.update(concurrency=3, rate=100.0)
+    await asyncio.wait_for(entered.wait(), timeout=1)
+    assert limiter.in_flight == 2
+    assert limiter.concurrency == 3
+
+    release.set()
+    await asyncio.gather(first, second)
+    assert limiter.in_flight == 0
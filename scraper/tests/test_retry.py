@@ -0,0 +1,111 @@
+import asyncio
+import random
+from unittest.mock import MagicMock
+from urllib.parse import urlparse
+
+import httpx
+import pytest
+
+from app.retry import backoff, classify_error, plan_retry, retry_after
+from app.scheduler import CrawlScheduler
+from app.scraper import retry_page
+from config.settings import ErrorClass, RetryConfig, RetryPolicy, ScraperConfig
+from db.queries import INSERT_DEAD_LETTER_QUERY
+from models import CatalogueLevels, CatalogueLink, ScraperPayload, ScrapingStatus
+
+
+def status_error(status_code: int, headers: dict = None) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://example.com/page")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"{status_code}", request=request, response=response)
+
+
+def make_payload(path: str, attempt: int = 1) -> ScraperPayload:
+    return ScraperPayload(
+        link=CatalogueLink(url=urlparse(f"https://example.com{path}")), level=CatalogueLevels.MODELS, attempt=attempt
+    )
+
+
+def test_classify_error():
+    assert classify_error(status_error(429)) == ErrorClass.THROTTLED
+    assert classify_error(status_error(503)) == ErrorClass.SERVER
+    assert classify_error(status_error(404)) == ErrorClass.CLIENT
+    assert classify_error(httpx.ReadTimeout("slow")) == ErrorClass.TIMEOUT
+    assert classify_error(httpx.ConnectError("refused")) == ErrorClass.CONNECTION
+
+
+def test_backoff_is_exponential_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    rng = random.Random(1)
+
+    assert backoff(policy, 1, jitter=0.0) == 1.0
+    assert backoff(policy, 3, jitter=0.0) == 4.0
+    assert backoff(policy, 10, jitter=0.0) == 5.0
+    delays = [backoff(policy, 2, jitter=0.5, rng=rng) for _ in range(100)]
+    assert all(1.0 <= delay <= 2.0 for delay in delays)
+    assert len(set(delays)) == 100
+
+
+def test_plan_retry_follows_the_policy_of_the_error_class():
+    config = RetryConfig(jitter=0.0)
+
+    assert plan_retry(status_error(404), 1, config) == (ErrorClass.CLIENT, None)
+    assert plan_retry(status_error(503), 1, config) == (ErrorClass.SERVER, 1.0)
+    assert plan_retry(status_error(503), 3, config) == (ErrorClass.SERVER, None)
+    assert plan_retry(status_error(429, {"retry-after": "42"}), 1, config) == (ErrorClass.THROTTLED, 42.0)
+    assert retry_after(status_error(429, {"retry-after": "soon"})) is None
+
+
+def test_partial_retry_policies_keep_the_other_defaults():
+    config = RetryConfig(policies={"throttled": {"max_attempts": 8}})
+
+    assert config.policies[ErrorClass.THROTTLED] == RetryPolicy(max_attempts=8)
+    assert plan_retry(status_error(503), attempt=3, config=config) == (ErrorClass.SERVER, None)
+    assert plan_retry(status_error(404), attempt=1, config=config) == (ErrorClass.CLIENT, None)
+
+
+@pytest.mark.asyncio
+async def test_deferred_retries_are_released_in_due_order_and_joined():
+    scheduler = CrawlScheduler()
+    await scheduler.put(make_payload("/first"))
+    first = await scheduler.get()
+
+    await scheduler.retry(make_payload("/late"), delay=0.05)
+    await scheduler.retry(make_payload("/soon"), delay=0.01)
+    scheduler.task_done()
+
+    assert len(scheduler) == 0 and scheduler.deferred == 2
+    assert first.link.url.path == "/first"
+    assert (await scheduler.get()).link.url.path == "/soon"
+    assert (await scheduler.get()).link.url.path == "/late"
+    join = asyncio.create_task(scheduler.join())
+    await asyncio.sleep(0)
+    assert not join.done()
+    scheduler.task_done()
+    scheduler.task_done()
+    await asyncio.wait_for(join, 1)
+    scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_retry_page_defers_then_records_a_dead_letter(fake_context):
+    config = ScraperConfig(retry=RetryConfig(policies={ErrorClass.SERVER: RetryPolicy(max_attempts=2)}))
+    ctx = fake_context.model_copy(
+        update={"config": config, "scraping_status": ScrapingStatus(), "queue": MagicMock(spec=CrawlScheduler)}
+    )
+    ctx.db_connection.execute.reset_mock()
+
+    await retry_page(make_payload("/page"), status_error(503), ctx)
+
+    payload, delay = ctx.queue.retry.call_args.args
+    assert payload.attempt == 2 and 0.5 <= delay <= 1.0
+    ctx.db_connection.execute.assert_not_awaited()
+
+    await retry_page(payload, status_error(503), ctx)
+
+    ctx.queue.discard.assert_awaited_once_with(payload)
+    ctx.db_connection.execute.assert_awaited_once_with(
+        INSERT_DEAD_LETTER_QUERY, ctx.scan_id, "https://example.com/page", "allmodels", 2, "server", "503", 503
+    )
+    assert ctx.scraping_status.retries.retried == 1
+    assert ctx.scraping_status.retries.dead_letters == 1
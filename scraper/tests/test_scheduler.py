@@ -0,0 +1,91 @@
+import asyncio
+from unittest.mock import patch
+from urllib.parse import urlparse
+
+import pytest
+
+from app.pipeline import Stage
+from app.scheduler import CrawlScheduler
+from app.scraper import crawl_priority, fetch_worker, frontier_payload, frontier_row, parse_worker
+from models import CatalogueLevels, CatalogueLink, ScraperPayload, ScrapingStatus
+
+
+def make_payload(url: str, level: CatalogueLevels) -> ScraperPayload:
+    return ScraperPayload(link=CatalogueLink(url=urlparse(url)), level=level)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_dedups_at_enqueue_and_serves_deepest_level_first():
+    scheduler = CrawlScheduler(priority=crawl_priority, seen={"https://example.com/visited"})
+
+    assert await scheduler.put(make_payload("https://example.com/makers", CatalogueLevels.MAKERS))
+    assert await scheduler.put(make_payload("https://example.com/parts1", CatalogueLevels.PARTS))
+    assert await scheduler.put(make_payload("https://example.com/models", CatalogueLevels.MODELS))
+    assert await scheduler.put(make_payload("https://example.com/parts2", CatalogueLevels.PARTS))
+    assert not await scheduler.put(make_payload("https://example.com/parts1", CatalogueLevels.PARTS))
+    assert not await scheduler.put(make_payload("https://example.com/visited", CatalogueLevels.PARTS))
+    await scheduler.retry(make_payload("https://example.com/makers", CatalogueLevels.MAKERS))
+
+    urls = [(await scheduler.get()).link.url.path for _ in range(len(scheduler))]
+
+    assert urls == ["/parts1", "/parts2", "/models", "/makers", "/makers"]
+
+
+@pytest.mark.asyncio
+async def test_workers_stay_alive_until_frontier_drained(fake_context):
+    scheduler = CrawlScheduler(priority=crawl_priority)
+    ctx = fake_context.model_copy(update={"queue": scheduler, "scraping_status": ScrapingStatus()})
+    processed = []
+
+    async def fetch_page(payload, ctx):
+        return b""
+
+    async def handle_page(payload, content, ctx):
+        processed.append(payload.link.url.path)
+        if payload.level == CatalogueLevels.MAKERS:
+            # the queue is empty while the root page is being parsed
+            await asyncio.sleep(0.05)
+            await ctx.queue.put(make_payload("https://example.com/a", CatalogueLevels.CATEGORIES))
+            await ctx.queue.put(make_payload("https://example.com/b", CatalogueLevels.CATEGORIES))
+
+    await scheduler.put(make_payload("https://example.com/root", CatalogueLevels.MAKERS))
+    fetch, parse = Stage("fetch", 3), Stage("parse", 2, queue_size=1)
+    with patch("app.scraper.fetch_page", fetch_page), patch("app.scraper.handle_page", handle_page):
+        parse.start(lambda: parse_worker(ctx, parse))
+        fetch.start(lambda: fetch_worker(ctx, parse))
+        await asyncio.sleep(0.01)
+        assert not any(task.done() for task in fetch._tasks + parse._tasks)
+        await asyncio.wait_for(scheduler.join(), timeout=1)
+        await fetch.stop()
+        await parse.stop()
+
+    assert sorted(processed) == ["/a", "/b", "/root"]
+    assert ctx.scraping_status.scraping_counter == 3
+
+
+@pytest.mark.asyncio
+async def test_scheduler_spills_past_memory_limit_and_keeps_order(tmp_path):
+    scheduler = CrawlScheduler(
+        priority=crawl_priority,
+        memory_limit=2,
+        encode=frontier_row,
+        decode=frontier_payload,
+        spill_dir=str(tmp_path),
+    )
+
+    for i in range(5):
+        await scheduler.put(make_payload(f"https://example.com/models{i}", CatalogueLevels.MODELS))
+    await scheduler.put(make_payload("https://example.com/parts", CatalogueLevels.PARTS))
+    assert not await scheduler.put(make_payload("https://example.com/models3", CatalogueLevels.MODELS))
+
+    assert scheduler.spilled == 4
+    assert len(scheduler) == 6
+    urls = []
+    while not scheduler.empty():
+        urls.append((await scheduler.get()).link.url.path)
+        scheduler.task_done()
+    await asyncio.wait_for(scheduler.join(), timeout=1)
+    scheduler.close()
+
+    # the parts page was spilled behind a full memory but keeps its priority once loaded back
+    assert urls == ["/models0", "/parts", "/models1", "/models2", "/models3", "/models4"]
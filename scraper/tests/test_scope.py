@@ -0,0 +1,81 @@
+from datetime import datetime
+from urllib.parse import urlparse
+
+import pytest
+
+from app.scheduler import CrawlScheduler
+from app.scraper import carry_forward, enqueue_links, in_scope
+from config.settings import ScanScope, ScraperConfig, StorageMode
+from db.queries import GET_NEW_SCAN_ID, INSERT_PART_RANGE_QUERY, INSERT_PARTS_QUERY, SCAN_ENDED
+from models import CatalogueLevels, CatalogueLink, DirectoryPath
+
+
+def test_in_scope_matches_names_case_insensitively():
+    scope = ScanScope(makers=["Maker1"], models=["MODEL2"])
+    maker1 = DirectoryPath([(CatalogueLevels.MAKERS, "MAKER1")])
+
+    assert in_scope(maker1, scope)
+    assert in_scope(maker1.child(CatalogueLevels.CATEGORIES, "ANY"), scope)
+    assert not in_scope(DirectoryPath([(CatalogueLevels.MAKERS, "MAKER2")]), scope)
+    assert in_scope(maker1.child(CatalogueLevels.MODELS, "model2"), scope)
+    assert not in_scope(maker1.child(CatalogueLevels.MODELS, "MODEL3"), scope)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_links_skips_subtrees_outside_the_scope(fake_context):
+    ctx = fake_context.model_copy(
+        update={
+            "config": ScraperConfig(scope=ScanScope(makers=["MAKER1"])),
+            "queue": CrawlScheduler(priority=lambda payload: 0),
+            "checkpoint": None,
+        }
+    )
+    links = [
+        CatalogueLink(url=urlparse(f"https://example.com/{name}"), directory={CatalogueLevels.MAKERS: name})
+        for name in ["MAKER1", "MAKER2"]
+    ]
+
+    await enqueue_links(links, CatalogueLevels.CATEGORIES, ctx)
+
+    assert len(ctx.queue) == 1
+    assert (await ctx.queue.get()).link.url.path == "/MAKER1"
+
+
+async def scan_with_parts(database, storage, previous_scan_id=None) -> int:
+    scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now(), storage)
+    makers = await database.resolve_dimension_ids("makers", ["MAKER1", "MAKER2"])
+    categories = await database.resolve_dimension_ids("categories", ["CATEGORY1"])
+    models = await database.resolve_dimension_ids("models", ["MODEL1"])
+    rows = [
+        (makers[maker], categories["CATEGORY1"], models["MODEL1"], "4242", "FOO", "https://a", scan_id)
+        for maker in ["MAKER1", "MAKER2"]
+    ]
+    if storage == StorageMode.SNAPSHOT.value:
+        await database.create_parts_partition(scan_id)
+        await database.executemany(INSERT_PARTS_QUERY, rows)
+    else:
+        await database.executemany(INSERT_PART_RANGE_QUERY, [(*row, previous_scan_id) for row in rows])
+    await database.execute(SCAN_ENDED, scan_id, datetime.now())
+    return scan_id
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", list(StorageMode))
+async def test_carry_forward_copies_parts_outside_the_scope(database, storage):
+    previous_scan_id = await scan_with_parts(database, storage.value)
+    scan_id = await database.fetchval(GET_NEW_SCAN_ID, datetime.now(), storage.value)
+    if storage == StorageMode.SNAPSHOT:
+        await database.create_parts_partition(scan_id)
+    config = ScraperConfig(storage_mode=storage, scope=ScanScope(makers=["maker1"]))
+
+    carried = await carry_forward(database, config, scan_id, previous_scan_id)
+
+    if storage == StorageMode.SNAPSHOT:
+        query = "SELECT m.maker FROM parts p JOIN makers m ON m.id = p.maker_id WHERE p.scan_id = $1"
+    else:
+        query = (
+            "SELECT m.maker FROM part_ranges p JOIN makers m ON m.id = p.maker_id "
+            "WHERE p.first_scan_id <= $1 AND p.last_scan_id >= $1"
+        )
+    assert carried == 1
+    assert [maker for maker, in await database.fetch(query, scan_id)] == ["MAKER2"]
@@ -2,16 +2,29 @@ from unittest.mock import patch
 from urllib.parse import urlparse
 
 import pytest
-from bs4 import BeautifulSoup
 
-from app.scraper import enqueue_links, extract_links, fetch_html, insert_parts, parse_parts, process_page
-from models import CatalogueLevels, CatalogueLink, CataloguePart, PartDetails, ScraperPayload
+from app.parsers import create_parse_executor
+from app.scraper import (
+    build_links,
+    enqueue_links,
+    extract_links,
+    fetch_html,
+    fetch_page,
+    handle_page,
+    insert_parts,
+    page_hash,
+    parse_page,
+    parse_parts,
+)
+from config.settings import InsertMode, ParseExecutor, ParserBackend, ScraperConfig, StorageMode
+from db.queries import COPY_SUBTREE_PARTS_QUERY, INSERT_PART_RANGE_QUERY, MERGE_STAGED_PARTS_QUERY, PARTS_STAGING_TABLE
+from models import CatalogueLevels, CatalogueLink, CataloguePart, PartDetails, ScraperPayload, ScrapingStatus
 
 
 @pytest.mark.asyncio
 async def test_fetch_html_success(fake_context):
     fake_context.http_client.get.return_value.status_code = 200
-    fake_context.http_client.get.return_value.text = "<html></html>"
+    fake_context.http_client.get.return_value.content = b"<html></html>"
 
     url = "https://example.com"
     link = CatalogueLink(url=urlparse(url))
@@ -22,24 +35,26 @@ async def test_fetch_html_success(fake_context):
 
     html = await fetch_html(payload, fake_context)
 
-    assert html == "<html></html>"
-    fake_context.http_client.get.assert_called_once_with(url)
+    assert html == b"<html></html>"
+    fake_context.http_client.get.assert_called_once_with(url, headers={})
 
 
-def test_extract_links_success():
-    html_text = """
+@pytest.mark.parametrize("backend", list(ParserBackend))
+def test_extract_links_success(backend):
+    html_text = b"""
+    <div class="c_container allmakes_header"><li><a href="/header">Header</a></li></div>
     <div class="c_container allmakes">
         <li><a href="/link1">Link 1</a></li>
-        <li><a href="/link2">Link 2</a></li>
+        <li><a href="/link2"> Link 2 </a></li>
+        <li>no link</li>
     </div>
     """
-    soup = BeautifulSoup(html_text, "lxml")
     payload = ScraperPayload(
         link=CatalogueLink(url=urlparse("https://example.com"), directory={}),
         level=CatalogueLevels.MAKERS,
     )
 
-    links = extract_links(soup, payload)
+    links = extract_links(html_text, payload, backend)
 
     assert len(links) == 2
     assert links[0].url.path == "/link1"
@@ -48,6 +63,39 @@ def test_extract_links_success():
     assert links[1].directory[CatalogueLevels.MAKERS] == "Link 2"
 
 
+def test_build_links_gives_children_their_own_directory():
+    parent = CatalogueLink(url=urlparse("https://example.com"), directory={CatalogueLevels.MAKERS: "MAKER1"})
+    payload = ScraperPayload(link=parent, level=CatalogueLevels.CATEGORIES)
+
+    links = build_links([("/cat1", "Category 1"), ("/cat2", "Category 2")], payload)
+
+    assert parent.directory == {CatalogueLevels.MAKERS: "MAKER1"}
+    assert links[0].directory == {CatalogueLevels.MAKERS: "MAKER1", CatalogueLevels.CATEGORIES: "Category 1"}
+    assert links[1].directory == {CatalogueLevels.MAKERS: "MAKER1", CatalogueLevels.CATEGORIES: "Category 2"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor", [ParseExecutor.THREAD, ParseExecutor.PROCESS])
+async def test_parse_page_in_executor(fake_context, executor):
+    config = ScraperConfig(parse_executor=executor, parse_workers=1)
+    parse_executor = create_parse_executor(config)
+    ctx = fake_context.model_copy(update={"config": config, "parse_executor": parse_executor})
+    payload = ScraperPayload(
+        link=CatalogueLink(url=urlparse("https://example.com"), directory={CatalogueLevels.MAKERS: "MAKER1"}),
+        level=CatalogueLevels.CATEGORIES,
+    )
+    html_text = b'<div class="c_container allcategories"><li><a href="/cat1">Category 1</a></li></div>'
+
+    try:
+        links = await parse_page(html_text, payload, ctx)
+    finally:
+        parse_executor.shutdown()
+
+    assert len(links) == 1
+    assert links[0].url.path == "/cat1"
+    assert links[0].directory == {CatalogueLevels.MAKERS: "MAKER1", CatalogueLevels.CATEGORIES: "Category 1"}
+
+
 @pytest.mark.asyncio
 async def test_enqueue_links_success(fake_context):
     links = [CatalogueLink(url=urlparse("https://example.com"), directory={})]
@@ -99,13 +147,52 @@ async def test_insert_parts_success(fake_context):
 
 
 @pytest.mark.asyncio
-async def test_process_page(fake_context):
+async def test_insert_parts_copy_mode(fake_context):
+    ctx = fake_context.model_copy(
+        update={"config": ScraperConfig(insert_mode=InsertMode.COPY), "scraping_status": ScrapingStatus()}
+    )
+    dimension_ids = {"MAKER1": 1, "CATEGORY1": 2, "MODEL1": 3}
+    ctx.db_connection.resolve_dimension_ids.side_effect = lambda table, names: {n: dimension_ids[n] for n in names}
+    part = CataloguePart(number="4242", category="FOO", url="https://example.com")
+    parts = [
+        PartDetails(maker="MAKER1", category="CATEGORY1", model="MODEL1", part=part),
+        PartDetails(maker="MAKER1", category="CATEGORY1", model="MODEL1", part=part),
+    ]
+
+    await insert_parts(parts=parts, ctx=ctx)
+
+    ctx.db_connection.copy_and_execute.assert_awaited_once()
+    args, kwargs = ctx.db_connection.copy_and_execute.call_args
+    assert args == (PARTS_STAGING_TABLE,)
+    assert kwargs["records"] == {(1, 2, 3, "4242", "FOO", "https://example.com", 1)}
+    assert kwargs["query"] == MERGE_STAGED_PARTS_QUERY
+    assert ctx.scraping_status.insert.rows == 1
+
+
+@pytest.mark.asyncio
+async def test_insert_parts_range_storage(fake_context):
+    ctx = fake_context.model_copy(
+        update={"config": ScraperConfig(storage_mode=StorageMode.RANGES), "scan_id": 5, "previous_scan_id": 3}
+    )
+    dimension_ids = {"MAKER1": 1, "CATEGORY1": 2, "MODEL1": 3}
+    ctx.db_connection.resolve_dimension_ids.side_effect = lambda table, names: {n: dimension_ids[n] for n in names}
+    part = CataloguePart(number="4242", category="FOO", url="https://example.com")
+
+    await insert_parts(parts=[PartDetails(maker="MAKER1", category="CATEGORY1", model="MODEL1", part=part)], ctx=ctx)
+
+    ctx.db_connection.executemany.assert_awaited_with(
+        INSERT_PART_RANGE_QUERY, [(1, 2, 3, "4242", "FOO", "https://example.com", 5, 3)]
+    )
+
+
+@pytest.mark.asyncio
+async def test_fetch_and_handle_page(fake_context):
     # Mock fetch_html and extract_links
     links = [
         CatalogueLink(url=urlparse("https://example.com/link1")),
         CatalogueLink(url=urlparse("https://example.com/link2")),
     ]
-    with patch("app.scraper.fetch_html", return_value="<html></html>"):
+    with patch("app.scraper.fetch_html", return_value=b"<html></html>"):
         with patch("app.scraper.extract_links", return_value=links):
 
             payload = ScraperPayload(
@@ -113,6 +200,37 @@ async def test_process_page(fake_context):
                 level=CatalogueLevels.MAKERS,
             )
 
-            await process_page(payload, fake_context)
+            content = await fetch_page(payload, fake_context)
+            await handle_page(payload, content, fake_context)
 
             assert "https://example.com" in fake_context.visited_urls
+
+
+@pytest.mark.asyncio
+async def test_handle_page_copies_unchanged_subtree(fake_context):
+    directory = {CatalogueLevels.MAKERS: "MAKER1", CatalogueLevels.CATEGORIES: "CATEGORY1"}
+    payload = ScraperPayload(
+        link=CatalogueLink(url=urlparse("https://example.com/models"), directory=directory),
+        level=CatalogueLevels.MODELS,
+    )
+    links = [CatalogueLink(url=urlparse("https://example.com/model1"), directory={CatalogueLevels.MODELS: "M1"})]
+    ctx = fake_context.model_copy(
+        update={
+            "config": ScraperConfig(incremental=True),
+            "scraping_status": ScrapingStatus(),
+            "visited_urls": set(),
+            "previous_scan_id": 41,
+            "previous_page_hashes": {"https://example.com/models": page_hash(links, CatalogueLevels.MODELS)},
+        }
+    )
+    ctx.db_connection.resolve_dimension_ids.side_effect = lambda table, names: {n: 7 for n in names}
+    ctx.db_connection.execute.return_value = "INSERT 0 12"
+
+    with patch("app.scraper.parse_page", return_value=links):
+        with patch("app.scraper.enqueue_links") as enqueue:
+            await handle_page(payload, b"<html></html>", ctx)
+
+    enqueue.assert_not_called()
+    ctx.db_connection.execute.assert_any_await(COPY_SUBTREE_PARTS_QUERY, ctx.scan_id, 41, 7, 7)
+    assert ctx.scraping_status.incremental.copied_rows == 12
+    assert "https://example.com/models" in ctx.visited_urls
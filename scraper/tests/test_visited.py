@@ -0,0 +1,28 @@
+from app.visited import BloomFilter, UrlHashSet
+
+
+def test_url_hash_set_grows_and_keeps_urls():
+    urls = UrlHashSet(capacity=16)
+
+    for i in range(1000):
+        urls.add(f"https://example.com/page/{i}")
+    urls.add("https://example.com/page/1")
+
+    assert len(urls) == 1000
+    assert all(f"https://example.com/page/{i}" in urls for i in range(1000))
+    assert "https://example.com/page/1000" not in urls
+    # 8 bytes per slot, grown to keep the table at most 60% full
+    assert urls.nbytes == 8 * 2048
+
+
+def test_bloom_filter_false_positive_rate_stays_near_target():
+    urls = BloomFilter(capacity=10000, error_rate=0.01)
+
+    for i in range(10000):
+        urls.add(f"https://example.com/page/{i}")
+
+    assert all(f"https://example.com/page/{i}" in urls for i in range(10000))
+    false_positives = sum(f"https://example.com/other/{i}" in urls for i in range(10000))
+    assert false_positives < 200
+    # ~9.6 bits per url at 1%
+    assert urls.nbytes < 10000 * 10 / 8 + 1
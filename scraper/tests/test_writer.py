@@ -0,0 +1,141 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from asyncpg import PostgresError
+from httpx import ASGITransport, AsyncClient
+
+from app.ratelimit import RateLimiterRegistry
+from app.scraper import run_scraper
+from app.writer import PartsWriter
+from benchmarks.catalogue_server import CatalogueServer, CatalogueShape
+from config.settings import InsertMode, ParseExecutor, ScraperConfig
+from models import ScrapingStatus, WriterStats
+
+
+def make_writer(written: list, flushed: list, **kwargs) -> PartsWriter:
+    async def write(parts):
+        written.append(list(parts))
+
+    params = dict(flush_rows=3, flush_interval=60, max_pending=10)
+    params.update(kwargs)
+    return PartsWriter(write=write, on_flushed=flushed.extend, stats=WriterStats(), **params)
+
+
+@pytest.mark.asyncio
+async def test_writer_batches_parts_across_pages():
+    written, flushed = [], []
+    writer = make_writer(written, flushed)
+    writer.start()
+
+    await writer.put("/page1", ["p1", "p2"])
+    await writer.put("/page2", ["p3", "p4"])
+    await writer.put("/page3", ["p5"])
+    await writer.close()
+
+    assert written == [["p1", "p2", "p3", "p4"], ["p5"]]
+    assert flushed == ["/page1", "/page2", "/page3"]
+    assert writer.stats.flushes == 2
+    assert writer.stats.rows == 5
+    assert writer.stats.last_flush_rows == 1
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_on_interval():
+    written, flushed = [], []
+    writer = make_writer(written, flushed, flush_rows=100, flush_interval=0.01)
+    writer.start()
+
+    await writer.put("/page1", ["p1"])
+    await asyncio.sleep(0.05)
+
+    assert written == [["p1"]]
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_writer_marks_pages_without_parts_flushed():
+    written, flushed = [], []
+    writer = make_writer(written, flushed, flush_interval=0.01)
+    writer.start()
+
+    await writer.put("/empty", [])
+    await asyncio.sleep(0.05)
+    assert flushed == ["/empty"]
+
+    await writer.put("/empty2", [])
+    await asyncio.wait_for(writer.close(), timeout=1)
+
+    assert written == []
+    assert flushed == ["/empty", "/empty2"]
+    assert writer.stats.flushes == 0
+
+
+@pytest.mark.asyncio
+async def test_writer_applies_backpressure():
+    release = asyncio.Event()
+    writer = PartsWriter(
+        write=lambda parts: release.wait(),
+        on_flushed=lambda urls: None,
+        stats=WriterStats(),
+        flush_rows=1,
+        flush_interval=60,
+        max_pending=1,
+    )
+    writer.start()
+
+    await writer.put("/page1", ["p1"])
+    await asyncio.sleep(0.01)
+    await writer.put("/page2", ["p2"])
+    blocked = asyncio.create_task(writer.put("/page3", ["p3"]))
+    await asyncio.sleep(0.01)
+
+    assert not blocked.done()
+    assert writer.stats.queue_depth == 1
+    release.set()
+    await asyncio.wait_for(blocked, timeout=1)
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_writer_close_raises_a_failed_flush():
+    written, flushed = [], []
+
+    async def write(parts):
+        if "p2" in parts:
+            raise PostgresError("copy failed")
+        written.append(list(parts))
+
+    writer = PartsWriter(
+        write=write, on_flushed=flushed.extend, stats=WriterStats(), flush_rows=1, flush_interval=60, max_pending=10
+    )
+    writer.start()
+    for i in range(1, 4):
+        await writer.put(f"/page{i}", [f"p{i}"])
+
+    with pytest.raises(PostgresError):
+        await writer.close()
+    assert written == [["p1"], ["p3"]]
+    assert flushed == ["/page1", "/page3"]
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_leaves_the_scan_unfinished(database):
+    config = ScraperConfig(
+        base_url="http://catalogue/", insert_mode=InsertMode.COPY, parse_executor=ParseExecutor.INLINE
+    )
+    status = ScrapingStatus()
+    server = CatalogueServer(CatalogueShape(fanout=(1, 1, 2, 3)))
+    failing_copy = AsyncMock(side_effect=PostgresError("copy failed"))
+
+    async with AsyncClient(transport=ASGITransport(app=server)) as http_client:
+        with patch.object(database, "copy_and_execute", failing_copy), pytest.raises(PostgresError):
+            await run_scraper(database, status, config, RateLimiterRegistry(config), http_client)
+
+    failing_copy.assert_awaited()
+    assert await database.fetchval("SELECT time_end FROM scans WHERE id = $1", status.scan_id) is None
+    # the parts pages stay pending, /resume fetches them again
+    pending = await database.fetchval(
+        "SELECT count(*) FROM crawl_frontier WHERE scan_id = $1 AND level = 'allparts' AND NOT done", status.scan_id
+    )
+    assert pending == 2